@@ -11,7 +11,7 @@ import logging
 
 # Import with error handling
 try:
-    from services.auth_service import AuthService
+    from services.auth_service import AuthService, PasswordHashingBusyError
     AUTH_SERVICE_AVAILABLE = True
 except ImportError:
     AUTH_SERVICE_AVAILABLE = False
@@ -211,6 +211,15 @@ async def get_threat_detection_service():
     return service
 
 
+def _hashing_busy() -> HTTPException:
+    """503 for a request turned away because the password hashing pool is full"""
+    return HTTPException(
+        status_code=503,
+        detail="Too many authentication requests, please retry",
+        headers={"Retry-After": "1"}
+    )
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     auth_service = Depends(get_auth_service),
@@ -219,7 +228,7 @@ async def get_current_user(
     """Get current authenticated user from JWT token"""
     try:
         # Verify JWT token
-        payload = auth_service.verify_access_token(credentials.credentials)
+        payload = await auth_service.verify_access_token(credentials.credentials)
         if not payload:
             raise HTTPException(
                 status_code=401,
@@ -317,6 +326,8 @@ async def register(
     except ValueError as e:
         logger.warning(f"Registration validation error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
+    except PasswordHashingBusyError:
+        raise _hashing_busy()
     except Exception as e:
         logger.error(f"Registration error: {e}")
         raise HTTPException(status_code=500, detail="Registration failed")
@@ -368,6 +379,8 @@ async def login(
     except ValueError as e:
         logger.warning(f"Login failed: {e}")
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    except PasswordHashingBusyError:
+        raise _hashing_busy()
     except Exception as e:
         logger.error(f"Login error: {e}")
         raise HTTPException(status_code=500, detail="Authentication failed")
@@ -416,14 +429,16 @@ async def refresh_token(
 @router.post("/logout", response_model=MessageResponse)
 async def logout(
     authorization: str = Header(None),
+    x_session_token: Optional[str] = Header(None),
     auth_service = Depends(get_auth_service),
     session_repo = Depends(get_session_repository)
 ):
     """
-    Logout user by deactivating current session
+    Logout user by revoking the access token and deactivating the session
     
     Args:
-        authorization: Authorization header with session token
+        authorization: Authorization header with the access token
+        x_session_token: X-Session-Token header with the session token, if any
         auth_service: Authentication service
         session_repo: Session repository
         
@@ -432,13 +447,15 @@ async def logout(
     """
     try:
         if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="No valid session token provided")
+            raise HTTPException(status_code=401, detail="No valid access token provided")
         
-        session_token = authorization.split(" ")[1]
-        success = await auth_service.logout_user(session_repo, session_token)
+        access_token = authorization.split(" ")[1]
+        success = await auth_service.logout_user(
+            session_repo, session_token=x_session_token, access_token=access_token
+        )
         
         if not success:
-            raise HTTPException(status_code=401, detail="Invalid session token")
+            raise HTTPException(status_code=401, detail="Invalid access or session token")
         
         return MessageResponse(
             success=True,
@@ -519,6 +536,8 @@ async def change_password(
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except PasswordHashingBusyError:
+        raise _hashing_busy()
     except Exception as e:
         logger.error(f"Password change error: {e}")
         raise HTTPException(status_code=500, detail="Password change failed")
@@ -3,17 +3,21 @@ WebSocket API for real-time collaborative sessions
 Handles multi-user synchronized practice sessions with peer feedback
 """
 
-import json
 import logging
 import asyncio
+import time
+from collections import deque
 from datetime import datetime
-from typing import Dict, Set, Any, Optional, List
+from enum import Enum
+from typing import Dict, Set, Any, Optional, List, Tuple
 from uuid import uuid4
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.db import get_db_session
+from core.session_backplane import SessionBackplane
+from core.wire_codec import WireCodec, Payload, JSON_CODEC, accept_with_codec
 from services.collaborative_service import CollaborativeService
 from models.collaborative import SessionStatus
 
@@ -21,42 +25,540 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Frames a client builds its session state from; never dropped for a slow consumer
+STATE_MESSAGE_TYPES = frozenset({"session_state", "session_delta", "session_sync"})
+
+
+def apply_state_op(state: Dict[str, Any], op: Dict[str, Any]):
+    """
+    Apply one replicated state operation to a session state dict
+    
+    Operations address a value by key path and are one of:
+    set, merge (dict update), append (list, optional max_len) or delete.
+    """
+    path = op["path"]
+    target = state
+    for key in path[:-1]:
+        target = target.setdefault(key, {})
+    leaf = path[-1]
+    
+    action = op["op"]
+    if action == "set":
+        target[leaf] = op["value"]
+    elif action == "merge":
+        target.setdefault(leaf, {}).update(op["value"])
+    elif action == "append":
+        items = target.setdefault(leaf, [])
+        items.append(op["value"])
+        max_len = op.get("max_len")
+        if max_len and len(items) > max_len:
+            del items[:-max_len]
+    elif action == "delete":
+        target.pop(leaf, None)
+    else:
+        raise ValueError(f"Unknown state operation: {action}")
+
+
+class SessionState:
+    """
+    Versioned state for one collaborative session
+    
+    Each batch of operations bumps the version and is kept in a bounded log
+    so clients can catch up with a delta instead of a full snapshot. Chat is
+    held in a ring buffer outside the state document and fetched in pages.
+    
+    A session spread over several workers keeps a copy per worker. Those
+    copies share the epoch and take their versions from one counter on the
+    backplane, so batches are applied strictly in version order: a batch that
+    arrives ahead of a missing one waits in pending. A copy joining a running
+    session starts incomplete and adopts a complete copy's snapshot.
+    """
+    
+    def __init__(
+        self,
+        ops_log_size: int = 256,
+        chat_history_size: int = 500,
+        epoch: Optional[str] = None,
+        shared: bool = False
+    ):
+        # Identifies this copy of the state; versions are only comparable within it
+        self.epoch = epoch or uuid4().hex
+        self.version = 0
+        # Oldest client version a delta can start from
+        self.history_start = 0
+        # A shared copy starts numbering at the first version it applies
+        self.started = not shared
+        # False until this copy holds the whole state rather than just the batches it has seen
+        self.complete = not shared
+        self.pending: Dict[int, List[Dict[str, Any]]] = {}
+        self.data: Dict[str, Any] = self._initial_data()
+        self.ops_log: deque = deque(maxlen=ops_log_size)
+        self.chat: deque = deque(maxlen=chat_history_size)
+        self.chat_seq = 0
+    
+    @staticmethod
+    def _initial_data() -> Dict[str, Any]:
+        return {
+            "participants": {},
+            "current_sentence": 0,
+            "session_status": "waiting",
+            "story_content": None,
+            "practice_data": {},
+            "peer_feedback": {}
+        }
+    
+    def _apply_ops(self, version: int, ops: List[Dict[str, Any]]):
+        for op in ops:
+            if op["op"] == "chat":
+                self.chat_seq += 1
+                self.chat.append({**op["value"], "seq": self.chat_seq, "version": version})
+            else:
+                apply_state_op(self.data, op)
+    
+    def _apply_batch(self, version: int, ops: List[Dict[str, Any]]):
+        self._apply_ops(version, ops)
+        self.version = version
+        self.ops_log.append((version, ops))
+    
+    def apply(self, ops: List[Dict[str, Any]]) -> int:
+        """Apply a batch of operations as the next version and return it"""
+        self._apply_batch(self.version + 1, ops)
+        return self.version
+    
+    def apply_at(self, version: int, ops: List[Dict[str, Any]]) -> List[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        Apply a batch numbered by the shared version counter
+        
+        Returns:
+            The (version, ops) batches applied by this call, in order; empty
+            while the batch waits for a missing version
+        """
+        if not self.started:
+            self.version = version - 1
+            # A client at the version before this copy's first one may hold history it never saw
+            self.history_start = version
+            self.started = True
+        if version <= self.version:
+            return []
+        
+        self.pending[version] = ops
+        return self._drain_pending()
+    
+    def _drain_pending(self) -> List[Tuple[int, List[Dict[str, Any]]]]:
+        applied = []
+        while self.version + 1 in self.pending:
+            version = self.version + 1
+            ops = self.pending.pop(version)
+            self._apply_batch(version, ops)
+            applied.append((version, ops))
+        return applied
+    
+    def skip_gap(self):
+        """Give up on missing versions and apply the pending batches after them"""
+        self.version = min(self.pending) - 1
+        # Deltas cannot span the missing versions
+        self.ops_log.clear()
+        self.history_start = self.version
+        self._drain_pending()
+    
+    def adopt(self, snapshot: Dict[str, Any]) -> bool:
+        """
+        Take over a complete copy's state from its snapshot
+        
+        Batches this copy applied after the snapshot's version are replayed
+        on top of it.
+        
+        Returns:
+            False if some of those batches are no longer logged, so the
+            snapshot cannot be used
+        """
+        version = snapshot["version"]
+        if version < self.version and (not self.ops_log or self.ops_log[0][0] > version + 1):
+            return False
+        
+        self.epoch = snapshot["epoch"]
+        self.data = {**self._initial_data(), **snapshot["state"]}
+        self.chat.clear()
+        self.chat.extend(snapshot.get("recent_chat", []))
+        self.chat_seq = self.chat[-1]["seq"] if self.chat else 0
+        
+        if version >= self.version:
+            self.version = self.history_start = version
+            self.ops_log.clear()
+            for pending_version in [v for v in self.pending if v <= version]:
+                del self.pending[pending_version]
+        else:
+            for logged_version, ops in self.ops_log:
+                if logged_version > version:
+                    self._apply_ops(logged_version, ops)
+        
+        self.started = self.complete = True
+        self._drain_pending()
+        return True
+    
+    def delta_since(self, epoch: Optional[str], version: Optional[int]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the operation batches applied after a client's last seen version
+        
+        Returns:
+            List of {"version", "ops"} entries, or None if a full snapshot is needed
+        """
+        if (
+            not self.started or epoch != self.epoch or version is None
+            or version > self.version or version < self.history_start
+        ):
+            return None
+        if version == self.version:
+            return []
+        if not self.ops_log or version < self.ops_log[0][0] - 1:
+            return None
+        
+        return [
+            {"version": entry_version, "ops": ops}
+            for entry_version, ops in self.ops_log
+            if entry_version > version
+        ]
+    
+    def snapshot(self, recent_chat: int = 20) -> Dict[str, Any]:
+        """Get a full state snapshot with only the most recent chat messages"""
+        return {
+            "epoch": self.epoch,
+            "version": self.version,
+            "state": self.data,
+            "recent_chat": list(self.chat)[-recent_chat:] if recent_chat else []
+        }
+    
+    def chat_page(self, before: Optional[int] = None, limit: int = 50) -> Dict[str, Any]:
+        """Get up to limit chat messages older than the before sequence number"""
+        older = [
+            message for message in self.chat
+            if before is None or message["seq"] < before
+        ]
+        page = older[-limit:] if limit > 0 else []
+        return {
+            "messages": page,
+            "has_more": len(older) > len(page)
+        }
+
+
+class EnqueueResult(Enum):
+    """Outcome of enqueueing a message for one connection"""
+    QUEUED = "queued"
+    DROPPED = "dropped"  # A message was dropped by the slow-consumer policy
+    GONE = "gone"        # The connection is already closed
+    SLOW = "slow"        # The connection must be disconnected as a slow consumer
+
+
+class OutboundConnection:
+    """
+    Bounded outbound queue with a dedicated writer task for one websocket
+    
+    Senders only enqueue; the writer drains the queue so a slow or stalled
+    socket never blocks delivery to the rest of the session.
+    """
+    
+    def __init__(self, websocket: WebSocket, max_queue_size: int, codec: WireCodec = JSON_CODEC):
+        self.websocket = websocket
+        self.codec = codec
+        self.queue: deque = deque()
+        self.max_queue_size = max_queue_size
+        self.ready = asyncio.Event()
+        self.writer_task: Optional[asyncio.Task] = None
+        
+        # Send metrics
+        self.messages_enqueued = 0
+        self.messages_sent = 0
+        self.messages_dropped = 0
+        self.last_send_lag_ms = 0.0
+        self.max_send_lag_ms = 0.0
+        self.total_send_lag_ms = 0.0
+    
+    @property
+    def is_full(self) -> bool:
+        return len(self.queue) >= self.max_queue_size
+    
+    def enqueue(self, payload: Payload, is_state: bool = False):
+        """Append a serialized message and wake the writer"""
+        self.queue.append((payload, time.monotonic(), is_state))
+        self.messages_enqueued += 1
+        self.ready.set()
+    
+    def drop_oldest(self) -> bool:
+        """
+        Discard the oldest queued message that is not a state frame
+        
+        Returns:
+            False if every queued message is a state frame, so none was dropped
+        """
+        for index, (_, _, is_state) in enumerate(self.queue):
+            if not is_state:
+                del self.queue[index]
+                self.messages_dropped += 1
+                return True
+        return False
+    
+    def record_send(self, enqueued_at: float):
+        lag_ms = (time.monotonic() - enqueued_at) * 1000
+        self.messages_sent += 1
+        self.last_send_lag_ms = lag_ms
+        self.max_send_lag_ms = max(self.max_send_lag_ms, lag_ms)
+        self.total_send_lag_ms += lag_ms
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get send-lag metrics for this connection"""
+        oldest_lag_ms = 0.0
+        if self.queue:
+            oldest_lag_ms = (time.monotonic() - self.queue[0][1]) * 1000
+        
+        return {
+            "encoding": self.codec.name,
+            "queue_depth": len(self.queue),
+            "max_queue_size": self.max_queue_size,
+            "messages_enqueued": self.messages_enqueued,
+            "messages_sent": self.messages_sent,
+            "messages_dropped": self.messages_dropped,
+            "oldest_queued_lag_ms": round(oldest_lag_ms, 2),
+            "last_send_lag_ms": round(self.last_send_lag_ms, 2),
+            "max_send_lag_ms": round(self.max_send_lag_ms, 2),
+            "avg_send_lag_ms": round(
+                self.total_send_lag_ms / self.messages_sent, 2
+            ) if self.messages_sent else 0.0
+        }
+
 
 class CollaborativeConnectionManager:
     """Manages WebSocket connections for collaborative sessions"""
     
-    def __init__(self):
+    # Slow-consumer policies applied when an outbound queue is full
+    POLICY_DROP_OLDEST = "drop_oldest"
+    POLICY_DROP_NEWEST = "drop_newest"
+    POLICY_DISCONNECT = "disconnect"
+    
+    def __init__(
+        self,
+        max_outbound_queue: int = 256,
+        send_timeout: float = 5.0,
+        slow_consumer_policy: str = POLICY_DROP_OLDEST,
+        history_size: int = 50,
+        state_sync_timeout: float = 2.0
+    ):
         # Session ID -> Set of WebSocket connections
         self.session_connections: Dict[str, Set[WebSocket]] = {}
         # WebSocket -> User info
         self.connection_info: Dict[WebSocket, Dict[str, Any]] = {}
-        # Session ID -> Session state
-        self.session_states: Dict[str, Dict[str, Any]] = {}
+        # Session ID -> Versioned session state
+        self.session_states: Dict[str, SessionState] = {}
         # User ID -> WebSocket connections (for direct messaging)
         self.user_connections: Dict[str, Set[WebSocket]] = {}
+        # WebSocket -> Outbound queue and writer task
+        self.outbound: Dict[WebSocket, OutboundConnection] = {}
+        
+        # Slow-consumer handling
+        self.max_outbound_queue = max_outbound_queue
+        self.send_timeout = send_timeout
+        self.slow_consumer_policy = slow_consumer_policy
+        self.slow_consumer_disconnects = 0
+        
+        # Per-user practice and feedback history kept in session state
+        self.history_size = history_size
+        
+        # Cross-worker fan-out (None = single process)
+        self.backplane: Optional[SessionBackplane] = None
+        self._awaiting_snapshot: Set[str] = set()
+        # How long a state copy waits for a missing batch or a peer snapshot
+        self.state_sync_timeout = state_sync_timeout
+        self._recovery_tasks: Dict[str, asyncio.Task] = {}
+    
+    async def set_backplane(self, backplane: Optional[SessionBackplane]):
+        """
+        Attach a backplane so sessions can span multiple workers
+        
+        Attach it before sessions start: states created without one number
+        their versions locally.
+        """
+        if self.backplane:
+            await self.backplane.stop()
+        
+        self.backplane = backplane
+        if backplane is None:
+            return
+        
+        await backplane.start()
+        for session_id in self.session_connections:
+            await backplane.subscribe(f"session:{session_id}", self._handle_session_event)
+        for user_id in self.user_connections:
+            await backplane.subscribe(f"user:{user_id}", self._handle_user_event)
+        logger.info(f"Collaborative backplane enabled: {type(backplane).__name__}")
+    
+    async def _publish(self, channel: str, event: Dict[str, Any]):
+        """Publish an event to other workers, if a backplane is attached"""
+        if not self.backplane:
+            return
+        
+        try:
+            await self.backplane.publish(channel, event)
+        except Exception as e:
+            logger.error(f"Backplane publish failed on {channel}: {e}")
+    
+    async def _handle_session_event(self, channel: str, event: Dict[str, Any]):
+        """Apply a session event published by another worker"""
+        session_id = channel[len("session:"):]
+        if session_id not in self.session_connections:
+            return
+        
+        session_state = self.session_states[session_id]
+        kind = event.get("kind")
+        if kind == "broadcast":
+            await self._disconnect_slow_consumers(
+                self._deliver_to_session(session_id, event["message"])
+            )
+        elif kind == "state_ops":
+            await self._apply_versioned(session_id, event["version"], event["ops"])
+        elif kind == "state_request" and session_state.complete:
+            await self._publish(channel, {
+                "kind": "state_snapshot",
+                "snapshot": session_state.snapshot(recent_chat=session_state.chat.maxlen)
+            })
+        elif kind == "state_snapshot" and session_id in self._awaiting_snapshot:
+            if session_state.adopt(event["snapshot"]):
+                self._awaiting_snapshot.discard(session_id)
+                await self._disconnect_slow_consumers(
+                    self._deliver_to_session(session_id, self._sync_message(session_id))
+                )
+    
+    async def _handle_user_event(self, channel: str, event: Dict[str, Any]):
+        """Deliver a direct message published by another worker"""
+        user_id = channel[len("user:"):]
+        if event.get("kind") == "direct":
+            payloads: Dict[str, Payload] = {}
+            slow_websockets = [
+                websocket for websocket in self.user_connections.get(user_id, ())
+                if self._enqueue_message(websocket, event["message"], payloads) is EnqueueResult.SLOW
+            ]
+            await self._disconnect_slow_consumers(slow_websockets)
+    
+    def _sync_message(self, session_id: str) -> Dict[str, Any]:
+        """Full state message that resynchronizes every client of a session"""
+        return {
+            "type": "session_sync",
+            "session_id": session_id,
+            **self.session_states[session_id].snapshot(),
+            "participants": self.get_session_participants(session_id),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    
+    async def _deliver_changes(
+        self,
+        session_id: str,
+        applied: List[Tuple[int, List[Dict[str, Any]]]],
+        exclude_websocket: Optional[WebSocket] = None
+    ):
+        """Push applied state batches to the session's local clients as one delta"""
+        if not applied:
+            return
+        
+        await self._disconnect_slow_consumers(self._deliver_to_session(session_id, {
+            "type": "session_delta",
+            "session_id": session_id,
+            "epoch": self.session_states[session_id].epoch,
+            "from_version": applied[0][0] - 1,
+            "version": applied[-1][0],
+            "changes": [{"version": version, "ops": ops} for version, ops in applied],
+            "timestamp": datetime.utcnow().isoformat()
+        }, exclude_websocket))
+    
+    async def _apply_versioned(
+        self,
+        session_id: str,
+        version: int,
+        ops: List[Dict[str, Any]],
+        exclude_websocket: Optional[WebSocket] = None
+    ):
+        """Apply a batch numbered by the backplane and push what became applicable"""
+        session_state = self.session_states.get(session_id)
+        if session_state is None:
+            return
+        
+        applied = session_state.apply_at(version, ops)
+        if session_state.pending:
+            self._start_recovery(session_id)
+        await self._deliver_changes(session_id, applied, exclude_websocket)
+    
+    def _start_recovery(self, session_id: str):
+        if session_id not in self._recovery_tasks:
+            self._recovery_tasks[session_id] = asyncio.create_task(self._recover_state(session_id))
+    
+    async def _recover_state(self, session_id: str):
+        """
+        Resolve a missing state batch or an unanswered snapshot request
+        
+        A batch still missing after state_sync_timeout is requested from the
+        other workers as a snapshot. If that does not resolve it within
+        another timeout this copy carries on alone: a session no other worker
+        holds starts afresh here, and missing batches are skipped.
+        """
+        channel = f"session:{session_id}"
+        try:
+            await asyncio.sleep(self.state_sync_timeout)
+            session_state = self.session_states.get(session_id)
+            if session_state is None or not (session_state.pending or session_id in self._awaiting_snapshot):
+                return
+            if session_state.pending and session_id not in self._awaiting_snapshot:
+                self._awaiting_snapshot.add(session_id)
+                await self._publish(channel, {"kind": "state_request"})
+                await asyncio.sleep(self.state_sync_timeout)
+                session_state = self.session_states.get(session_id)
+                if session_state is None:
+                    return
+            
+            self._awaiting_snapshot.discard(session_id)
+            session_state.complete = True
+            if session_state.pending:
+                logger.warning(f"Skipping missing state versions in session {session_id}")
+                session_state.skip_gap()
+                await self._disconnect_slow_consumers(
+                    self._deliver_to_session(session_id, self._sync_message(session_id))
+                )
+        finally:
+            if self._recovery_tasks.get(session_id) is asyncio.current_task():
+                del self._recovery_tasks[session_id]
     
     async def connect_to_session(
         self, 
         websocket: WebSocket, 
         session_id: str, 
         user_id: str, 
-        username: str
+        username: str,
+        state_epoch: Optional[str] = None,
+        last_version: Optional[int] = None
     ):
-        """Connect a user to a collaborative session"""
-        await websocket.accept()
+        """
+        Connect a user to a collaborative session
+        
+        A reconnecting client that passes the state epoch and last version it
+        saw receives only the changes since then instead of the full state.
+        """
+        codec = await accept_with_codec(websocket)
+        self._open_outbound(websocket, codec)
         
         # Initialize session connections if needed
         if session_id not in self.session_connections:
             self.session_connections[session_id] = set()
-            self.session_states[session_id] = {
-                "participants": {},
-                "current_sentence": 0,
-                "session_status": "waiting",
-                "story_content": None,
-                "practice_data": {},
-                "chat_messages": [],
-                "peer_feedback": {}
-            }
+            if self.backplane:
+                session_state = SessionState(shared=True)
+                self.session_states[session_id] = session_state
+                channel = f"session:{session_id}"
+                await self.backplane.subscribe(channel, self._handle_session_event)
+                session_state.epoch, created = await self.backplane.shared_epoch(channel)
+                if created:
+                    session_state.complete = True
+                else:
+                    # Other workers may already host this session
+                    self._awaiting_snapshot.add(session_id)
+                    await self._publish(channel, {"kind": "state_request"})
+                    self._start_recovery(session_id)
+            else:
+                self.session_states[session_id] = SessionState()
         
         # Add connection
         self.session_connections[session_id].add(websocket)
@@ -70,16 +572,22 @@ class CollaborativeConnectionManager:
         # Add to user connections
         if user_id not in self.user_connections:
             self.user_connections[user_id] = set()
+            if self.backplane:
+                await self.backplane.subscribe(f"user:{user_id}", self._handle_user_event)
         self.user_connections[user_id].add(websocket)
         
-        # Update session state
-        self.session_states[session_id]["participants"][user_id] = {
-            "username": username,
-            "connected_at": datetime.utcnow().isoformat(),
-            "status": "connected",
-            "current_sentence": 0,
-            "performance": {}
-        }
+        # Update session state; the new participant gets the result in its snapshot below
+        await self.apply_state_ops(session_id, [{
+            "op": "set",
+            "path": ["participants", user_id],
+            "value": {
+                "username": username,
+                "connected_at": datetime.utcnow().isoformat(),
+                "status": "connected",
+                "current_sentence": 0,
+                "performance": {}
+            }
+        }], exclude_websocket=websocket)
         
         # Notify other participants
         await self.broadcast_to_session(session_id, {
@@ -87,62 +595,210 @@ class CollaborativeConnectionManager:
             "user_id": user_id,
             "username": username,
             "timestamp": datetime.utcnow().isoformat(),
-            "participant_count": len(self.session_states[session_id]["participants"])
+            "participant_count": len(self.session_states[session_id].data["participants"])
         }, exclude_websocket=websocket)
         
-        # Send current session state to new participant
-        await self.send_to_websocket(websocket, {
+        # Send current session state (or the delta since last seen) to new participant
+        await self.send_state(websocket, session_id, state_epoch, last_version, {
             "type": "session_state",
-            "session_id": session_id,
-            "state": self.session_states[session_id],
-            "your_user_id": user_id,
-            "timestamp": datetime.utcnow().isoformat()
+            "your_user_id": user_id
         })
         
         logger.info(f"User {user_id} connected to collaborative session {session_id}")
     
     async def disconnect_from_session(self, websocket: WebSocket):
         """Disconnect a user from their collaborative session"""
-        if websocket not in self.connection_info:
+        self._close_outbound(websocket)
+        
+        connection_info = self.connection_info.pop(websocket, None)
+        if connection_info is None:
             return
         
-        connection_info = self.connection_info[websocket]
         session_id = connection_info["session_id"]
         user_id = connection_info["user_id"]
         username = connection_info["username"]
         
+        # Remove from user connections
+        if user_id in self.user_connections:
+            self.user_connections[user_id].discard(websocket)
+            if not self.user_connections[user_id]:
+                del self.user_connections[user_id]
+                if self.backplane:
+                    await self.backplane.unsubscribe(f"user:{user_id}")
+        
         # Remove from session connections
         if session_id in self.session_connections:
             self.session_connections[session_id].discard(websocket)
             
             # Remove participant from session state
-            if user_id in self.session_states[session_id]["participants"]:
-                del self.session_states[session_id]["participants"][user_id]
+            await self.apply_state_ops(session_id, [{
+                "op": "delete",
+                "path": ["participants", user_id]
+            }])
             
-            # Clean up empty sessions
-            if not self.session_connections[session_id]:
+            # Notify remaining participants
+            session_state = self.session_states.get(session_id)
+            await self.broadcast_to_session(session_id, {
+                "type": "participant_left",
+                "user_id": user_id,
+                "username": username,
+                "timestamp": datetime.utcnow().isoformat(),
+                "participant_count": len(session_state.data["participants"]) if session_state else 0
+            })
+            
+            # Clean up sessions with no local connections; another disconnect may have done it while this one awaited
+            if session_id in self.session_connections and not self.session_connections[session_id]:
                 del self.session_connections[session_id]
                 del self.session_states[session_id]
-            else:
-                # Notify remaining participants
-                await self.broadcast_to_session(session_id, {
-                    "type": "participant_left",
-                    "user_id": user_id,
-                    "username": username,
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "participant_count": len(self.session_states[session_id]["participants"])
-                })
+                self._awaiting_snapshot.discard(session_id)
+                recovery_task = self._recovery_tasks.pop(session_id, None)
+                if recovery_task and recovery_task is not asyncio.current_task():
+                    recovery_task.cancel()
+                if self.backplane:
+                    await self.backplane.unsubscribe(f"session:{session_id}")
         
-        # Remove from user connections
-        if user_id in self.user_connections:
-            self.user_connections[user_id].discard(websocket)
-            if not self.user_connections[user_id]:
-                del self.user_connections[user_id]
+        logger.info(f"User {user_id} disconnected from collaborative session {session_id}")
+    
+    def _open_outbound(self, websocket: WebSocket, codec: WireCodec = JSON_CODEC):
+        """Create the outbound queue and writer task for a websocket"""
+        outbound = OutboundConnection(websocket, self.max_outbound_queue, codec)
+        outbound.writer_task = asyncio.create_task(self._writer_loop(outbound))
+        self.outbound[websocket] = outbound
+    
+    def _close_outbound(self, websocket: WebSocket):
+        """Stop the writer task for a websocket and drop queued messages"""
+        outbound = self.outbound.pop(websocket, None)
+        if outbound is None:
+            return
         
-        # Remove connection info
-        del self.connection_info[websocket]
+        outbound.queue.clear()
+        if outbound.writer_task and outbound.writer_task is not asyncio.current_task():
+            outbound.writer_task.cancel()
+    
+    async def _writer_loop(self, outbound: OutboundConnection):
+        """Drain a connection's outbound queue onto its websocket"""
+        websocket = outbound.websocket
+        try:
+            while True:
+                if not outbound.queue:
+                    outbound.ready.clear()
+                    await outbound.ready.wait()
+                    continue
+                
+                payload, enqueued_at, _ = outbound.queue.popleft()
+                async with asyncio.timeout(self.send_timeout):
+                    await outbound.codec.send(websocket, payload)
+                outbound.record_send(enqueued_at)
         
-        logger.info(f"User {user_id} disconnected from collaborative session {session_id}")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Outbound writer failed for websocket: {e}")
+            await self.disconnect_from_session(websocket)
+    
+    def get_codec(self, websocket: WebSocket) -> WireCodec:
+        """Get the wire codec negotiated by a websocket"""
+        outbound = self.outbound.get(websocket)
+        return outbound.codec if outbound else JSON_CODEC
+    
+    def _encode_for(
+        self,
+        websocket: WebSocket,
+        message: Dict[str, Any],
+        payloads: Dict[str, Payload]
+    ) -> Payload:
+        """Encode a message for a websocket, reusing payloads already built per codec"""
+        codec = self.get_codec(websocket)
+        if codec.name not in payloads:
+            payloads[codec.name] = codec.encode(message)
+        return payloads[codec.name]
+    
+    async def receive_message(self, websocket: WebSocket) -> Any:
+        """
+        Receive and decode the next message from a websocket
+        
+        Raises:
+            WebSocketDisconnect: If the client disconnected
+            ValueError: If the message could not be decoded
+        """
+        return await self.get_codec(websocket).receive(websocket)
+    
+    def _enqueue(self, websocket: WebSocket, payload: Payload, is_state: bool = False) -> EnqueueResult:
+        """
+        Enqueue a serialized message for a websocket
+        
+        State frames are never dropped: under either drop policy a queued
+        non-state message makes room instead, and a queue holding nothing
+        but state frames marks the connection as a slow consumer, since
+        losing one would leave the client's state silently wrong.
+        """
+        outbound = self.outbound.get(websocket)
+        if outbound is None:
+            return EnqueueResult.GONE
+        
+        result = EnqueueResult.QUEUED
+        if outbound.is_full:
+            if self.slow_consumer_policy == self.POLICY_DISCONNECT:
+                self.slow_consumer_disconnects += 1
+                return EnqueueResult.SLOW
+            if self.slow_consumer_policy == self.POLICY_DROP_NEWEST and not is_state:
+                outbound.messages_dropped += 1
+                return EnqueueResult.DROPPED
+            if not outbound.drop_oldest():
+                self.slow_consumer_disconnects += 1
+                return EnqueueResult.SLOW
+            result = EnqueueResult.DROPPED
+        
+        outbound.enqueue(payload, is_state)
+        return result
+    
+    def _enqueue_message(
+        self,
+        websocket: WebSocket,
+        message: Dict[str, Any],
+        payloads: Dict[str, Payload]
+    ) -> EnqueueResult:
+        """Encode (once per codec) and enqueue a message for a websocket"""
+        return self._enqueue(
+            websocket,
+            self._encode_for(websocket, message, payloads),
+            message.get("type") in STATE_MESSAGE_TYPES
+        )
+    
+    async def _disconnect_slow_consumers(self, websockets: List[WebSocket]):
+        """Disconnect websockets that exceeded their outbound queue"""
+        for websocket in websockets:
+            if websocket not in self.outbound:
+                # Already disconnected while an earlier one was closing
+                continue
+            logger.warning("Disconnecting slow consumer in collaborative session")
+            try:
+                await websocket.close(code=1013)
+            except Exception as e:
+                logger.debug(f"Error closing slow consumer websocket: {e}")
+            await self.disconnect_from_session(websocket)
+    
+    def _deliver_to_session(
+        self,
+        session_id: str,
+        message: Dict[str, Any],
+        exclude_websocket: Optional[WebSocket] = None
+    ) -> List[WebSocket]:
+        """
+        Enqueue a message for every local connection in a session
+        
+        The message is serialized once per codec in use and the payload is
+        shared by all connections with that codec.
+        
+        Returns:
+            Websockets that must be disconnected as slow consumers
+        """
+        payloads: Dict[str, Payload] = {}
+        return [
+            websocket for websocket in self.session_connections.get(session_id, ())
+            if websocket != exclude_websocket
+            and self._enqueue_message(websocket, message, payloads) is EnqueueResult.SLOW
+        ]
     
     async def broadcast_to_session(
         self, 
@@ -154,49 +810,51 @@ class CollaborativeConnectionManager:
         if session_id not in self.session_connections:
             return
         
-        message_text = json.dumps(message)
-        disconnected_websockets = []
-        
-        for websocket in self.session_connections[session_id]:
-            if websocket == exclude_websocket:
-                continue
-            
-            try:
-                await websocket.send_text(message_text)
-            except Exception as e:
-                logger.warning(f"Failed to send message to websocket in session {session_id}: {e}")
-                disconnected_websockets.append(websocket)
+        slow_websockets = self._deliver_to_session(session_id, message, exclude_websocket)
         
-        # Clean up disconnected websockets
-        for websocket in disconnected_websockets:
-            await self.disconnect_from_session(websocket)
+        await self._publish(f"session:{session_id}", {"kind": "broadcast", "message": message})
+        await self._disconnect_slow_consumers(slow_websockets)
     
     async def send_to_websocket(self, websocket: WebSocket, message: Dict[str, Any]):
         """Send a message to a specific websocket"""
         try:
-            await websocket.send_text(json.dumps(message))
-        except Exception as e:
-            logger.warning(f"Failed to send message to websocket: {e}")
-            await self.disconnect_from_session(websocket)
+            result = self._enqueue_message(websocket, message, {})
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Failed to serialize message for websocket: {e}")
+            return
+        
+        if result is EnqueueResult.SLOW:
+            await self._disconnect_slow_consumers([websocket])
     
     async def send_to_user(self, user_id: str, message: Dict[str, Any]):
         """Send a message to all connections of a specific user"""
+        await self._publish(f"user:{user_id}", {"kind": "direct", "message": message})
+        
         if user_id not in self.user_connections:
             return
         
-        message_text = json.dumps(message)
-        disconnected_websockets = []
-        
-        for websocket in self.user_connections[user_id]:
-            try:
-                await websocket.send_text(message_text)
-            except Exception as e:
-                logger.warning(f"Failed to send message to user {user_id}: {e}")
-                disconnected_websockets.append(websocket)
+        payloads: Dict[str, Payload] = {}
+        slow_websockets = [
+            websocket for websocket in self.user_connections[user_id]
+            if self._enqueue_message(websocket, message, payloads) is EnqueueResult.SLOW
+        ]
         
-        # Clean up disconnected websockets
-        for websocket in disconnected_websockets:
-            await self.disconnect_from_session(websocket)
+        await self._disconnect_slow_consumers(slow_websockets)
+    
+    def get_connection_metrics(self, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get per-connection send-lag metrics, optionally for one session"""
+        metrics = []
+        for websocket, outbound in self.outbound.items():
+            info = self.connection_info.get(websocket, {})
+            if session_id and info.get("session_id") != session_id:
+                continue
+            
+            metrics.append({
+                "session_id": info.get("session_id"),
+                "user_id": info.get("user_id"),
+                **outbound.get_metrics()
+            })
+        return metrics
     
     def get_session_participants(self, session_id: str) -> List[Dict[str, Any]]:
         """Get list of participants in a session"""
@@ -208,13 +866,99 @@ class CollaborativeConnectionManager:
                 "user_id": user_id,
                 **participant_data
             }
-            for user_id, participant_data in self.session_states[session_id]["participants"].items()
+            for user_id, participant_data in self.session_states[session_id].data["participants"].items()
         ]
     
-    def update_session_state(self, session_id: str, updates: Dict[str, Any]):
+    async def apply_state_ops(
+        self,
+        session_id: str,
+        ops: List[Dict[str, Any]],
+        exclude_websocket: Optional[WebSocket] = None
+    ) -> Optional[int]:
+        """
+        Apply state operations, replicate them to other workers and push them to local clients
+        
+        With a backplane the batch takes its version from the shared counter,
+        so every worker applies it as the same version. The excluded websocket
+        gets no delta for what this call applies.
+        
+        Returns:
+            The batch's version, or None if the session is not hosted here or
+            no version could be allocated, in which case nothing is applied
+        """
+        session_state = self.session_states.get(session_id)
+        if session_state is None:
+            return None
+        
+        if not self.backplane:
+            version = session_state.apply(ops)
+            await self._deliver_changes(session_id, [(version, ops)], exclude_websocket)
+            return version
+        
+        channel = f"session:{session_id}"
+        try:
+            version = await self.backplane.next_version(channel)
+        except Exception as e:
+            logger.error(f"Backplane version allocation failed on {channel}: {e}")
+            return None
+        
+        await self._apply_versioned(session_id, version, ops, exclude_websocket)
+        await self._publish(channel, {"kind": "state_ops", "version": version, "ops": ops})
+        return version
+    
+    async def add_chat_message(self, session_id: str, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Append a chat message to the session ring buffer and return the stored entry
+        
+        Returns None if the session is not hosted here or the message waits
+        behind a missing state batch.
+        """
+        version = await self.apply_state_ops(session_id, [{"op": "chat", "value": message}])
+        session_state = self.session_states.get(session_id)
+        if version is None or session_state is None:
+            return None
+        
+        return next((entry for entry in reversed(session_state.chat) if entry["version"] == version), None)
+    
+    async def send_state(
+        self,
+        websocket: WebSocket,
+        session_id: str,
+        state_epoch: Optional[str],
+        last_version: Optional[int],
+        full_message: Dict[str, Any]
+    ):
+        """Send a state delta when the client is close enough, else a full snapshot"""
+        session_state = self.session_states.get(session_id)
+        if session_state is None:
+            return
+        
+        changes = session_state.delta_since(state_epoch, last_version)
+        if changes is not None:
+            message = {
+                "type": "session_delta",
+                "session_id": session_id,
+                "epoch": session_state.epoch,
+                "from_version": last_version,
+                "version": session_state.version,
+                "changes": changes
+            }
+        else:
+            message = {
+                **full_message,
+                "session_id": session_id,
+                **session_state.snapshot()
+            }
+        
+        message["timestamp"] = datetime.utcnow().isoformat()
+        await self.send_to_websocket(websocket, message)
+    
+    async def update_session_state(self, session_id: str, updates: Dict[str, Any]):
         """Update session state"""
-        if session_id in self.session_states:
-            self.session_states[session_id].update(updates)
+        await self.apply_state_ops(session_id, [
+            {"op": "set", "path": [key], "value": value}
+            for key, value in updates.items()
+        ])
 
 
 # Global connection manager instance
@@ -231,24 +975,29 @@ async def collaborative_websocket_endpoint(
     websocket: WebSocket,
     session_id: str,
     user_id: str = "user_123",  # Would come from auth
-    username: str = "TestUser"  # Would come from user profile
+    username: str = "TestUser",  # Would come from user profile
+    epoch: Optional[str] = None,
+    last_version: Optional[int] = None
 ):
     """
     WebSocket endpoint for collaborative sessions
     Handles real-time synchronization, peer feedback, and session coordination
+    
+    Reconnecting clients pass the state epoch and last version they saw to
+    receive a delta instead of the full session state.
     """
     try:
         # Connect to session
         await collaborative_manager.connect_to_session(
-            websocket, session_id, user_id, username
+            websocket, session_id, user_id, username,
+            state_epoch=epoch, last_version=last_version
         )
         
         # Main message processing loop
         while True:
             try:
-                # Receive message from client
-                message_text = await websocket.receive_text()
-                message_data = json.loads(message_text)
+                # Receive and decode message from client
+                message_data = await collaborative_manager.receive_message(websocket)
                 
                 await handle_collaborative_message(
                     websocket, session_id, user_id, message_data
@@ -257,11 +1006,11 @@ async def collaborative_websocket_endpoint(
             except WebSocketDisconnect:
                 logger.info(f"User {user_id} disconnected from session {session_id}")
                 break
-            except json.JSONDecodeError as e:
-                logger.warning(f"Invalid JSON from user {user_id} in session {session_id}: {e}")
+            except ValueError as e:
+                logger.warning(f"Invalid message from user {user_id} in session {session_id}: {e}")
                 await collaborative_manager.send_to_websocket(websocket, {
                     "type": "error",
-                    "message": "Invalid JSON format",
+                    "message": "Invalid message format",
                     "timestamp": datetime.utcnow().isoformat()
                 })
             except Exception as e:
@@ -312,7 +1061,11 @@ async def handle_collaborative_message(
     
     elif message_type == "sync_request":
         # Request session synchronization
-        await handle_sync_request(websocket, session_id, user_id)
+        await handle_sync_request(websocket, session_id, user_id, message_data)
+    
+    elif message_type == "chat_history":
+        # Fetch older chat messages
+        await handle_chat_history(websocket, session_id, message_data)
     
     elif message_type == "session_control":
         # Session control (pause, resume, next sentence, etc.)
@@ -334,7 +1087,7 @@ async def handle_start_practice(session_id: str, user_id: str, message_data: Dic
         return
     
     # Update session state
-    collaborative_manager.update_session_state(session_id, {
+    await collaborative_manager.update_session_state(session_id, {
         "session_status": "active",
         "story_content": story_content,
         "current_sentence": 0,
@@ -360,21 +1113,26 @@ async def handle_sentence_progress(session_id: str, user_id: str, message_data:
     # Update user's progress in session state
     if session_id in collaborative_manager.session_states:
         session_state = collaborative_manager.session_states[session_id]
-        if user_id in session_state["participants"]:
-            session_state["participants"][user_id]["current_sentence"] = sentence_index
-            session_state["participants"][user_id]["performance"] = performance_data
+        ops = []
+        if user_id in session_state.data["participants"]:
+            ops.append({
+                "op": "merge",
+                "path": ["participants", user_id],
+                "value": {"current_sentence": sentence_index, "performance": performance_data}
+            })
         
         # Store practice data
-        if "practice_data" not in session_state:
-            session_state["practice_data"] = {}
-        if user_id not in session_state["practice_data"]:
-            session_state["practice_data"][user_id] = []
-        
-        session_state["practice_data"][user_id].append({
-            "sentence_index": sentence_index,
-            "performance": performance_data,
-            "timestamp": datetime.utcnow().isoformat()
+        ops.append({
+            "op": "append",
+            "path": ["practice_data", user_id],
+            "value": {
+                "sentence_index": sentence_index,
+                "performance": performance_data,
+                "timestamp": datetime.utcnow().isoformat()
+            },
+            "max_len": collaborative_manager.history_size
         })
+        await collaborative_manager.apply_state_ops(session_id, ops)
     
     # Broadcast progress to other participants
     await collaborative_manager.broadcast_to_session(session_id, {
@@ -421,20 +1179,18 @@ async def handle_peer_feedback(session_id: str, user_id: str, message_data: Dict
     }
     
     # Store feedback in session state
-    if session_id in collaborative_manager.session_states:
-        session_state = collaborative_manager.session_states[session_id]
-        if "peer_feedback" not in session_state:
-            session_state["peer_feedback"] = {}
-        if target_user_id not in session_state["peer_feedback"]:
-            session_state["peer_feedback"][target_user_id] = []
-        
-        session_state["peer_feedback"][target_user_id].append({
+    await collaborative_manager.apply_state_ops(session_id, [{
+        "op": "append",
+        "path": ["peer_feedback", target_user_id],
+        "value": {
             "from_user_id": user_id,
             "feedback_type": feedback_type,
             "message": feedback_message,
             "sentence_index": sentence_index,
             "timestamp": datetime.utcnow().isoformat()
-        })
+        },
+        "max_len": collaborative_manager.history_size
+    }])
     
     # Send feedback to target user
     await collaborative_manager.send_to_user(target_user_id, feedback_data)
@@ -464,31 +1220,51 @@ async def handle_chat_message(session_id: str, user_id: str, message_data: Dict[
         "timestamp": datetime.utcnow().isoformat()
     }
     
-    # Store in session state
-    if session_id in collaborative_manager.session_states:
-        session_state = collaborative_manager.session_states[session_id]
-        if "chat_messages" not in session_state:
-            session_state["chat_messages"] = []
-        session_state["chat_messages"].append(chat_message)
-        
-        # Keep only last 100 messages
-        if len(session_state["chat_messages"]) > 100:
-            session_state["chat_messages"] = session_state["chat_messages"][-100:]
+    # Store in the session chat ring buffer
+    stored = await collaborative_manager.add_chat_message(session_id, chat_message)
+    if stored is not None:
+        chat_message = stored
     
     # Broadcast to all participants
     await collaborative_manager.broadcast_to_session(session_id, chat_message)
 
 
-async def handle_sync_request(websocket: WebSocket, session_id: str, user_id: str):
+async def handle_sync_request(
+    websocket: WebSocket,
+    session_id: str,
+    user_id: str,
+    message_data: Optional[Dict[str, Any]] = None
+):
     """Handle request for session synchronization"""
+    message_data = message_data or {}
     if session_id in collaborative_manager.session_states:
-        await collaborative_manager.send_to_websocket(websocket, {
-            "type": "session_sync",
-            "session_id": session_id,
-            "state": collaborative_manager.session_states[session_id],
-            "participants": collaborative_manager.get_session_participants(session_id),
-            "timestamp": datetime.utcnow().isoformat()
-        })
+        await collaborative_manager.send_state(
+            websocket,
+            session_id,
+            message_data.get("epoch"),
+            message_data.get("last_version"),
+            {
+                "type": "session_sync",
+                "participants": collaborative_manager.get_session_participants(session_id)
+            }
+        )
+
+
+async def handle_chat_history(websocket: WebSocket, session_id: str, message_data: Dict[str, Any]):
+    """Handle a paginated chat history fetch"""
+    if session_id not in collaborative_manager.session_states:
+        return
+    
+    limit = min(int(message_data.get("limit", 50)), 200)
+    page = collaborative_manager.session_states[session_id].chat_page(
+        message_data.get("before"), limit
+    )
+    await collaborative_manager.send_to_websocket(websocket, {
+        "type": "chat_history",
+        "session_id": session_id,
+        **page,
+        "timestamp": datetime.utcnow().isoformat()
+    })
 
 
 async def handle_session_control(session_id: str, user_id: str, message_data: Dict[str, Any]):
@@ -496,7 +1272,7 @@ async def handle_session_control(session_id: str, user_id: str, message_data: Di
     control_action = message_data.get("action")
     
     if control_action == "pause_session":
-        collaborative_manager.update_session_state(session_id, {
+        await collaborative_manager.update_session_state(session_id, {
             "session_status": "paused",
             "paused_by": user_id,
             "paused_at": datetime.utcnow().isoformat()
@@ -509,7 +1285,7 @@ async def handle_session_control(session_id: str, user_id: str, message_data: Di
         })
     
     elif control_action == "resume_session":
-        collaborative_manager.update_session_state(session_id, {
+        await collaborative_manager.update_session_state(session_id, {
             "session_status": "active",
             "resumed_by": user_id,
             "resumed_at": datetime.utcnow().isoformat()
@@ -525,10 +1301,12 @@ async def handle_session_control(session_id: str, user_id: str, message_data: Di
         # Move all participants to next sentence
         if session_id in collaborative_manager.session_states:
             session_state = collaborative_manager.session_states[session_id]
-            current_sentence = session_state.get("current_sentence", 0)
+            current_sentence = session_state.data.get("current_sentence", 0)
             new_sentence = current_sentence + 1
             
-            session_state["current_sentence"] = new_sentence
+            await collaborative_manager.update_session_state(session_id, {
+                "current_sentence": new_sentence
+            })
             
             await collaborative_manager.broadcast_to_session(session_id, {
                 "type": "sentence_changed",
@@ -538,7 +1316,7 @@ async def handle_session_control(session_id: str, user_id: str, message_data: Di
             })
     
     elif control_action == "end_session":
-        collaborative_manager.update_session_state(session_id, {
+        await collaborative_manager.update_session_state(session_id, {
             "session_status": "completed",
             "ended_by": user_id,
             "ended_at": datetime.utcnow().isoformat()
@@ -547,7 +1325,7 @@ async def handle_session_control(session_id: str, user_id: str, message_data: Di
         await collaborative_manager.broadcast_to_session(session_id, {
             "type": "session_ended",
             "ended_by": user_id,
-            "final_state": collaborative_manager.session_states[session_id],
+            "final_state": collaborative_manager.session_states[session_id].data,
             "timestamp": datetime.utcnow().isoformat()
         })
 
@@ -565,13 +1343,43 @@ async def get_session_participants(session_id: str):
     }
 
 
+@router.get("/sessions/{session_id}/connections")
+async def get_session_connection_metrics(session_id: str):
+    """Get per-connection outbound queue and send-lag metrics for a session"""
+    connections = collaborative_manager.get_connection_metrics(session_id)
+    return {
+        "session_id": session_id,
+        "connections": connections,
+        "slow_consumer_policy": collaborative_manager.slow_consumer_policy,
+        "slow_consumer_disconnects": collaborative_manager.slow_consumer_disconnects
+    }
+
+
+@router.get("/sessions/{session_id}/chat")
+async def get_session_chat_history(session_id: str, before: Optional[int] = None, limit: int = 50):
+    """Get a page of chat history older than the before sequence number"""
+    if session_id not in collaborative_manager.session_states:
+        return {
+            "session_id": session_id,
+            "messages": [],
+            "has_more": False
+        }
+    
+    page = collaborative_manager.session_states[session_id].chat_page(before, min(limit, 200))
+    return {
+        "session_id": session_id,
+        **page
+    }
+
+
 @router.get("/sessions/{session_id}/state")
 async def get_session_state(session_id: str):
     """Get current state of a collaborative session"""
     if session_id in collaborative_manager.session_states:
+        snapshot = collaborative_manager.session_states[session_id].snapshot()
         return {
             "session_id": session_id,
-            "state": collaborative_manager.session_states[session_id],
+            **snapshot,
             "participants": collaborative_manager.get_session_participants(session_id)
         }
     else:
@@ -3,9 +3,10 @@ Database optimization API endpoints
 Provides REST API for database performance monitoring and optimization
 """
 
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Body
 from typing import Dict, Any, List, Optional
 import logging
+from datetime import datetime
 
 from core.database_optimizer import get_database_optimizer, DatabaseOptimizer
 from core.monitoring_service import get_monitoring_service, DatabaseMonitoringService
@@ -210,6 +211,40 @@ async def get_cache_stats(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/cache/prefixes")
+async def get_cache_prefix_stats(
+    cache: CacheService = Depends(get_cache)
+) -> Dict[str, Any]:
+    """
+    Get hits, misses, bytes, evictions, latency and memory estimates per key prefix
+    """
+    try:
+        return cache.get_prefix_stats()
+    except Exception as e:
+        logger.error(f"Failed to get cache prefix stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/cache/prefixes/memory-sample")
+async def sample_cache_memory(
+    sample_size: int = 500,
+    cache: CacheService = Depends(get_cache)
+) -> Dict[str, Any]:
+    """
+    Re-sample MEMORY USAGE of random keys and return the per-prefix estimates
+    """
+    try:
+        if sample_size < 1 or sample_size > 10000:
+            raise HTTPException(status_code=400, detail="sample_size must be between 1 and 10000")
+
+        return await cache.sample_memory_usage(sample_size)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to sample cache memory usage: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/cache/clear")
 async def clear_cache_pattern(
     pattern: str = "*",
@@ -235,6 +270,31 @@ async def clear_cache_pattern(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/cache/invalidate-tags")
+async def invalidate_cache_tags(
+    tags: List[str] = Body(..., embed=True),
+    cache: CacheService = Depends(get_cache)
+) -> Dict[str, Any]:
+    """
+    Delete all cache keys registered under the given tags
+    """
+    try:
+        if not tags:
+            raise HTTPException(status_code=400, detail="At least one tag is required")
+
+        deleted_count = await cache.invalidate_tags(*tags)
+        return {
+            "tags": tags,
+            "deleted_keys": deleted_count,
+            "message": f"Invalidated {deleted_count} cache keys for tags {', '.join(tags)}"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to invalidate cache tags {tags}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/cache/test")
 async def test_cache_operations(
     cache: CacheService = Depends(get_cache)
@@ -277,7 +337,7 @@ async def test_cache_operations(
                 "delete": {"success": delete_result, "time_seconds": delete_time}
             },
             "total_time": set_time + get_time + exists_time + delete_time,
-            "cache_available": cache.is_connected()
+            "cache_available": cache.is_available()
         }
     except Exception as e:
         logger.error(f"Cache test failed: {e}")
@@ -507,6 +567,71 @@ async def get_message_queue_stats() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"Failed to get queue stats: {str(e)}")
 
 
+def _get_queue_or_404(queue_name: str):
+    queue = get_queue_manager().get_queue(queue_name)
+    if not queue:
+        raise HTTPException(status_code=404, detail=f"Queue '{queue_name}' not found")
+    return queue
+
+
+@router.get("/queues/{queue_name}/dead-letters")
+async def get_dead_letters(
+    queue_name: str,
+    limit: int = 100,
+    message_type: Optional[str] = None
+) -> Dict[str, Any]:
+    """Inspect messages that exhausted their retries, newest first"""
+    try:
+        queue = _get_queue_or_404(queue_name)
+        
+        dead_letters = queue.get_dead_letters(limit=limit, message_type=message_type)
+        return {
+            "queue": queue_name,
+            "dead_letters": dead_letters,
+            "count": len(dead_letters),
+            "stats": queue.get_stats()["dead_letter"],
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting dead letters for {queue_name}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get dead letters: {str(e)}")
+
+
+@router.post("/queues/{queue_name}/dead-letters/replay")
+async def replay_dead_letters(
+    queue_name: str,
+    message_ids: Optional[List[str]] = Body(default=None, embed=True),
+    message_type: Optional[str] = None
+) -> Dict[str, Any]:
+    """Re-enqueue dead-lettered messages (all, by ID, or by type)"""
+    try:
+        queue = _get_queue_or_404(queue_name)
+        
+        replayed = await queue.replay_dead_letters(message_ids=message_ids, message_type=message_type)
+        return {
+            "queue": queue_name,
+            "replayed": replayed,
+            "message": f"Replayed {replayed} dead-lettered messages"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error replaying dead letters for {queue_name}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to replay dead letters: {str(e)}")
+
+
+@router.delete("/queues/{queue_name}/dead-letters")
+async def purge_dead_letters(queue_name: str) -> Dict[str, Any]:
+    """Drop every dead-lettered message in a queue"""
+    queue = _get_queue_or_404(queue_name)
+    purged = queue.purge_dead_letters()
+    return {"queue": queue_name, "purged": purged}
+
+
 @router.get("/adaptive-quality/stats")
 async def get_adaptive_quality_stats() -> Dict[str, Any]:
     """Get adaptive quality management statistics"""
@@ -10,6 +10,7 @@ from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from pydantic import BaseModel, Field
 
 from core.service_container import get_service_container
+from core.wire_codec import accept_with_codec
 from services.sync_service import SyncService
 from middleware.auth_middleware import get_current_user
 
@@ -372,7 +373,7 @@ async def websocket_sync_notifications(websocket, session_id: str):
     """
     WebSocket endpoint for real-time synchronization notifications
     """
-    await websocket.accept()
+    codec = await accept_with_codec(websocket)
     
     try:
         while True:
@@ -380,7 +381,7 @@ async def websocket_sync_notifications(websocket, session_id: str):
             # TODO: Implement real-time sync notifications
             
             # For now, just keep connection alive
-            await websocket.receive_text()
+            await codec.receive(websocket)
             
     except Exception as e:
         print(f"WebSocket sync error: {e}")
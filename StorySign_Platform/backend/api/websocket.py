@@ -5,7 +5,6 @@ message queuing, and adaptive quality management
 """
 
 import logging
-import json
 import asyncio
 from datetime import datetime
 from typing import Dict, Any, Optional
@@ -86,6 +85,7 @@ async def websocket_video_endpoint(websocket: WebSocket):
             "server_info": {
                 "version": "2.0.0",
                 "optimization_level": "high_performance",
+                "encoding": connection_pool.get_codec(client_id).name,
                 "max_frame_rate": app_config.video.fps,
                 "supported_formats": [app_config.video.format]
             }
@@ -97,21 +97,18 @@ async def websocket_video_endpoint(websocket: WebSocket):
         # Main message processing loop with optimized handling
         while True:
             try:
-                # Receive message with timeout
-                message_text = await asyncio.wait_for(
-                    websocket.receive_text(),
-                    timeout=60.0
-                )
-                
-                # Parse message
+                # Receive and decode message with timeout
                 try:
-                    message_data = json.loads(message_text)
-                except json.JSONDecodeError as e:
-                    logger.warning(f"Invalid JSON from client {client_id}: {e}")
+                    message_data = await asyncio.wait_for(
+                        connection_pool.receive_message(client_id),
+                        timeout=60.0
+                    )
+                except ValueError as e:
+                    logger.warning(f"Invalid message from client {client_id}: {e}")
                     error_response = {
                         "type": "error",
                         "timestamp": datetime.utcnow().isoformat(),
-                        "message": "Invalid JSON format",
+                        "message": "Invalid message format",
                         "client_id": client_id
                     }
                     await connection_pool.send_message(client_id, error_response, priority=True)
@@ -296,6 +296,27 @@ class CacheConfig(BaseModel):
     key_prefix: str = Field(default="storysign:", description="Cache key prefix")
     enabled: bool = Field(default=True, description="Enable/disable Redis caching")
     
+    # In-process L1 tier
+    l1_enabled: bool = Field(default=True, description="Enable the in-process L1 tier in front of Redis")
+    l1_ttl: int = Field(default=30, ge=1, le=3600, description="Maximum L1 entry lifetime in seconds")
+    l1_max_bytes: int = Field(default=32 * 1024 * 1024, ge=0, description="L1 size limit in bytes")
+    l1_max_entries: int = Field(default=10000, ge=0, description="L1 entry limit")
+    
+    # Value encoding
+    serializer: Optional[str] = Field(default=None, description="Value serializer: msgpack or json (msgpack when installed)")
+    compression: Optional[str] = Field(default="zlib", description="msgpack payload compression: zlib, lz4 or none")
+    compression_threshold: int = Field(default=1024, ge=0, description="Minimum payload size in bytes to compress")
+    
+    # Bulk operations and invalidation
+    scan_batch_size: int = Field(default=1000, ge=1, le=100000, description="Keys per SCAN step and UNLINK")
+    pipeline_batches: int = Field(default=10, ge=1, le=1000, description="UNLINK batches per pipeline")
+    bulk_chunk_size: int = Field(default=500, ge=1, le=100000, description="Keys per pipeline in bulk operations")
+    
+    # Per-prefix observability
+    max_tracked_prefixes: int = Field(default=64, ge=1, le=10000, description="Key prefixes with their own stats row")
+    memory_sample_interval: int = Field(default=300, ge=0, description="Seconds between memory samples (0 disables)")
+    memory_sample_size: int = Field(default=500, ge=1, le=100000, description="Keys sampled per memory estimate")
+    
     @field_validator('host')
     @classmethod
     def validate_host(cls, v):
@@ -303,6 +324,26 @@ class CacheConfig(BaseModel):
         if not v or not v.strip():
             raise ValueError("Redis host cannot be empty")
         return v.strip()
+    
+    @field_validator('serializer')
+    @classmethod
+    def validate_serializer(cls, v):
+        """Validate serializer is supported"""
+        supported_serializers = ['msgpack', 'json']
+        if v is not None and v not in supported_serializers:
+            raise ValueError(f"Cache serializer must be one of {supported_serializers}")
+        return v
+    
+    @field_validator('compression')
+    @classmethod
+    def validate_compression(cls, v):
+        """Validate compression is supported; 'none' disables it"""
+        supported_compressions = ['zlib', 'lz4']
+        if v is None or v == 'none':
+            return None
+        if v not in supported_compressions:
+            raise ValueError(f"Cache compression must be one of {supported_compressions} or none")
+        return v
 
 
 class AuthConfig(BaseModel):
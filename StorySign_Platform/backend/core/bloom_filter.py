@@ -0,0 +1,262 @@
+"""
+Bloom filters for StorySign platform
+Compact, approximate membership tests for sets too large to hold exactly
+"""
+
+import hashlib
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _hash_pair(item: str) -> Tuple[int, int]:
+    """Two independent 64-bit hashes of an item, for double hashing"""
+    digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter
+
+    Sized for capacity items at error_rate false positives; there are no
+    false negatives. Positions come from double hashing one blake2b digest.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size_bits = max(8, int(math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size_bits / self.capacity * math.log(2))))
+        self.bits = bytearray((self.size_bits + 7) // 8)
+        self.count = 0
+
+    def add_hashes(self, hashes: Tuple[int, int]) -> None:
+        h1, h2 = hashes
+        size = self.size_bits
+        bits = self.bits
+        for i in range(self.hash_count):
+            position = (h1 + i * h2) % size
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def has_hashes(self, hashes: Tuple[int, int]) -> bool:
+        # Stops at the first clear bit, so most misses test only a bit or two
+        h1, h2 = hashes
+        size = self.size_bits
+        bits = self.bits
+        for i in range(self.hash_count):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, item: str) -> None:
+        self.add_hashes(_hash_pair(item))
+
+    def __contains__(self, item: str) -> bool:
+        return self.has_hashes(_hash_pair(item))
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    def clear(self) -> None:
+        self.bits = bytearray(len(self.bits))
+        self.count = 0
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.bits)
+
+    def estimated_error_rate(self) -> float:
+        """False positive rate expected at the current fill"""
+        return (1 - math.exp(-self.hash_count * self.count / self.size_bits)) ** self.hash_count
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that grows instead of saturating
+
+    Starts with one filter of initial_capacity; when it fills, a filter
+    with twice the capacity and half the error rate is added. Lookups check
+    every filter, and the tightening keeps the combined false positive rate
+    under error_rate however many items are added.
+    """
+
+    def __init__(self, initial_capacity: int, error_rate: float = 0.001):
+        self.initial_capacity = max(1, initial_capacity)
+        self.error_rate = error_rate
+        self._filters: List[BloomFilter] = []
+
+    def __len__(self) -> int:
+        return sum(bloom.count for bloom in self._filters)
+
+    def add_hashes(self, hashes: Tuple[int, int]) -> None:
+        if not self._filters or self._filters[-1].is_full:
+            index = len(self._filters)
+            self._filters.append(BloomFilter(
+                self.initial_capacity * 2 ** index, self.error_rate * 0.5 ** (index + 1)
+            ))
+        self._filters[-1].add_hashes(hashes)
+
+    def has_hashes(self, hashes: Tuple[int, int]) -> bool:
+        for bloom in self._filters:
+            if bloom.has_hashes(hashes):
+                return True
+        return False
+
+    def add(self, item: str) -> None:
+        self.add_hashes(_hash_pair(item))
+
+    def __contains__(self, item: str) -> bool:
+        return self.has_hashes(_hash_pair(item))
+
+    def clear(self) -> None:
+        # Drop grown filters so memory returns to nothing after a burst
+        self._filters = []
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(bloom.memory_bytes for bloom in self._filters)
+
+    def estimated_error_rate(self) -> float:
+        miss_rate = 1.0
+        for bloom in self._filters:
+            miss_rate *= 1 - bloom.estimated_error_rate()
+        return 1 - miss_rate
+
+
+class RotatingBloomFilter:
+    """
+    Bloom filter of expiring items, partitioned by expiry time
+
+    Each item goes into the partition for the partition_seconds slice its
+    expiry falls in. Once that slice has passed, every item in it has
+    expired and the partition is dropped, so memory tracks the items
+    still live however long the process runs. Partitions are scalable
+    filters, so a burst of items with similar expiries does not saturate
+    one. Items expiring beyond window_seconds from now are kept exactly in
+    a small overflow map.
+
+    A lookup given the item's expiry probes one partition at error_rate.
+    Without it every live partition is probed, so false positives add up
+    across partitions; size such filters with a lower error_rate.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        partition_seconds: float = 60.0,
+        capacity: int = 100000,
+        error_rate: float = 0.001
+    ):
+        self.window_seconds = window_seconds
+        self.partition_seconds = partition_seconds
+        self.partition_count = int(math.ceil(window_seconds / partition_seconds)) + 1
+
+        # capacity is the expected items per window, spread over the partitions it
+        # spans; the headroom keeps an even spread from just tipping into a second filter
+        per_partition = int(math.ceil(1.25 * capacity / (self.partition_count - 1)))
+        self._partitions = [ScalableBloomFilter(per_partition, error_rate) for _ in range(self.partition_count)]
+        self._buckets: List[Optional[int]] = [None] * self.partition_count
+        self._overflow: Dict[str, float] = {}
+
+        self.rotations = 0
+
+    def _bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.partition_seconds)
+
+    def add(self, item: str, expires_at: float, now: Optional[float] = None) -> None:
+        """Add an item until expires_at (epoch seconds)"""
+        now = time.time() if now is None else now
+        if expires_at <= now:
+            return
+
+        bucket = self._bucket(expires_at)
+        if bucket >= self._bucket(now) + self.partition_count:
+            self._overflow[item] = expires_at
+            return
+
+        slot = bucket % self.partition_count
+        if self._buckets[slot] != bucket:
+            # Only an expired slice can share this slot; free any others too
+            current = self._bucket(now)
+            for index, old_bucket in enumerate(self._buckets):
+                if index == slot or (old_bucket is not None and old_bucket < current):
+                    self._partitions[index].clear()
+                    self._buckets[index] = None
+            self._buckets[slot] = bucket
+            self.rotations += 1
+        self._partitions[slot].add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return self.contains(item)
+
+    def contains(self, item: str, expires_at: Optional[float] = None, now: Optional[float] = None) -> bool:
+        """
+        Check an item; False means it was never added or has expired
+
+        expires_at, if known, must be the value the item was added with.
+        """
+        now = time.time() if now is None else now
+        current = self._bucket(now)
+
+        if expires_at is not None:
+            if expires_at <= now:
+                return False
+            bucket = self._bucket(expires_at)
+            slot = bucket % self.partition_count
+            if self._buckets[slot] == bucket and bucket >= current and item in self._partitions[slot]:
+                return True
+        else:
+            hashes = None
+            for partition, bucket in zip(self._partitions, self._buckets):
+                if bucket is None or bucket < current:
+                    continue
+                if hashes is None:
+                    hashes = _hash_pair(item)
+                if partition.has_hashes(hashes):
+                    return True
+
+        if self._overflow:
+            expires_at = self._overflow.get(item)
+            if expires_at is not None:
+                if expires_at > now:
+                    return True
+                del self._overflow[item]
+        return False
+
+    def clear(self) -> None:
+        for partition in self._partitions:
+            partition.clear()
+        self._buckets = [None] * self.partition_count
+        self._overflow.clear()
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(partition.memory_bytes for partition in self._partitions)
+
+    def get_stats(self, now: Optional[float] = None) -> Dict[str, Any]:
+        current = self._bucket(time.time() if now is None else now)
+        live = [
+            partition for partition, bucket in zip(self._partitions, self._buckets)
+            if bucket is not None and bucket >= current
+        ]
+        # An untargeted lookup is a false positive if any live partition reports one
+        miss_rate = 1.0
+        for partition in live:
+            miss_rate *= 1 - partition.estimated_error_rate()
+        return {
+            "partitions": self.partition_count,
+            "live_partitions": len(live),
+            "partition_seconds": self.partition_seconds,
+            "items": sum(len(partition) for partition in live) + len(self._overflow),
+            "overflow_items": len(self._overflow),
+            "memory_bytes": self.memory_bytes,
+            "estimated_false_positive_rate": round(max(
+                (partition.estimated_error_rate() for partition in live), default=0.0
+            ), 6),
+            "estimated_untargeted_false_positive_rate": round(1 - miss_rate, 6),
+            "rotations": self.rotations
+        }
@@ -0,0 +1,134 @@
+"""
+Per-prefix cache metrics for StorySign platform
+Tracks cache traffic by keyspace (stories, progress, sessions, ...) in bounded memory
+"""
+
+from typing import Any, Dict, List, Optional
+
+from .latency_histogram import LatencyHistogram
+
+
+OTHER_PREFIX = "__other__"
+
+
+class PrefixStats:
+    """Counters and latency histogram for one key prefix"""
+
+    __slots__ = (
+        "hits", "misses", "bytes_read", "bytes_written", "writes", "deletes",
+        "evictions", "latency", "sampled_keys", "sampled_bytes"
+    )
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.writes = 0
+        self.deletes = 0
+        self.evictions = 0
+        self.latency = LatencyHistogram()
+
+        # Latest MEMORY USAGE sample
+        self.sampled_keys = 0
+        self.sampled_bytes = 0
+
+    def to_dict(self, total_keys: int = 0, total_samples: int = 0) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "writes": self.writes,
+            "deletes": self.deletes,
+            "l1_evictions": self.evictions,
+            "latency": self.latency.summary()
+        }
+        if total_samples:
+            # Scale the sample up to the whole keyspace
+            estimated_keys = self.sampled_keys * total_keys / total_samples
+            average_bytes = self.sampled_bytes / self.sampled_keys if self.sampled_keys else 0
+            stats["memory"] = {
+                "sampled_keys": self.sampled_keys,
+                "estimated_keys": int(estimated_keys),
+                "average_key_bytes": int(average_bytes),
+                "estimated_bytes": int(estimated_keys * average_bytes)
+            }
+        return stats
+
+
+class PrefixStatsTable:
+    """
+    Fixed-size table of PrefixStats keyed by the key's leading segment
+
+    The prefix of "progress:42:summary" is "progress". Once max_prefixes
+    are tracked, further prefixes share the "__other__" row, so memory is
+    bounded even when keys are built from unbounded data. Updates are plain
+    attribute increments on the event loop thread and need no locking.
+    """
+
+    def __init__(self, max_prefixes: int = 64, separator: str = ":"):
+        self.max_prefixes = max_prefixes
+        self.separator = separator
+        self._rows: Dict[str, PrefixStats] = {}
+
+        self.memory_sampled_at: Optional[str] = None
+        self.memory_total_keys = 0
+        self.memory_samples = 0
+
+    def row(self, key: str) -> PrefixStats:
+        """Get the stats row for a key (without the service key prefix)"""
+        prefix = key.partition(self.separator)[0]
+        row = self._rows.get(prefix)
+        if row is None:
+            if len(self._rows) >= self.max_prefixes:
+                prefix = OTHER_PREFIX
+                row = self._rows.get(prefix)
+            if row is None:
+                row = self._rows[prefix] = PrefixStats()
+        return row
+
+    def record_memory_sample(
+        self,
+        sizes: Dict[str, List[int]],
+        total_keys: int,
+        sampled_at: str
+    ) -> None:
+        """Replace the memory sample with sizes (bytes per sampled key) by prefix"""
+        for row in self._rows.values():
+            row.sampled_keys = 0
+            row.sampled_bytes = 0
+
+        samples = 0
+        for prefix, key_sizes in sizes.items():
+            row = self.row(prefix)
+            row.sampled_keys += len(key_sizes)
+            row.sampled_bytes += sum(key_sizes)
+            samples += len(key_sizes)
+
+        self.memory_total_keys = total_keys
+        self.memory_samples = samples
+        self.memory_sampled_at = sampled_at
+
+    def reset(self) -> None:
+        self._rows.clear()
+        self.memory_sampled_at = None
+        self.memory_total_keys = 0
+        self.memory_samples = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "prefixes": {
+                prefix: row.to_dict(self.memory_total_keys, self.memory_samples)
+                for prefix, row in sorted(self._rows.items())
+            },
+            "tracked_prefixes": len(self._rows),
+            "max_prefixes": self.max_prefixes,
+            "memory_sample": {
+                "sampled_at": self.memory_sampled_at,
+                "total_keys": self.memory_total_keys,
+                "samples": self.memory_samples
+            }
+        }
@@ -0,0 +1,219 @@
+"""
+Cache value serializers for StorySign platform
+Encodes values for Redis storage with optional compression
+"""
+
+import json
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional, Union
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+try:
+    import lz4.frame as lz4_frame
+    LZ4_AVAILABLE = True
+except ImportError:
+    lz4_frame = None
+    LZ4_AVAILABLE = False
+
+
+# Binary payloads start with a NUL byte, which never begins the JSON envelope,
+# followed by a format byte
+_BINARY_MARKER = 0x00
+_FORMAT_MSGPACK = 0x01
+_FORMAT_MSGPACK_ZLIB = 0x02
+_FORMAT_MSGPACK_LZ4 = 0x03
+
+# MessagePack extension type codes
+_EXT_DATETIME = 1
+_EXT_DATE = 2
+_EXT_DECIMAL = 3
+_EXT_UUID = 4
+
+Stored = Union[str, bytes]
+
+
+class CacheSerializer(ABC):
+    """Base class for cache value encodings"""
+
+    name = ""
+
+    @abstractmethod
+    def dumps(self, value: Any) -> Stored:
+        """Serialize a value for storage"""
+        pass
+
+    def loads(self, data: Stored) -> Any:
+        """
+        Deserialize a stored value
+
+        Every serializer reads both formats, so the configured one can be
+        changed without flushing the cache.
+        """
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data)
+            if data[:1] == bytes([_BINARY_MARKER]):
+                return _loads_binary(data)
+            try:
+                data = data.decode("utf-8")
+            except UnicodeDecodeError:
+                return data
+        return _loads_json_envelope(data)
+
+
+class JsonSerializer(CacheSerializer):
+    """JSON type envelope (the original storage format)"""
+
+    name = "json"
+
+    def dumps(self, value: Any) -> Stored:
+        if isinstance(value, (str, int, float, bool)):
+            return json.dumps({"type": type(value).__name__, "value": value})
+        else:
+            return json.dumps({"type": "json", "value": value})
+
+
+class MsgPackSerializer(CacheSerializer):
+    """
+    MessagePack encoding with extension types for datetime, date, Decimal and UUID
+
+    Payloads of at least compression_threshold bytes are compressed with
+    zlib or lz4 when that makes them smaller.
+    """
+
+    name = "msgpack"
+
+    def __init__(self, compression: Optional[str] = "zlib", compression_threshold: int = 1024):
+        if compression == "lz4" and not LZ4_AVAILABLE:
+            compression = "zlib"
+        if compression not in (None, "zlib", "lz4"):
+            raise ValueError(f"Unknown cache compression: {compression}")
+
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+
+    def dumps(self, value: Any) -> Stored:
+        packed = msgpack.packb(value, use_bin_type=True, default=_msgpack_default)
+
+        if self.compression and len(packed) >= self.compression_threshold:
+            if self.compression == "lz4":
+                compressed = lz4_frame.compress(packed)
+                format_byte = _FORMAT_MSGPACK_LZ4
+            else:
+                compressed = zlib.compress(packed, 1)
+                format_byte = _FORMAT_MSGPACK_ZLIB
+
+            if len(compressed) < len(packed):
+                return bytes((_BINARY_MARKER, format_byte)) + compressed
+
+        return bytes((_BINARY_MARKER, _FORMAT_MSGPACK)) + packed
+
+
+def _msgpack_default(value: Any) -> Any:
+    """Encode types MessagePack has no native representation for"""
+    if isinstance(value, datetime):
+        return msgpack.ExtType(_EXT_DATETIME, value.isoformat().encode("ascii"))
+    if isinstance(value, date):
+        return msgpack.ExtType(_EXT_DATE, value.isoformat().encode("ascii"))
+    if isinstance(value, Decimal):
+        return msgpack.ExtType(_EXT_DECIMAL, str(value).encode("ascii"))
+    if isinstance(value, uuid.UUID):
+        return msgpack.ExtType(_EXT_UUID, value.bytes)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not cache serializable")
+
+
+def _msgpack_ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_DATETIME:
+        return datetime.fromisoformat(data.decode("ascii"))
+    if code == _EXT_DATE:
+        return date.fromisoformat(data.decode("ascii"))
+    if code == _EXT_DECIMAL:
+        return Decimal(data.decode("ascii"))
+    if code == _EXT_UUID:
+        return uuid.UUID(bytes=data)
+    return msgpack.ExtType(code, data)
+
+
+def _loads_binary(data: bytes) -> Any:
+    if not MSGPACK_AVAILABLE:
+        raise ValueError("Binary cache payload found but msgpack is not installed")
+
+    format_byte = data[1]
+    body = data[2:]
+    if format_byte == _FORMAT_MSGPACK_ZLIB:
+        body = zlib.decompress(body)
+    elif format_byte == _FORMAT_MSGPACK_LZ4:
+        if not LZ4_AVAILABLE:
+            raise ValueError("lz4 cache payload found but lz4 is not installed")
+        body = lz4_frame.decompress(body)
+    elif format_byte != _FORMAT_MSGPACK:
+        raise ValueError(f"Unknown cache payload format: {format_byte}")
+
+    return msgpack.unpackb(body, raw=False, ext_hook=_msgpack_ext_hook, strict_map_key=False)
+
+
+def _loads_json_envelope(serialized: str) -> Any:
+    try:
+        data = json.loads(serialized)
+    except json.JSONDecodeError:
+        # Fallback for simple string values
+        return serialized
+
+    if not isinstance(data, dict) or "type" not in data:
+        # Raw values such as INCR counters
+        return data
+
+    value_type = data.get("type", "json")
+    value = data.get("value")
+
+    if value_type == "str":
+        return str(value)
+    elif value_type == "int":
+        return int(value)
+    elif value_type == "float":
+        return float(value)
+    elif value_type == "bool":
+        return bool(value)
+    else:
+        return value
+
+
+def create_serializer(
+    name: Optional[str] = None,
+    compression: Optional[str] = "zlib",
+    compression_threshold: int = 1024
+) -> CacheSerializer:
+    """
+    Create a cache serializer
+
+    Args:
+        name: "msgpack" or "json"; defaults to msgpack when installed
+        compression: "zlib", "lz4" or None (msgpack only)
+        compression_threshold: Minimum payload size in bytes to compress
+
+    Returns:
+        CacheSerializer instance
+    """
+    if name is None:
+        name = "msgpack" if MSGPACK_AVAILABLE else "json"
+
+    if name == "msgpack":
+        if not MSGPACK_AVAILABLE:
+            return JsonSerializer()
+        return MsgPackSerializer(compression, compression_threshold)
+    if name == "json":
+        return JsonSerializer()
+
+    raise ValueError(f"Unknown cache serializer: {name}")
+
@@ -6,7 +6,13 @@ Provides distributed caching with Redis for improved performance
 import json
 import logging
 import asyncio
-from typing import Any, Dict, Optional, Union, List
+import functools
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Union, List
 from datetime import datetime, timedelta
 from contextlib import asynccontextmanager
 
@@ -20,12 +26,52 @@ except ImportError:
     REDIS_AVAILABLE = False
 
 from .base_service import BaseService
+from .cache_metrics import PrefixStatsTable
+from .cache_serializer import create_serializer
+from .local_cache import LRUCache, LocalRedis
+
+
+# Releases a lock only if this worker still owns it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass
+class BulkResult:
+    """Per-key outcome of a bulk cache operation"""
+    results: Dict[str, Any] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    round_trips: int = 0
+    
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+    
+    def __bool__(self) -> bool:
+        return self.ok
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "succeeded": len(self.results),
+            "failed": len(self.errors),
+            "errors": self.errors,
+            "round_trips": self.round_trips
+        }
 
 
 class CacheService(BaseService):
     """
     Redis-based caching service for improved database performance
     Provides async caching operations with automatic serialization
+    
+    Reads go through a bounded in-process L1 tier before Redis (L2). Writes
+    publish invalidations so other workers drop their L1 copies, and L1
+    entries live at most l1_ttl seconds to bound staleness if one is
+    missed. Without Redis, an in-process stand-in serves as L2.
     """
     
     def __init__(self, service_name: str = "CacheService", config: Optional[Dict[str, Any]] = None):
@@ -54,14 +100,77 @@ class CacheService(BaseService):
             self.redis_db = 0
             self.redis_password = None
             self.max_connections = 20
+        
+        cache_config = self.config.get("cache", {}) if self.config else {}
+        
+        # Value encoding
+        self.serializer = create_serializer(
+            cache_config.get("serializer"),
+            compression=cache_config.get("compression", "zlib"),
+            compression_threshold=cache_config.get("compression_threshold", 1024)
+        )
+        
+        # Keys per SCAN/SSCAN step and per UNLINK; UNLINK batches per pipeline
+        self.scan_batch_size = cache_config.get("scan_batch_size", 1000)
+        self.pipeline_batches = cache_config.get("pipeline_batches", 10)
+        
+        # Keys per pipeline (or MGET) in bulk operations
+        self.bulk_chunk_size = cache_config.get("bulk_chunk_size", 500)
+        
+        # Per-prefix traffic counters and the sampled memory estimate
+        self.prefix_stats = PrefixStatsTable(max_prefixes=cache_config.get("max_tracked_prefixes", 64))
+        self.memory_sample_interval = cache_config.get("memory_sample_interval", 300)
+        self.memory_sample_size = cache_config.get("memory_sample_size", 500)
+        self._memory_sample_task: Optional[asyncio.Task] = None
+        
+        # In-process L1 tier
+        self.l1_enabled = cache_config.get("l1_enabled", True)
+        self.l1_ttl = cache_config.get("l1_ttl", 30)
+        self._l1 = LRUCache(
+            max_bytes=cache_config.get("l1_max_bytes", 32 * 1024 * 1024),
+            max_entries=cache_config.get("l1_max_entries", 10000),
+            on_evict=self._on_l1_evict
+        )
+        self._l1_active = False
+        
+        # Cross-worker L1 invalidation
+        self.worker_id = str(uuid.uuid4())
+        self.invalidation_channel = f"{self.key_prefix}__invalidate__"
+        self._pubsub = None
+        self._invalidation_task: Optional[asyncio.Task] = None
+        
+        # Cross-worker events for other services, see subscribe()
+        self.events_channel = f"{self.key_prefix}__events__"
+        self._subscribers: Dict[str, List[Callable[[Optional[Any]], None]]] = {}
+        
+        # Local stand-in used as L2 when Redis is absent
+        self._local_backend: Optional[LocalRedis] = None
+        
+        self._stats = {
+            "l1_hits": 0,
+            "l1_misses": 0,
+            "l2_hits": 0,
+            "l2_misses": 0,
+            "invalidations_sent": 0,
+            "invalidations_received": 0,
+            "computations": 0,
+            "coalesced_waits": 0,
+            "stale_served": 0,
+            "early_refreshes": 0,
+            "lock_waits": 0
+        }
+        
+        # In-flight computations for get_or_compute, keyed by cache key
+        self._inflight: Dict[str, asyncio.Task] = {}
     
     async def initialize(self) -> None:
         """
         Initialize Redis connection and connection pool
         """
         if not REDIS_AVAILABLE:
-            self.logger.warning("Redis not available - cache service running in mock mode")
+            self.logger.warning("Redis not available - cache service using in-process stand-in")
             self.logger.info("To enable Redis caching, install: pip install redis[hiredis]")
+            self._use_local_backend()
             return
         
         try:
@@ -74,7 +183,8 @@ class CacheService(BaseService):
                 db=self.redis_db,
                 password=self.redis_password,
                 max_connections=self.max_connections,
-                decode_responses=True,
+                # Values may be binary; see core.cache_serializer
+                decode_responses=False,
                 socket_connect_timeout=5,
                 socket_timeout=5,
                 retry_on_timeout=True
@@ -87,12 +197,31 @@ class CacheService(BaseService):
             await self._test_connection()
             
             self._is_connected = True
+            
+            if self.l1_enabled:
+                self._l1_active = True
+            self._invalidation_task = asyncio.create_task(self._invalidation_listener())
+            self._start_memory_sampling()
+            
             self.logger.info("Redis cache service initialized successfully")
             
         except Exception as e:
             self.logger.error(f"Failed to initialize Redis cache service: {e}")
-            self.logger.warning("Cache service will run in mock mode")
+            self.logger.warning("Cache service will use in-process stand-in")
             # Don't raise exception - allow service to run without Redis
+            self._use_local_backend()
+    
+    def _use_local_backend(self) -> None:
+        """Serve as a single-process cache when Redis is unreachable"""
+        self._redis_client = None
+        self._local_backend = LocalRedis()
+        # The stand-in is already in-process; an L1 in front would only duplicate it
+        self._l1_active = False
+        self._start_memory_sampling()
+    
+    def _start_memory_sampling(self) -> None:
+        if self.memory_sample_interval and self._memory_sample_task is None:
+            self._memory_sample_task = asyncio.create_task(self._memory_sample_loop())
     
     async def _test_connection(self) -> None:
         """
@@ -114,6 +243,25 @@ class CacheService(BaseService):
         """
         Clean up Redis connections
         """
+        if self._invalidation_task:
+            self._invalidation_task.cancel()
+            self._invalidation_task = None
+        
+        if self._memory_sample_task:
+            self._memory_sample_task.cancel()
+            self._memory_sample_task = None
+        
+        for task in list(self._inflight.values()):
+            task.cancel()
+        
+        if self._pubsub:
+            await self._pubsub.close()
+            self._pubsub = None
+        
+        self._l1.clear()
+        self._l1_active = False
+        self._local_backend = None
+        
         if self._redis_client:
             await self._redis_client.close()
             self._redis_client = None
@@ -125,6 +273,136 @@ class CacheService(BaseService):
         self._is_connected = False
         self.logger.info("Redis cache service cleaned up")
     
+    @property
+    def _backend(self):
+        """Redis client, or the in-process stand-in when Redis is absent"""
+        if self._is_connected and self._redis_client is not None:
+            return self._redis_client
+        return self._local_backend
+    
+    def is_available(self) -> bool:
+        """Check if any cache backend (Redis or the local stand-in) is usable"""
+        return self._backend is not None
+    
+    async def _publish_invalidation(
+        self,
+        keys: Optional[List[str]] = None,
+        pattern: Optional[str] = None
+    ) -> None:
+        """Tell other workers to drop L1 entries (full cache keys or a glob pattern)"""
+        if not self._l1_active:
+            return
+        
+        message = {"origin": self.worker_id}
+        if pattern is not None:
+            message["pattern"] = pattern
+        else:
+            message["keys"] = keys or []
+        
+        try:
+            await self._redis_client.publish(self.invalidation_channel, json.dumps(message))
+            self._stats["invalidations_sent"] += 1
+        except Exception as e:
+            self.logger.error(f"Cache invalidation publish error: {e}")
+    
+    def subscribe(self, topic: str, handler: Callable[[Optional[Any]], None]) -> None:
+        """
+        Call handler with the data other workers publish on a topic
+        
+        handler(None) means messages may have been missed while Redis was
+        unreachable, so the subscriber should reload its state from the cache.
+        Handlers run on the listener task and must not block.
+        """
+        self._subscribers.setdefault(topic, []).append(handler)
+    
+    async def publish(self, topic: str, data: Any) -> bool:
+        """Send JSON-serializable data to other workers' subscribers of a topic"""
+        if not self._is_connected or self._redis_client is None:
+            return False
+        
+        message = {"origin": self.worker_id, "topic": topic, "data": data}
+        try:
+            await self._redis_client.publish(self.events_channel, json.dumps(message))
+            return True
+        except Exception as e:
+            self.logger.error(f"Cache event publish error for topic {topic}: {e}")
+            return False
+    
+    def _notify_subscribers(self, topic: Optional[str], data: Optional[Any]) -> None:
+        """Dispatch an event (or, with no topic, a resync notice to every subscriber)"""
+        topics = [topic] if topic is not None else list(self._subscribers)
+        for name in topics:
+            for handler in self._subscribers.get(name, ()):
+                try:
+                    handler(data)
+                except Exception as e:
+                    self.logger.error(f"Cache event handler error for topic {name}: {e}")
+    
+    async def _invalidation_listener(self) -> None:
+        """Apply L1 invalidations and dispatch events published by other workers"""
+        missed_messages = False
+        while True:
+            try:
+                if self._pubsub is None:
+                    self._pubsub = self._redis_client.pubsub(ignore_subscribe_messages=True)
+                    await self._pubsub.subscribe(self.invalidation_channel, self.events_channel)
+                    if missed_messages:
+                        missed_messages = False
+                        self._notify_subscribers(None, None)
+                
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is None or message.get("type") != "message":
+                    continue
+                
+                data = json.loads(message["data"])
+                if data.get("origin") == self.worker_id:
+                    continue
+                
+                if "topic" in data:
+                    self._notify_subscribers(data["topic"], data.get("data"))
+                    continue
+                
+                self._stats["invalidations_received"] += 1
+                if "pattern" in data:
+                    self._l1.pop_pattern(data["pattern"])
+                else:
+                    self._l1.pop_many(data.get("keys", []))
+            
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                # Invalidations and events may have been missed while disconnected
+                self.logger.error(f"Cache invalidation listener error: {e}")
+                self._l1.clear()
+                missed_messages = True
+                if self._pubsub:
+                    try:
+                        await self._pubsub.close()
+                    except Exception:
+                        pass
+                    self._pubsub = None
+                await asyncio.sleep(1.0)
+    
+    def _fill_l1(self, cache_key: str, serialized: Union[str, bytes], pttl: int) -> None:
+        """
+        Cache a value read from Redis in L1
+        
+        pttl is the key's remaining TTL in milliseconds (-1 for none). The
+        entry never outlives the Redis key, whose natural expiry publishes
+        no invalidation.
+        """
+        if pttl == -1:
+            ttl = self.l1_ttl
+        elif pttl > 0:
+            ttl = min(self.l1_ttl, pttl / 1000)
+        else:
+            # Expired or deleted since the read
+            return
+        self._l1.set(cache_key, serialized, ttl=ttl, size=len(serialized))
+    
+    def _on_l1_evict(self, cache_key: str) -> None:
+        self.prefix_stats.row(cache_key[len(self.key_prefix):]).evictions += 1
+    
     def _make_key(self, key: str) -> str:
         """
         Create prefixed cache key
@@ -137,7 +415,7 @@ class CacheService(BaseService):
         """
         return f"{self.key_prefix}{key}"
     
-    def _serialize_value(self, value: Any) -> str:
+    def _serialize_value(self, value: Any) -> Union[str, bytes]:
         """
         Serialize value for Redis storage
         
@@ -145,41 +423,21 @@ class CacheService(BaseService):
             value: Value to serialize
             
         Returns:
-            Serialized string
+            Serialized payload (binary unless the JSON serializer is configured)
         """
-        if isinstance(value, (str, int, float, bool)):
-            return json.dumps({"type": type(value).__name__, "value": value})
-        else:
-            return json.dumps({"type": "json", "value": value})
+        return self.serializer.dumps(value)
     
-    def _deserialize_value(self, serialized: str) -> Any:
+    def _deserialize_value(self, serialized: Union[str, bytes]) -> Any:
         """
         Deserialize value from Redis storage
         
         Args:
-            serialized: Serialized string
+            serialized: Serialized payload in either the binary or JSON format
             
         Returns:
             Deserialized value
         """
-        try:
-            data = json.loads(serialized)
-            value_type = data.get("type", "json")
-            value = data.get("value")
-            
-            if value_type == "str":
-                return str(value)
-            elif value_type == "int":
-                return int(value)
-            elif value_type == "float":
-                return float(value)
-            elif value_type == "bool":
-                return bool(value)
-            else:
-                return value
-        except (json.JSONDecodeError, KeyError):
-            # Fallback for simple string values
-            return serialized
+        return self.serializer.loads(serialized)
     
     async def get(self, key: str, default: Any = None) -> Any:
         """
@@ -192,19 +450,52 @@ class CacheService(BaseService):
         Returns:
             Cached value or default
         """
-        if not REDIS_AVAILABLE or not self._is_connected:
-            self.logger.debug(f"Cache miss (Redis unavailable): {key}")
+        backend = self._backend
+        if backend is None:
+            self.logger.debug(f"Cache miss (cache unavailable): {key}")
             return default
         
+        cache_key = self._make_key(key)
+        row = self.prefix_stats.row(key)
+        started = time.perf_counter()
+        if self._l1_active:
+            serialized = self._l1.get(cache_key)
+            if serialized is not None:
+                self._stats["l1_hits"] += 1
+                value = self._deserialize_value(serialized)
+                row.hits += 1
+                row.bytes_read += len(serialized)
+                row.latency.record((time.perf_counter() - started) * 1000)
+                return value
+            self._stats["l1_misses"] += 1
+            generation = self._l1.generation
+        
         try:
-            cache_key = self._make_key(key)
-            serialized = await self._redis_client.get(cache_key)
+            if self._l1_active:
+                # The key's remaining TTL caps how long L1 may serve it
+                async with backend.pipeline(transaction=False) as pipe:
+                    pipe.get(cache_key)
+                    pipe.pttl(cache_key)
+                    serialized, pttl = await pipe.execute()
+            else:
+                serialized = await backend.get(cache_key)
             
             if serialized is None:
+                self._stats["l2_misses"] += 1
+                row.misses += 1
+                row.latency.record((time.perf_counter() - started) * 1000)
                 self.logger.debug(f"Cache miss: {key}")
                 return default
             
+            self._stats["l2_hits"] += 1
+            row.hits += 1
+            row.bytes_read += len(serialized)
+            # Skip the fill if an invalidation raced with the read
+            if self._l1_active and self._l1.generation == generation:
+                self._fill_l1(cache_key, serialized, pttl)
+            
             value = self._deserialize_value(serialized)
+            row.latency.record((time.perf_counter() - started) * 1000)
             self.logger.debug(f"Cache hit: {key}")
             return value
             
@@ -212,13 +503,43 @@ class CacheService(BaseService):
             self.logger.error(f"Cache get error for key {key}: {e}")
             return default
     
+    async def get_or_raise(self, key: str) -> Any:
+        """
+        Get value from cache, raising on errors instead of returning a miss
+        
+        For checks that must fail closed, where an unreachable cache may
+        not be mistaken for an absent key. Does not fill L1.
+        
+        Args:
+            key: Cache key
+        
+        Returns:
+            Cached value, or None if the key is missing
+        
+        Raises:
+            RuntimeError: If no cache backend is available
+            Exception: Any backend error
+        """
+        backend = self._backend
+        if backend is None:
+            raise RuntimeError("Cache unavailable")
+        
+        cache_key = self._make_key(key)
+        serialized = self._l1.get(cache_key) if self._l1_active else None
+        if serialized is None:
+            serialized = await backend.get(cache_key)
+            if serialized is None:
+                return None
+        return self._deserialize_value(serialized)
+    
     async def set(
         self,
         key: str,
         value: Any,
         ttl: Optional[int] = None,
         nx: bool = False,
-        xx: bool = False
+        xx: bool = False,
+        tags: Optional[List[str]] = None
     ) -> bool:
         """
         Set value in cache
@@ -229,28 +550,70 @@ class CacheService(BaseService):
             ttl: Time to live in seconds (None for default TTL)
             nx: Only set if key doesn't exist
             xx: Only set if key exists
+            tags: Tags to register the key under for invalidate_tags
             
         Returns:
             True if value was set, False otherwise
         """
-        if not REDIS_AVAILABLE or not self._is_connected:
-            self.logger.debug(f"Cache set skipped (Redis unavailable): {key}")
+        backend = self._backend
+        if backend is None:
+            self.logger.debug(f"Cache set skipped (cache unavailable): {key}")
             return False
         
         try:
+            started = time.perf_counter()
             cache_key = self._make_key(key)
             serialized = self._serialize_value(value)
             ttl_seconds = ttl or self.default_ttl
+            if self._l1_active:
+                # Popping bumps the L1 generation, so reads already in flight skip their fill
+                self._l1.pop(cache_key)
             
-            result = await self._redis_client.set(
-                cache_key,
-                serialized,
-                ex=ttl_seconds,
-                nx=nx,
-                xx=xx
-            )
+            if self._l1_active or tags:
+                # Write, tag and invalidate other workers' L1 in one round trip
+                conditional = nx or xx
+                async with backend.pipeline(transaction=False) as pipe:
+                    pipe.set(cache_key, serialized, ex=ttl_seconds, nx=nx, xx=xx)
+                    if not conditional:
+                        for tag in tags or ():
+                            self._queue_tag(pipe, tag, cache_key, ttl_seconds)
+                    if self._l1_active:
+                        pipe.publish(
+                            self.invalidation_channel,
+                            json.dumps({"origin": self.worker_id, "keys": [cache_key]})
+                        )
+                    result = (await pipe.execute())[0]
+                
+                if result and conditional and tags:
+                    # A conditional SET may not write, so tag only once it has
+                    async with backend.pipeline(transaction=False) as pipe:
+                        for tag in tags:
+                            self._queue_tag(pipe, tag, cache_key, ttl_seconds)
+                        await pipe.execute()
+            else:
+                result = await backend.set(
+                    cache_key,
+                    serialized,
+                    ex=ttl_seconds,
+                    nx=nx,
+                    xx=xx
+                )
             
+            if self._l1_active:
+                self._stats["invalidations_sent"] += 1
+                # Again after the write, for reads that started during it
+                self._l1.pop(cache_key)
+                if result and not (nx or xx):
+                    self._l1.set(
+                        cache_key, serialized,
+                        ttl=min(ttl_seconds, self.l1_ttl), size=len(serialized)
+                    )
+            
+            row = self.prefix_stats.row(key)
+            row.latency.record((time.perf_counter() - started) * 1000)
             if result:
+                row.writes += 1
+                row.bytes_written += len(serialized)
                 self.logger.debug(f"Cache set: {key} (TTL: {ttl_seconds}s)")
             else:
                 self.logger.debug(f"Cache set failed: {key}")
@@ -271,12 +634,20 @@ class CacheService(BaseService):
         Returns:
             True if key was deleted, False otherwise
         """
-        if not REDIS_AVAILABLE or not self._is_connected:
+        backend = self._backend
+        if backend is None:
             return False
         
         try:
             cache_key = self._make_key(key)
-            result = await self._redis_client.delete(cache_key)
+            if self._l1_active:
+                self._l1.pop(cache_key)
+            result = await backend.delete(cache_key)
+            if self._l1_active:
+                # Reads that started during the delete may have seen the old value
+                self._l1.pop(cache_key)
+            await self._publish_invalidation([cache_key])
+            self.prefix_stats.row(key).deletes += 1
             
             if result:
                 self.logger.debug(f"Cache delete: {key}")
@@ -297,12 +668,15 @@ class CacheService(BaseService):
         Returns:
             True if key exists, False otherwise
         """
-        if not REDIS_AVAILABLE or not self._is_connected:
+        backend = self._backend
+        if backend is None:
             return False
         
         try:
             cache_key = self._make_key(key)
-            result = await self._redis_client.exists(cache_key)
+            if self._l1_active and self._l1.get(cache_key) is not None:
+                return True
+            result = await backend.exists(cache_key)
             return bool(result)
             
         except Exception as e:
@@ -320,12 +694,16 @@ class CacheService(BaseService):
         Returns:
             True if expiration was set, False otherwise
         """
-        if not REDIS_AVAILABLE or not self._is_connected:
+        backend = self._backend
+        if backend is None:
             return False
         
         try:
             cache_key = self._make_key(key)
-            result = await self._redis_client.expire(cache_key, ttl)
+            result = await backend.expire(cache_key, ttl)
+            if self._l1_active:
+                self._l1.pop(cache_key)
+                await self._publish_invalidation([cache_key])
             return bool(result)
             
         except Exception as e:
@@ -343,85 +721,268 @@ class CacheService(BaseService):
         Returns:
             New value after increment, or None if error
         """
-        if not REDIS_AVAILABLE or not self._is_connected:
+        backend = self._backend
+        if backend is None:
             return None
         
         try:
             cache_key = self._make_key(key)
-            result = await self._redis_client.incrby(cache_key, amount)
+            result = await backend.incrby(cache_key, amount)
+            self.prefix_stats.row(key).writes += 1
+            if self._l1_active:
+                self._l1.pop(cache_key)
+                await self._publish_invalidation([cache_key])
             return int(result)
             
         except Exception as e:
             self.logger.error(f"Cache increment error for key {key}: {e}")
             return None
     
+    def _chunks(self, items: List[Any]) -> List[List[Any]]:
+        size = self.bulk_chunk_size
+        return [items[start:start + size] for start in range(0, len(items), size)]
+    
     async def get_many(self, keys: List[str]) -> Dict[str, Any]:
         """
         Get multiple values from cache
         
+        Keys are fetched with one MGET per bulk_chunk_size keys. Keys in a
+        chunk that fails are left out of the result like misses.
+        
         Args:
             keys: List of cache keys
             
         Returns:
             Dictionary of key-value pairs
         """
-        if not REDIS_AVAILABLE or not self._is_connected:
+        backend = self._backend
+        if backend is None:
             return {}
         
-        try:
-            cache_keys = [self._make_key(key) for key in keys]
-            values = await self._redis_client.mget(cache_keys)
-            
-            result = {}
-            for i, (original_key, serialized) in enumerate(zip(keys, values)):
-                if serialized is not None:
+        result = {}
+        missing = []
+        for key in keys:
+            cache_key = self._make_key(key)
+            serialized = self._l1.get(cache_key) if self._l1_active else None
+            if serialized is not None:
+                self._stats["l1_hits"] += 1
+                row = self.prefix_stats.row(key)
+                row.hits += 1
+                row.bytes_read += len(serialized)
+                result[key] = self._deserialize_value(serialized)
+            else:
+                missing.append((key, cache_key))
+        
+        if not missing:
+            return result
+        
+        if self._l1_active:
+            self._stats["l1_misses"] += len(missing)
+        
+        for chunk in self._chunks(missing):
+            try:
+                generation = self._l1.generation
+                cache_keys = [cache_key for _, cache_key in chunk]
+                if self._l1_active:
+                    async with backend.pipeline(transaction=False) as pipe:
+                        pipe.mget(cache_keys)
+                        for cache_key in cache_keys:
+                            pipe.pttl(cache_key)
+                        values, *pttls = await pipe.execute()
+                else:
+                    values = await backend.mget(cache_keys)
+                    pttls = [None] * len(cache_keys)
+                
+                fill = self._l1_active and self._l1.generation == generation
+                for (original_key, cache_key), serialized, pttl in zip(chunk, values, pttls):
+                    row = self.prefix_stats.row(original_key)
+                    if serialized is None:
+                        self._stats["l2_misses"] += 1
+                        row.misses += 1
+                        continue
+                    self._stats["l2_hits"] += 1
+                    row.hits += 1
+                    row.bytes_read += len(serialized)
+                    if fill:
+                        self._fill_l1(cache_key, serialized, pttl)
                     result[original_key] = self._deserialize_value(serialized)
             
-            return result
+            except Exception as e:
+                self.logger.error(f"Cache get_many error for {len(chunk)} keys: {e}")
+        
+        return result
+    
+    async def _run_bulk(
+        self,
+        backend,
+        entries: List[Any],
+        queue: Callable[[Any, Any], int],
+        result: BulkResult
+    ) -> List[List[Any]]:
+        """
+        Queue each entry's commands on one pipeline per chunk and execute them
+        
+        queue(pipe, entry) adds the entry's commands and returns how many it
+        added. Returns each entry's command replies, or None where its chunk
+        failed; failures are recorded in result.errors.
+        """
+        replies = []
+        for chunk in self._chunks(entries):
+            try:
+                async with backend.pipeline(transaction=False) as pipe:
+                    counts = [queue(pipe, entry) for entry in chunk]
+                    raw = await pipe.execute(raise_on_error=False)
+                result.round_trips += 1
+            except Exception as e:
+                for entry in chunk:
+                    result.errors[entry[0]] = str(e)
+                replies.extend([None] * len(chunk))
+                continue
             
-        except Exception as e:
-            self.logger.error(f"Cache get_many error: {e}")
-            return {}
+            position = 0
+            for entry, count in zip(chunk, counts):
+                entry_replies = raw[position:position + count]
+                position += count
+                error = next((r for r in entry_replies if isinstance(r, Exception)), None)
+                if error is not None:
+                    result.errors[entry[0]] = str(error)
+                    replies.append(None)
+                else:
+                    replies.append(entry_replies)
+        return replies
+    
+    async def _invalidate_l1(self, cache_keys: List[str]) -> None:
+        if self._l1_active and cache_keys:
+            self._l1.pop_many(cache_keys)
+            await self._publish_invalidation(cache_keys)
     
     async def set_many(
         self,
         mapping: Dict[str, Any],
-        ttl: Optional[int] = None
-    ) -> bool:
+        ttl: Optional[int] = None,
+        ttls: Optional[Dict[str, int]] = None,
+        tags: Optional[List[str]] = None
+    ) -> BulkResult:
         """
         Set multiple values in cache
         
+        Each key is written with its own SET ... EX, pipelined in chunks of
+        bulk_chunk_size keys, so a write costs one round trip per chunk.
+        
         Args:
             mapping: Dictionary of key-value pairs
-            ttl: Time to live in seconds
+            ttl: Time to live in seconds (None for no expiry)
+            ttls: Per-key TTLs overriding ttl
+            tags: Tags to register every key under for invalidate_tags
             
         Returns:
-            True if all values were set, False otherwise
+            BulkResult mapping each key to True, with failed keys in errors;
+            truthy only if all values were set
         """
-        if not REDIS_AVAILABLE or not self._is_connected:
-            return False
+        result = BulkResult()
+        backend = self._backend
+        if backend is None:
+            result.errors = {key: "cache unavailable" for key in mapping}
+            return result
         
-        try:
-            # Prepare data for mset
-            cache_mapping = {}
-            for key, value in mapping.items():
-                cache_key = self._make_key(key)
-                cache_mapping[cache_key] = self._serialize_value(value)
+        ttls = ttls or {}
+        entries = []
+        for key, value in mapping.items():
+            try:
+                entries.append((key, self._make_key(key), self._serialize_value(value), ttls.get(key, ttl)))
+            except Exception as e:
+                result.errors[key] = str(e)
+        
+        def queue(pipe, entry) -> int:
+            _, cache_key, serialized, key_ttl = entry
+            pipe.set(cache_key, serialized, ex=key_ttl)
+            return 1 + sum(self._queue_tag(pipe, tag, cache_key, key_ttl) for tag in tags or ())
+        
+        replies = await self._run_bulk(backend, entries, queue, result)
+        for entry, reply in zip(entries, replies):
+            if reply is not None:
+                result.results[entry[0]] = True
+                row = self.prefix_stats.row(entry[0])
+                row.writes += 1
+                row.bytes_written += len(entry[2])
+        
+        await self._invalidate_l1([entry[1] for entry in entries])
+        
+        if result.errors:
+            self.logger.error(f"Cache set_many failed for {len(result.errors)} of {len(mapping)} keys")
+        return result
+    
+    async def delete_many(self, keys: List[str]) -> BulkResult:
+        """
+        Delete multiple keys from cache
+        
+        Args:
+            keys: List of cache keys
             
-            # Set all values
-            await self._redis_client.mset(cache_mapping)
+        Returns:
+            BulkResult mapping each key to whether it existed
+        """
+        result = BulkResult()
+        backend = self._backend
+        if backend is None:
+            result.errors = {key: "cache unavailable" for key in keys}
+            return result
+        
+        entries = [(key, self._make_key(key)) for key in keys]
+        
+        def queue(pipe, entry) -> int:
+            pipe.delete(entry[1])
+            return 1
+        
+        replies = await self._run_bulk(backend, entries, queue, result)
+        for entry, reply in zip(entries, replies):
+            if reply is not None:
+                result.results[entry[0]] = bool(reply[0])
+                self.prefix_stats.row(entry[0]).deletes += 1
+        
+        await self._invalidate_l1([entry[1] for entry in entries])
+        return result
+    
+    async def increment_many(
+        self,
+        amounts: Dict[str, int],
+        ttl: Optional[int] = None
+    ) -> BulkResult:
+        """
+        Increment multiple numeric values in cache
+        
+        Args:
+            amounts: Dictionary of key to increment amount
+            ttl: Time to live in seconds for counters without an expiry;
+                existing expiries are kept (EXPIRE NX)
             
-            # Set TTL for all keys if specified
+        Returns:
+            BulkResult mapping each key to its new value
+        """
+        result = BulkResult()
+        backend = self._backend
+        if backend is None:
+            result.errors = {key: "cache unavailable" for key in amounts}
+            return result
+        
+        entries = [(key, self._make_key(key), amount) for key, amount in amounts.items()]
+        
+        def queue(pipe, entry) -> int:
+            _, cache_key, amount = entry
+            pipe.incrby(cache_key, amount)
             if ttl:
-                ttl_seconds = ttl or self.default_ttl
-                for cache_key in cache_mapping.keys():
-                    await self._redis_client.expire(cache_key, ttl_seconds)
-            
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"Cache set_many error: {e}")
-            return False
+                pipe.expire(cache_key, ttl, nx=True)
+                return 2
+            return 1
+        
+        replies = await self._run_bulk(backend, entries, queue, result)
+        for entry, reply in zip(entries, replies):
+            if reply is not None:
+                result.results[entry[0]] = int(reply[0])
+                self.prefix_stats.row(entry[0]).writes += 1
+        
+        await self._invalidate_l1([entry[1] for entry in entries])
+        return result
     
     async def clear_pattern(self, pattern: str) -> int:
         """
@@ -433,24 +994,388 @@ class CacheService(BaseService):
         Returns:
             Number of keys deleted
         """
-        if not REDIS_AVAILABLE or not self._is_connected:
+        backend = self._backend
+        if backend is None:
             return 0
         
         try:
             cache_pattern = self._make_key(pattern)
-            keys = await self._redis_client.keys(cache_pattern)
             
-            if keys:
-                deleted = await self._redis_client.delete(*keys)
-                self.logger.info(f"Cleared {deleted} cache keys matching pattern: {pattern}")
-                return deleted
+            # SCAN walks the keyspace in small steps instead of blocking Redis
+            # for one KEYS call over all of it
+            deleted = 0
+            batch = []
+            async for cache_key in backend.scan_iter(match=cache_pattern, count=self.scan_batch_size):
+                batch.append(cache_key)
+                if len(batch) >= self.scan_batch_size * self.pipeline_batches:
+                    deleted += await self._unlink_keys(backend, batch)
+                    batch = []
+            if batch:
+                deleted += await self._unlink_keys(backend, batch)
             
-            return 0
+            if self._l1_active:
+                self._l1.pop_pattern(cache_pattern)
+                await self._publish_invalidation(pattern=cache_pattern)
+            
+            if deleted:
+                self.logger.info(f"Cleared {deleted} cache keys matching pattern: {pattern}")
+            return deleted
             
         except Exception as e:
             self.logger.error(f"Cache clear_pattern error for pattern {pattern}: {e}")
             return 0
     
+    async def scan_many(self, pattern: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Iterate over keys matching a pattern, with their values, in batches
+        
+        Walks the keyspace with SCAN and reads each batch with one MGET,
+        bypassing L1. Keys that expire in between are left out. Unlike the
+        other methods this raises on backend errors, so callers can tell a
+        partial walk from a complete one.
+        
+        Args:
+            pattern: Key pattern (supports wildcards)
+            
+        Yields:
+            Dictionaries of key-value pairs
+        """
+        backend = self._backend
+        if backend is None:
+            return
+        
+        prefix_length = len(self.key_prefix)
+        batch = []
+        async for cache_key in backend.scan_iter(match=self._make_key(pattern), count=self.scan_batch_size):
+            batch.append(cache_key)
+            if len(batch) >= self.bulk_chunk_size:
+                yield await self._read_batch(backend, batch, prefix_length)
+                batch = []
+        if batch:
+            yield await self._read_batch(backend, batch, prefix_length)
+    
+    async def _read_batch(self, backend, cache_keys: List[Any], prefix_length: int) -> Dict[str, Any]:
+        values = await backend.mget(cache_keys)
+        result = {}
+        for cache_key, serialized in zip(cache_keys, values):
+            if serialized is None:
+                continue
+            if isinstance(cache_key, bytes):
+                cache_key = cache_key.decode("utf-8")
+            result[cache_key[prefix_length:]] = self._deserialize_value(serialized)
+        return result
+    
+    def _tag_key(self, tag: str) -> str:
+        return self._make_key(f"__tag__:{tag}")
+    
+    def _queue_tag(self, pipe, tag: str, cache_key: str, ttl_seconds: Optional[int]) -> int:
+        """Queue commands adding cache_key to a tag set on a pipeline, returning their count"""
+        tag_key = self._tag_key(tag)
+        pipe.sadd(tag_key, cache_key)
+        if ttl_seconds is None:
+            pipe.persist(tag_key)
+            return 2
+        # The tag set lives as long as its longest-lived member
+        pipe.expire(tag_key, ttl_seconds, nx=True)
+        pipe.expire(tag_key, ttl_seconds, gt=True)
+        return 3
+    
+    async def _unlink_keys(self, backend, cache_keys: List[Any]) -> int:
+        """Delete keys in pipelined UNLINK batches and drop them from L1"""
+        async with backend.pipeline(transaction=False) as pipe:
+            for start in range(0, len(cache_keys), self.scan_batch_size):
+                pipe.unlink(*cache_keys[start:start + self.scan_batch_size])
+            deleted = sum(await pipe.execute())
+        
+        if self._l1_active:
+            keys = [key.decode() if isinstance(key, bytes) else key for key in cache_keys]
+            self._l1.pop_many(keys)
+            await self._publish_invalidation(keys)
+        return deleted
+    
+    async def invalidate_tags(self, *tags: str) -> int:
+        """
+        Delete every key registered under any of the given tags
+        
+        Args:
+            tags: Tags passed to set() or cache_result
+            
+        Returns:
+            Number of keys deleted
+        """
+        backend = self._backend
+        if backend is None:
+            return 0
+        
+        deleted = 0
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            # Detach the set first so keys tagged meanwhile start a fresh one
+            detached_key = f"{tag_key}:{uuid.uuid4().hex}"
+            try:
+                await backend.rename(tag_key, detached_key)
+            except Exception:
+                # No such tag
+                continue
+            
+            try:
+                batch = []
+                async for cache_key in backend.sscan_iter(detached_key, count=self.scan_batch_size):
+                    batch.append(cache_key)
+                    if len(batch) >= self.scan_batch_size * self.pipeline_batches:
+                        deleted += await self._unlink_keys(backend, batch)
+                        batch = []
+                if batch:
+                    deleted += await self._unlink_keys(backend, batch)
+            except Exception as e:
+                self.logger.error(f"Cache invalidate_tags error for tag {tag}: {e}")
+            finally:
+                try:
+                    await backend.unlink(detached_key)
+                except Exception as e:
+                    # Must not replace an error raised while walking the set
+                    self.logger.error(f"Cache invalidate_tags cleanup error for tag {tag}: {e}")
+        
+        self.logger.debug(f"Invalidated {deleted} cache keys for tags: {', '.join(tags)}")
+        return deleted
+    
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        stale_ttl: int = 0,
+        early_expiration: float = 1.0,
+        distributed_lock: bool = False,
+        lock_timeout: float = 30.0,
+        tags: Optional[List[str]] = None
+    ) -> Any:
+        """
+        Get a cached value, computing it at most once per key when missing
+        
+        Values are stored with a soft expiry (ttl) and kept in Redis for a
+        further stale_ttl seconds. Within that window the stale value is
+        served while one background task recomputes it. Refreshes may also
+        start slightly before the soft expiry, with a probability that rises
+        as it approaches and scales with how long the computation took
+        (scaled by early_expiration; 0 disables).
+        
+        Concurrent misses in this process share one computation. With
+        distributed_lock, workers also coordinate through a Redis lock, and
+        the losers poll for the winner's value for up to lock_timeout seconds.
+        
+        Args:
+            key: Cache key
+            compute: Coroutine function producing the value
+            ttl: Soft time to live in seconds (uses default if None)
+            stale_ttl: Seconds a stale value may still be served
+            early_expiration: Probabilistic early expiration factor
+            distributed_lock: Coordinate recomputation across processes
+            lock_timeout: Lock lifetime and maximum wait in seconds
+            tags: Tags to register the key under for invalidate_tags
+            
+        Returns:
+            Cached or freshly computed value
+        """
+        ttl = ttl or self.default_ttl
+        cached = await self.get(key)
+        
+        if isinstance(cached, dict) and cached.get("__swr__"):
+            now = time.time()
+            fresh_until = cached["fresh_until"]
+            early = early_expiration > 0 and (
+                now - cached.get("delta", 0) * early_expiration * math.log(1.0 - random.random())
+                >= fresh_until
+            )
+            if now < fresh_until and not early:
+                return cached["value"]
+            
+            if now < fresh_until:
+                self._stats["early_refreshes"] += 1
+            else:
+                self._stats["stale_served"] += 1
+            
+            if key not in self._inflight:
+                self._start_compute(
+                    key, compute, ttl, stale_ttl, distributed_lock, lock_timeout, tags
+                )
+            return cached["value"]
+        
+        if cached is not None:
+            # Plain value written by set() or an older version
+            return cached
+        
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._stats["coalesced_waits"] += 1
+        else:
+            inflight = self._start_compute(
+                key, compute, ttl, stale_ttl, distributed_lock, lock_timeout, tags
+            )
+        
+        # Shielded so a cancelled caller does not abort the shared computation
+        return await asyncio.shield(inflight)
+    
+    def _start_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: int,
+        stale_ttl: int,
+        distributed_lock: bool,
+        lock_timeout: float,
+        tags: Optional[List[str]]
+    ) -> asyncio.Task:
+        """Start the single computation for key and register it as in flight"""
+        if distributed_lock and self.is_connected():
+            coro = self._compute_with_lock(key, compute, ttl, stale_ttl, lock_timeout, tags)
+        else:
+            coro = self._compute_and_store(key, compute, ttl, stale_ttl, tags)
+        
+        task = asyncio.create_task(coro)
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._compute_done(key, t))
+        return task
+    
+    def _compute_done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error(f"Cache computation error for key {key}: {task.exception()}")
+    
+    async def _compute_and_store(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: int,
+        stale_ttl: int,
+        tags: Optional[List[str]]
+    ) -> Any:
+        self._stats["computations"] += 1
+        started = time.time()
+        value = await compute()
+        finished = time.time()
+        
+        await self.set(key, {
+            "__swr__": True,
+            "value": value,
+            "fresh_until": finished + ttl,
+            "delta": finished - started
+        }, ttl=ttl + stale_ttl, tags=tags)
+        return value
+    
+    async def _compute_with_lock(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: int,
+        stale_ttl: int,
+        lock_timeout: float,
+        tags: Optional[List[str]]
+    ) -> Any:
+        """Compute under a Redis lock so only one worker recomputes key"""
+        lock_key = self._make_key(f"{key}:__lock__")
+        token = str(uuid.uuid4())
+        
+        deadline = time.monotonic() + lock_timeout
+        delay = 0.01
+        while True:
+            try:
+                acquired = await self._redis_client.set(
+                    lock_key, token, px=int(lock_timeout * 1000), nx=True
+                )
+            except Exception as e:
+                self.logger.error(f"Cache lock error for key {key}: {e}")
+                acquired = True
+                token = None
+            
+            if acquired:
+                break
+            
+            # Another worker is computing; use its value once written
+            self._stats["lock_waits"] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.2)
+            
+            cached = await self.get(key)
+            if isinstance(cached, dict) and cached.get("__swr__") and cached["fresh_until"] > time.time():
+                return cached["value"]
+            if time.monotonic() >= deadline:
+                break
+        
+        try:
+            return await self._compute_and_store(key, compute, ttl, stale_ttl, tags)
+        finally:
+            if token is not None:
+                try:
+                    await self._redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+                except Exception as e:
+                    self.logger.error(f"Cache lock release error for key {key}: {e}")
+    
+    async def sample_memory_usage(self, sample_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Estimate memory per key prefix from MEMORY USAGE on random keys
+        
+        RANDOMKEY and MEMORY USAGE are O(1) per key, so this costs two
+        pipelined round trips regardless of keyspace size. Estimates are
+        scaled up by DBSIZE and reported by get_prefix_stats.
+        
+        Args:
+            sample_size: Number of random keys to sample
+            
+        Returns:
+            Per-prefix statistics including the new estimate
+        """
+        backend = self._backend
+        if backend is None:
+            return self.get_prefix_stats()
+        
+        sample_size = sample_size or self.memory_sample_size
+        async with backend.pipeline(transaction=False) as pipe:
+            for _ in range(sample_size):
+                pipe.randomkey()
+            pipe.dbsize()
+            replies = await pipe.execute()
+        
+        dbsize = replies[-1]
+        drawn = [key for key in replies[:-1] if key is not None]
+        keys = {
+            key.decode() if isinstance(key, bytes) else key
+            for key in drawn
+        }
+        # The database may hold other applications' keys too
+        own_keys = [key for key in keys if key.startswith(self.key_prefix)]
+        
+        async with backend.pipeline(transaction=False) as pipe:
+            for key in own_keys:
+                pipe.memory_usage(key)
+            sizes = await pipe.execute(raise_on_error=False)
+        
+        by_prefix: Dict[str, List[int]] = {}
+        for key, size in zip(own_keys, sizes):
+            if isinstance(size, int):
+                prefix = key[len(self.key_prefix):].partition(self.prefix_stats.separator)[0]
+                by_prefix.setdefault(prefix, []).append(size)
+        
+        total_keys = int(dbsize * len(own_keys) / len(keys)) if keys else 0
+        self.prefix_stats.record_memory_sample(by_prefix, total_keys, datetime.now().isoformat())
+        return self.get_prefix_stats()
+    
+    async def _memory_sample_loop(self) -> None:
+        """Refresh the per-prefix memory estimate periodically"""
+        while True:
+            try:
+                await asyncio.sleep(self.memory_sample_interval)
+                await self.sample_memory_usage()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self.logger.error(f"Cache memory sampling error: {e}")
+    
+    def get_prefix_stats(self) -> Dict[str, Any]:
+        """Get hits, misses, bytes, evictions, latency and memory estimates per key prefix"""
+        return self.prefix_stats.to_dict()
+    
     async def health_check(self) -> Dict[str, Any]:
         """
         Perform cache service health check
@@ -461,14 +1386,16 @@ class CacheService(BaseService):
         if not REDIS_AVAILABLE:
             return {
                 "status": "mock",
-                "note": "Redis not available - running in mock mode",
-                "suggestion": "Install Redis dependencies: pip install redis[hiredis]"
+                "note": "Redis not available - using in-process cache stand-in",
+                "suggestion": "Install Redis dependencies: pip install redis[hiredis]",
+                "cache_stats": self.get_stats()
             }
         
         if not self._is_connected:
             return {
-                "status": "disconnected",
-                "error": "Redis cache service is not connected"
+                "status": "local" if self._local_backend else "disconnected",
+                "error": "Redis cache service is not connected",
+                "cache_stats": self.get_stats()
             }
         
         try:
@@ -487,7 +1414,8 @@ class CacheService(BaseService):
                 "connected_clients": info.get("connected_clients"),
                 "used_memory_human": info.get("used_memory_human"),
                 "keyspace_hits": info.get("keyspace_hits", 0),
-                "keyspace_misses": info.get("keyspace_misses", 0)
+                "keyspace_misses": info.get("keyspace_misses", 0),
+                "cache_stats": self.get_stats()
             }
             
         except Exception as e:
@@ -499,24 +1427,70 @@ class CacheService(BaseService):
     def is_connected(self) -> bool:
         """Check if cache service is connected"""
         return REDIS_AVAILABLE and self._is_connected
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get L1/L2 hit ratios and L1 occupancy"""
+        stats = self._stats
+        l1_lookups = stats["l1_hits"] + stats["l1_misses"]
+        l2_lookups = stats["l2_hits"] + stats["l2_misses"]
+        return {
+            "backend": "redis" if self.is_connected() else ("local" if self._local_backend else "none"),
+            "serializer": self.serializer.name,
+            "l1_enabled": self._l1_active,
+            "l1_hits": stats["l1_hits"],
+            "l1_misses": stats["l1_misses"],
+            "l1_hit_ratio": round(stats["l1_hits"] / l1_lookups, 4) if l1_lookups else 0.0,
+            "l2_hits": stats["l2_hits"],
+            "l2_misses": stats["l2_misses"],
+            "l2_hit_ratio": round(stats["l2_hits"] / l2_lookups, 4) if l2_lookups else 0.0,
+            "l1": self._l1.get_stats(),
+            "invalidations_sent": stats["invalidations_sent"],
+            "invalidations_received": stats["invalidations_received"],
+            "computations": stats["computations"],
+            "coalesced_waits": stats["coalesced_waits"],
+            "stale_served": stats["stale_served"],
+            "early_refreshes": stats["early_refreshes"],
+            "lock_waits": stats["lock_waits"]
+        }
 
 
 # Cache decorators for easy use
-def cache_result(key_template: str, ttl: int = 3600):
+def cache_result(
+    key_template: str,
+    ttl: int = 3600,
+    stale_ttl: int = 0,
+    early_expiration: float = 1.0,
+    distributed_lock: bool = False,
+    lock_timeout: float = 30.0,
+    tags: Optional[List[str]] = None
+):
     """
     Decorator to cache function results
     
+    Concurrent misses for the same key share one call; see
+    CacheService.get_or_compute for the stale-while-revalidate options.
+    
     Args:
         key_template: Cache key template (can use function args)
         ttl: Time to live in seconds
+        stale_ttl: Seconds a stale result is served while it is refreshed
+        early_expiration: Probabilistic early expiration factor (0 disables)
+        distributed_lock: Coordinate recomputation across processes via Redis
+        lock_timeout: Lock lifetime and maximum wait in seconds
+        tags: Tag templates (formatted like key_template) for invalidate_tags
     """
     def decorator(func):
+        @functools.wraps(func)
         async def wrapper(*args, **kwargs):
             # Get cache service from service container
             from .service_container import get_service
-            cache_service = get_service("CacheService")
+            try:
+                cache_service = await get_service("CacheService")
+            except ValueError:
+                # Not registered in this application
+                cache_service = None
             
-            if not cache_service or not cache_service.is_connected():
+            if not cache_service or not cache_service.is_available():
                 # No caching available, call function directly
                 return await func(*args, **kwargs)
             
@@ -527,16 +1501,22 @@ def cache_result(key_template: str, ttl: int = 3600):
                 # Fallback to function name if template fails
                 cache_key = f"{func.__name__}:{hash(str(args) + str(kwargs))}"
             
-            # Try to get from cache
-            cached_result = await cache_service.get(cache_key)
-            if cached_result is not None:
-                return cached_result
-            
-            # Call function and cache result
-            result = await func(*args, **kwargs)
-            await cache_service.set(cache_key, result, ttl=ttl)
+            try:
+                cache_tags = [tag.format(*args, **kwargs) for tag in tags or ()]
+            except (IndexError, KeyError):
+                # Tag by the unformatted template rather than not at all
+                cache_tags = list(tags)
             
-            return result
+            return await cache_service.get_or_compute(
+                cache_key,
+                lambda: func(*args, **kwargs),
+                ttl=ttl,
+                stale_ttl=stale_ttl,
+                early_expiration=early_expiration,
+                distributed_lock=distributed_lock,
+                lock_timeout=lock_timeout,
+                tags=cache_tags
+            )
         
         return wrapper
     return decorator
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Latency Histogram
+Fixed-memory, mergeable latency histograms with bounded relative error
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram (DDSketch style)
+
+    Each value lands in the bucket ceil(log_gamma(value)), so any reported
+    quantile is within relative_accuracy of a true sample. Recording is
+    O(1); bucket indexes are clamped to [min_value_ms, max_value_ms], which
+    bounds memory to a few hundred buckets regardless of sample count.
+    Histograms with the same accuracy and range merge by adding counts.
+    """
+
+    def __init__(
+        self,
+        relative_accuracy: float = 0.01,
+        min_value_ms: float = 0.001,
+        max_value_ms: float = 3600000.0
+    ):
+        self.relative_accuracy = relative_accuracy
+        self.min_value_ms = min_value_ms
+        self.max_value_ms = max_value_ms
+
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._inv_log_gamma = 1.0 / math.log(self._gamma)
+        self._min_index = self._index(min_value_ms)
+        self._max_index = self._index(max_value_ms)
+
+        self._buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def _index(self, value_ms: float) -> int:
+        return math.ceil(math.log(value_ms) * self._inv_log_gamma)
+
+    def record(self, value_ms: float) -> None:
+        """Record one sample in milliseconds"""
+        if value_ms <= self.min_value_ms:
+            index = self._min_index
+        elif value_ms >= self.max_value_ms:
+            index = self._max_index
+        else:
+            index = math.ceil(math.log(value_ms) * self._inv_log_gamma)
+
+        buckets = self._buckets
+        buckets[index] = buckets.get(index, 0) + 1
+        self.count += 1
+        self.total_ms += value_ms
+        if value_ms > self.max_ms:
+            self.max_ms = value_ms
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """Add another histogram's samples into this one"""
+        if other._gamma != self._gamma or other._min_index != self._min_index:
+            raise ValueError("Cannot merge histograms with different accuracy or range")
+
+        for index, count in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + count
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        return self
+
+    @classmethod
+    def merged(cls, histograms: Iterable["LatencyHistogram"]) -> "LatencyHistogram":
+        """Merge histograms into a new one"""
+        result: Optional[LatencyHistogram] = None
+        for histogram in histograms:
+            if result is None:
+                result = cls(histogram.relative_accuracy, histogram.min_value_ms, histogram.max_value_ms)
+            result.merge(histogram)
+        return result or cls()
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Get the q-quantile (0 <= q <= 1) in milliseconds"""
+        return self.percentiles([q])[0]
+
+    def percentiles(self, quantiles: List[float]) -> List[float]:
+        """Get several ascending quantiles in one pass over the buckets"""
+        if not self.count:
+            return [0.0] * len(quantiles)
+
+        results = []
+        pending = iter(quantiles)
+        q = next(pending, None)
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            while q is not None and seen > q * (self.count - 1):
+                # Bucket midpoint in the relative-error sense
+                results.append(min(2 * self._gamma ** index / (self._gamma + 1), self.max_ms))
+                q = next(pending, None)
+            if q is None:
+                break
+
+        results.extend([self.max_ms] * (len(quantiles) - len(results)))
+        return results
+
+    def reset(self) -> None:
+        self._buckets.clear()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def summary(self) -> Dict[str, float]:
+        """Get count, mean, tail percentiles and max in milliseconds"""
+        p50, p95, p99, p999 = self.percentiles([0.50, 0.95, 0.99, 0.999])
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean_ms, 3),
+            "p50_ms": round(p50, 3),
+            "p95_ms": round(p95, 3),
+            "p99_ms": round(p99, 3),
+            "p999_ms": round(p999, 3),
+            "max_ms": round(self.max_ms, 3)
+        }
@@ -0,0 +1,386 @@
+"""
+In-process cache stores for StorySign platform
+Provides the bounded L1 tier in front of Redis and a local Redis stand-in
+"""
+
+import asyncio
+import fnmatch
+import random
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class LRUCache:
+    """
+    Bounded LRU cache with per-entry TTL and byte-size accounting
+
+    Entries are evicted least-recently-used first once either max_entries
+    or max_bytes is exceeded; expired entries are dropped when read.
+    on_evict, if given, is called with each evicted key.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        max_entries: int = 10000,
+        on_evict: Optional[Callable[[str], None]] = None
+    ):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+
+        # key -> (value, monotonic expiry or None, size in bytes)
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[float], int]]" = OrderedDict()
+        self.current_bytes = 0
+
+        # Bumped on every invalidation so in-flight fills can detect races
+        self.generation = 0
+
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any:
+        """Get a value and mark it recently used, or None if absent/expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at, size = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.current_bytes -= size
+            self.expirations += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, size: int = 0) -> None:
+        """Store a value, evicting least-recently-used entries to stay within bounds"""
+        if size > self.max_bytes:
+            self.pop(key)
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.current_bytes -= old[2]
+
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (value, expires_at, size)
+        self.current_bytes += size
+
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes
+        ):
+            evicted_key, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(evicted_key)
+
+    def size_of(self, key: str) -> Optional[int]:
+        """Accounted size of an entry in bytes, None if absent"""
+        entry = self._entries.get(key)
+        return None if entry is None else entry[2]
+
+    def ttl(self, key: str) -> Optional[float]:
+        """Remaining TTL in seconds, None if no expiry, -1 if absent"""
+        entry = self._entries.get(key)
+        if entry is None or self.get(key) is None:
+            return -1
+        expires_at = entry[1]
+        return None if expires_at is None else expires_at - time.monotonic()
+
+    def expire(self, key: str, ttl: float) -> bool:
+        """Reset the TTL of an existing entry"""
+        value = self.get(key)
+        if value is None:
+            return False
+        _, _, size = self._entries[key]
+        self._entries[key] = (value, time.monotonic() + ttl, size)
+        return True
+
+    def pop(self, key: str) -> Any:
+        """Remove an entry, returning its value"""
+        self.generation += 1
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.current_bytes -= entry[2]
+        return entry[0]
+
+    def pop_many(self, keys: Iterable[str]) -> int:
+        """Remove several entries, returning how many existed"""
+        return sum(1 for key in keys if self.pop(key) is not None)
+
+    def pop_pattern(self, pattern: str) -> int:
+        """Remove entries whose keys match a glob pattern"""
+        return self.pop_many([key for key in self._entries if fnmatch.fnmatchcase(key, pattern)])
+
+    def keys(self, pattern: str = "*") -> List[str]:
+        """Keys (including not-yet-collected expired ones) matching a glob pattern"""
+        if pattern == "*":
+            return list(self._entries)
+        return [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the subset of the redis.asyncio API CacheService uses
+
+    Used when Redis is not installed or unreachable so caching still works
+    within a single worker; values are not shared across processes.
+    """
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024, max_entries: int = 100000):
+        self._store = LRUCache(max_bytes=max_bytes, max_entries=max_entries)
+
+        # Key snapshot for randomkey, refreshed at most once a second
+        self._random_pool: List[str] = []
+        self._random_pool_at = 0.0
+
+    @staticmethod
+    def _size(value: Any) -> int:
+        if isinstance(value, (str, bytes)):
+            return len(value)
+        if isinstance(value, set):
+            return 64 * len(value)
+        return 8
+
+    def pipeline(self, transaction: bool = False) -> "LocalPipeline":
+        return LocalPipeline(self)
+
+    async def ping(self) -> bool:
+        return True
+
+    async def get(self, name: str) -> Any:
+        return self._store.get(name)
+
+    async def set(
+        self,
+        name: str,
+        value: Any,
+        ex: Optional[int] = None,
+        nx: bool = False,
+        xx: bool = False
+    ) -> Optional[bool]:
+        exists = self._store.get(name) is not None
+        if (nx and exists) or (xx and not exists):
+            return None
+        self._store.set(name, value, ttl=ex, size=self._size(value))
+        return True
+
+    async def delete(self, *names: str) -> int:
+        return self._store.pop_many(names)
+
+    async def exists(self, *names: str) -> int:
+        return sum(1 for name in names if self._store.get(name) is not None)
+
+    async def unlink(self, *names: str) -> int:
+        return self._store.pop_many(names)
+
+    async def rename(self, src: str, dst: str) -> bool:
+        remaining = self._store.ttl(src)
+        value = self._store.pop(src)
+        if value is None:
+            raise KeyError("no such key")
+        ttl = remaining if remaining is not None and remaining > 0 else None
+        self._store.set(dst, value, ttl=ttl, size=self._size(value))
+        return True
+
+    async def expire(
+        self,
+        name: str,
+        time: int,
+        nx: bool = False,
+        xx: bool = False,
+        gt: bool = False,
+        lt: bool = False
+    ) -> bool:
+        remaining = self._store.ttl(name)
+        if remaining == -1:
+            return False
+        # A key without a TTL counts as an infinite TTL for gt/lt
+        if (nx and remaining is not None) or (xx and remaining is None):
+            return False
+        if gt and (remaining is None or time <= remaining):
+            return False
+        if lt and remaining is not None and time >= remaining:
+            return False
+        return self._store.expire(name, time)
+
+    async def pttl(self, name: str) -> int:
+        remaining = self._store.ttl(name)
+        if remaining is None:
+            return -1
+        if remaining == -1:
+            return -2
+        return max(0, int(remaining * 1000))
+
+    async def persist(self, name: str) -> bool:
+        if self._store.ttl(name) in (None, -1):
+            return False
+        value = self._store.get(name)
+        self._store.set(name, value, size=self._size(value))
+        return True
+
+    async def incrby(self, name: str, amount: int = 1) -> int:
+        current = self._store.get(name)
+        value = int(current or 0) + amount
+        remaining = self._store.ttl(name) if current is not None else None
+        self._store.set(name, str(value), ttl=remaining if remaining and remaining > 0 else None, size=8)
+        return value
+
+    async def mget(self, keys: List[str]) -> List[Any]:
+        return [self._store.get(key) for key in keys]
+
+    async def mset(self, mapping: Dict[str, Any]) -> bool:
+        for name, value in mapping.items():
+            self._store.set(name, value, size=self._size(value))
+        return True
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        return [key for key in self._store.keys(pattern) if self._store.get(key) is not None]
+
+    async def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None) -> AsyncIterator[str]:
+        # Iterates a snapshot so callers may delete keys while scanning, and
+        # yields to the event loop every `count` keys like SCAN's cursor steps
+        snapshot = self._store.keys()
+        step = count or 10
+        for start in range(0, len(snapshot), step):
+            for key in snapshot[start:start + step]:
+                if (match is None or fnmatch.fnmatchcase(key, match)) and self._store.get(key) is not None:
+                    yield key
+            await asyncio.sleep(0)
+
+    async def sadd(self, name: str, *values: str) -> int:
+        members = self._store.get(name)
+        if members is None:
+            members = set()
+        before = len(members)
+        members.update(values)
+        remaining = self._store.ttl(name)
+        ttl = remaining if remaining is not None and remaining > 0 else None
+        self._store.set(name, members, ttl=ttl, size=self._size(members))
+        return len(members) - before
+
+    async def srem(self, name: str, *values: str) -> int:
+        members = self._store.get(name)
+        if members is None:
+            return 0
+        before = len(members)
+        members.difference_update(values)
+        return before - len(members)
+
+    async def smembers(self, name: str) -> set:
+        return set(self._store.get(name) or ())
+
+    async def scard(self, name: str) -> int:
+        return len(self._store.get(name) or ())
+
+    async def sscan_iter(
+        self,
+        name: str,
+        match: Optional[str] = None,
+        count: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        snapshot = list(self._store.get(name) or ())
+        step = count or 10
+        for start in range(0, len(snapshot), step):
+            for member in snapshot[start:start + step]:
+                if match is None or fnmatch.fnmatchcase(member, match):
+                    yield member
+            await asyncio.sleep(0)
+
+    async def randomkey(self) -> Optional[str]:
+        if time.monotonic() - self._random_pool_at > 1.0:
+            self._random_pool = self._store.keys()
+            self._random_pool_at = time.monotonic()
+        for _ in range(3):
+            if not self._random_pool:
+                return None
+            key = random.choice(self._random_pool)
+            if self._store.get(key) is not None:
+                return key
+        return None
+
+    async def memory_usage(self, key: str, samples: Optional[int] = None) -> Optional[int]:
+        size = self._store.size_of(key)
+        # Approximate per-key overhead of a Redis string
+        return None if size is None else size + len(key) + 56
+
+    async def dbsize(self) -> int:
+        return len(self._store)
+
+    async def publish(self, channel: str, message: Any) -> int:
+        # Single process: there are no other subscribers
+        return 0
+
+    async def info(self) -> Dict[str, Any]:
+        stats = self._store.get_stats()
+        return {
+            "redis_version": "local",
+            "connected_clients": 1,
+            "used_memory_human": f"{stats['bytes'] / (1024 * 1024):.2f}M",
+            "evicted_keys": stats["evictions"]
+        }
+
+    async def close(self) -> None:
+        self._store.clear()
+
+
+class LocalPipeline:
+    """Buffers LocalRedis commands and runs them in order on execute()"""
+
+    def __init__(self, client: LocalRedis):
+        self._client = client
+        self._commands: List[Tuple[str, tuple, dict]] = []
+
+    async def __aenter__(self) -> "LocalPipeline":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._commands.clear()
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def __getattr__(self, name: str):
+        getattr(self._client, name)
+
+        def queue(*args, **kwargs) -> "LocalPipeline":
+            self._commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self, raise_on_error: bool = True) -> List[Any]:
+        commands, self._commands = self._commands, []
+        results = []
+        for name, args, kwargs in commands:
+            try:
+                results.append(await getattr(self._client, name)(*args, **kwargs))
+            except Exception as e:
+                if raise_on_error:
+                    raise
+                results.append(e)
+        return results
@@ -8,14 +8,19 @@ import asyncio
 import logging
 import time
 import json
-from typing import Dict, List, Optional, Any, Callable, Union
+from typing import Dict, List, Optional, Any, Callable, Tuple, Union
 from dataclasses import dataclass, field
 from collections import deque
 from datetime import datetime, timedelta
 from enum import Enum
+from pathlib import Path
 import heapq
+import random
 import uuid
 
+from .latency_histogram import LatencyHistogram
+from .segment_log import SegmentLog
+
 
 class MessagePriority(Enum):
     """Message priority levels"""
@@ -25,6 +30,13 @@ class MessagePriority(Enum):
     CRITICAL = 3
 
 
+class RoutingStrategy(Enum):
+    """Queue selection strategies for load balancer groups"""
+    ROUND_ROBIN = "round_robin"
+    LEAST_DEPTH = "least_depth"  # Fewest queued + in-flight messages
+    EWMA = "ewma"  # Lowest expected wait from EWMA service time
+
+
 @dataclass
 class QueuedMessage:
     """Message in the queue with metadata"""
@@ -35,6 +47,7 @@ class QueuedMessage:
     expires_at: Optional[datetime] = None
     retry_count: int = 0
     max_retries: int = 3
+    enqueued_at: float = 0.0  # monotonic time of the latest push
     
     def __lt__(self, other):
         """For priority queue ordering"""
@@ -43,6 +56,60 @@ class QueuedMessage:
         return self.created_at < other.created_at  # FIFO for same priority
 
 
+@dataclass
+class DeadLetter:
+    """Message that exhausted its retries"""
+    message: QueuedMessage
+    message_type: str
+    error: str
+    failed_at: datetime
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.message.id,
+            "type": self.message_type,
+            "content": self.message.content,
+            "priority": self.message.priority.name,
+            "retry_count": self.message.retry_count,
+            "error": self.error,
+            "created_at": self.message.created_at.isoformat(),
+            "failed_at": self.failed_at.isoformat()
+        }
+
+
+@dataclass
+class BatchHandler:
+    """Handler that receives up to max_batch_size messages of one type per call"""
+    handler: Callable[[List[QueuedMessage]], Any]
+    max_batch_size: int = 100
+    max_linger: float = 0.005  # 5ms
+    batches: int = 0
+    messages: int = 0
+    max_observed: int = 0
+    # Batch-size histogram keyed by power-of-two upper bound
+    size_buckets: Dict[int, int] = field(default_factory=dict)
+    
+    def record(self, size: int):
+        self.batches += 1
+        self.messages += size
+        self.max_observed = max(self.max_observed, size)
+        bucket = 1 << (size - 1).bit_length()
+        self.size_buckets[bucket] = self.size_buckets.get(bucket, 0) + 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_linger_ms": self.max_linger * 1000,
+            "batches": self.batches,
+            "messages": self.messages,
+            "avg_batch_size": round(self.messages / self.batches, 2) if self.batches else 0.0,
+            "max_observed_batch_size": self.max_observed,
+            "batch_size_distribution": {
+                f"<={bucket}": count for bucket, count in sorted(self.size_buckets.items())
+            }
+        }
+
+
 @dataclass
 class QueueStats:
     """Queue statistics"""
@@ -50,6 +117,9 @@ class QueueStats:
     messages_processed: int = 0
     messages_failed: int = 0
     messages_expired: int = 0
+    expiry_cleanup_runs: int = 0
+    expiry_cleanup_time_ms: float = 0.0
+    max_expiry_cleanup_ms: float = 0.0
     avg_processing_time_ms: float = 0.0
     queue_depth: int = 0
     throughput_per_second: float = 0.0
@@ -66,7 +136,11 @@ class MessageQueue:
         max_size: int = 10000,
         batch_size: int = 10,
         batch_timeout: float = 0.01,  # 10ms
-        enable_persistence: bool = False
+        enable_persistence: bool = False,
+        persistence_dir: Optional[Union[str, Path]] = None,
+        retry_base_delay: float = 0.1,
+        retry_max_delay: float = 30.0,
+        dead_letter_size: int = 1000
     ):
         self.name = name
         self.max_size = max_size
@@ -76,10 +150,22 @@ class MessageQueue:
         
         self.logger = logging.getLogger(f"{__name__}.MessageQueue.{name}")
         
+        # Durable log of unacknowledged messages, replayed on start
+        self._log: Optional[SegmentLog] = None
+        if enable_persistence:
+            self._log = SegmentLog(persistence_dir or Path("data") / "queues" / name)
+        
         # Queue storage
         self._priority_queue: List[QueuedMessage] = []
         self._message_lookup: Dict[str, QueuedMessage] = {}
+        # (monotonic deadline, sequence, message) ordered by deadline. Expired
+        # messages leave tombstones in the priority heap that dequeue skips.
+        self._expiry_heap: List[Tuple[float, int, QueuedMessage]] = []
+        self._expiry_sequence = 0
+        self._live_count = 0
         self._queue_lock = asyncio.Lock()
+        # Wakes idle dequeuers on enqueue instead of polling
+        self._not_empty = asyncio.Condition(self._queue_lock)
         
         # Processing
         self._processors: List[asyncio.Task] = []
@@ -87,13 +173,46 @@ class MessageQueue:
         self._processing = False
         self._message_handlers: List[Callable] = []
         
+        # Batch handlers by message type, each fed from a FIFO lane of that
+        # type's messages (entries are also in the priority heap)
+        self._batch_handlers: Dict[str, BatchHandler] = {}
+        self._batch_lanes: Dict[str, deque] = {}
+        self._lane_events: Dict[str, asyncio.Event] = {}
+        
         # Batching
         self._pending_batch: List[QueuedMessage] = []
         self._batch_timer: Optional[asyncio.Task] = None
         
+        # Load signals for routing and work stealing
+        self._in_flight = 0
+        self.ewma_service_time_ms = 0.0
+        self.ewma_alpha = 0.2
+        self._steal_peers: List["MessageQueue"] = []
+        self.steal_threshold = 1  # Only steal from peers with a backlog
+        self._idle_workers = 0
+        self._steal_wake_pending = False
+        self.messages_stolen = 0
+        
+        # Scheduled retries: (monotonic due time, sequence, message), drained
+        # by one scheduler task instead of a sleeping task per retry
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._retry_heap: List[Tuple[float, int, QueuedMessage]] = []
+        self._retry_sequence = 0
+        self._retry_wakeup = asyncio.Event()
+        self._retry_task: Optional[asyncio.Task] = None
+        self.retries_scheduled = 0
+        
+        # Dead-letter queue (oldest entries drop first once full)
+        self._dead_letters: deque = deque(maxlen=dead_letter_size)
+        self.messages_dead_lettered = 0
+        self._failures_by_type: Dict[str, int] = {}
+        self._dead_lettered_by_type: Dict[str, int] = {}
+        
         # Statistics
         self.stats = QueueStats()
-        self._processing_times = deque(maxlen=1000)
+        self.enqueue_wait_histogram = LatencyHistogram()
+        self.handler_time_histogram = LatencyHistogram()
         self._throughput_samples = deque(maxlen=60)  # 1 minute of samples
         
         # Flow control
@@ -106,6 +225,11 @@ class MessageQueue:
     async def start(self, processor_count: int = 1):
         """Start the message queue processors"""
         self._processor_count = processor_count
+        
+        # Replay messages that were never acknowledged before the last shutdown
+        if self._log:
+            await self._replay_log()
+        
         self._processing = True
         
         # Start processor tasks
@@ -116,6 +240,8 @@ class MessageQueue:
         # Start throughput monitoring
         asyncio.create_task(self._throughput_monitor())
         
+        self._retry_task = asyncio.create_task(self._retry_scheduler())
+        
         self.logger.info(f"Message queue '{self.name}' started with {processor_count} processors")
     
     async def stop(self):
@@ -126,6 +252,10 @@ class MessageQueue:
         if self._batch_timer:
             self._batch_timer.cancel()
         
+        if self._retry_task:
+            self._retry_task.cancel()
+            self._retry_task = None
+        
         # Cancel all processors
         for processor in self._processors:
             processor.cancel()
@@ -135,6 +265,10 @@ class MessageQueue:
             await asyncio.gather(*self._processors, return_exceptions=True)
         
         self._processors.clear()
+        
+        if self._log:
+            await self._log.close()
+        
         self.logger.info(f"Message queue '{self.name}' stopped")
     
     async def enqueue(
@@ -159,19 +293,12 @@ class MessageQueue:
         if not message_id:
             message_id = str(uuid.uuid4())
         
-        # Check queue capacity
-        async with self._queue_lock:
-            if len(self._priority_queue) >= self.max_size:
-                # Try to remove expired messages first
-                await self._cleanup_expired_messages()
-                
-                if len(self._priority_queue) >= self.max_size:
-                    raise RuntimeError(f"Queue '{self.name}' is full (max_size: {self.max_size})")
-        
         # Create queued message
         expires_at = None
+        expires_deadline = None
         if ttl_seconds:
             expires_at = datetime.now() + timedelta(seconds=ttl_seconds)
+            expires_deadline = time.monotonic() + ttl_seconds
         
         queued_msg = QueuedMessage(
             id=message_id,
@@ -182,15 +309,113 @@ class MessageQueue:
         )
         
         # Add to queue
-        async with self._queue_lock:
-            heapq.heappush(self._priority_queue, queued_msg)
-            self._message_lookup[message_id] = queued_msg
+        commit = None
+        async with self._not_empty:
+            # Check queue capacity
+            if self._live_count >= self.max_size:
+                # Try to remove expired messages first
+                await self._cleanup_expired_messages()
+                
+                if self._live_count >= self.max_size:
+                    raise RuntimeError(f"Queue '{self.name}' is full (max_size: {self.max_size})")
+            
+            if self._log:
+                commit = self._log.append(message_id, self._to_log_record(queued_msg))
+            
+            self._push_message(queued_msg, expires_deadline)
             self.stats.messages_queued += 1
-            self.stats.queue_depth = len(self._priority_queue)
+        
+        # Group commit: concurrent enqueues share one fsync
+        if commit:
+            await commit
         
         self.logger.debug(f"Message {message_id} enqueued with priority {priority.name}")
         return message_id
     
+    def _push_message(self, queued_msg: QueuedMessage, expires_deadline: Optional[float]):
+        """Insert a message and wake one dequeuer (caller holds the queue lock)"""
+        if queued_msg.id in self._message_lookup:
+            # Re-enqueue under a live ID supersedes the older entry
+            self._live_count -= 1
+        
+        queued_msg.enqueued_at = time.monotonic()
+        heapq.heappush(self._priority_queue, queued_msg)
+        self._message_lookup[queued_msg.id] = queued_msg
+        if expires_deadline is not None:
+            self._expiry_sequence += 1
+            heapq.heappush(
+                self._expiry_heap,
+                (expires_deadline, self._expiry_sequence, queued_msg)
+            )
+            self._maybe_compact_expiry_heap()
+        self._live_count += 1
+        self.stats.queue_depth = self._live_count
+        
+        if self._batch_lanes:
+            message_type = self._message_type(queued_msg)
+            lane = self._batch_lanes.get(message_type)
+            if lane is not None:
+                lane.append(queued_msg)
+                self._lane_events[message_type].set()
+        
+        # Backlog with every local worker busy: let an idle peer steal
+        if self._steal_peers and self._idle_workers == 0 and self._live_count > self.steal_threshold:
+            self._wake_idle_peer()
+        
+        # Hand the message to one waiting processor
+        self._not_empty.notify()
+    
+    def _to_log_record(self, message: QueuedMessage) -> Dict[str, Any]:
+        """Serialize a message for the segment log"""
+        return {
+            "id": message.id,
+            "content": message.content,
+            "priority": message.priority.value,
+            "created_at": message.created_at.isoformat(),
+            "expires_at": message.expires_at.timestamp() if message.expires_at else None,
+            "retry_count": message.retry_count,
+            "max_retries": message.max_retries
+        }
+    
+    async def _replay_log(self):
+        """Reload unacknowledged messages from the segment log"""
+        records = await self._log.open()
+        now = time.time()
+        replayed = expired = 0
+        
+        async with self._not_empty:
+            for record in records:
+                expires_deadline = None
+                if record["expires_at"] is not None:
+                    remaining = record["expires_at"] - now
+                    if remaining <= 0:
+                        self._log.ack(record["id"])
+                        expired += 1
+                        continue
+                    expires_deadline = time.monotonic() + remaining
+                
+                self._push_message(QueuedMessage(
+                    id=record["id"],
+                    content=record["content"],
+                    priority=MessagePriority(record["priority"]),
+                    created_at=datetime.fromisoformat(record["created_at"]),
+                    expires_at=datetime.fromtimestamp(record["expires_at"]) if record["expires_at"] else None,
+                    retry_count=record["retry_count"],
+                    max_retries=record["max_retries"]
+                ), expires_deadline)
+                replayed += 1
+        
+        self.stats.messages_expired += expired
+        if replayed or expired:
+            self.logger.info(
+                f"Replayed {replayed} messages into queue '{self.name}' ({expired} expired while down)"
+            )
+    
+    def _acknowledge(self, message: QueuedMessage):
+        """Mark a message as finished so it is not replayed after a restart"""
+        if self._log:
+            self._log.ack(message.id)
+    
     async def dequeue(self, timeout: Optional[float] = None) -> Optional[QueuedMessage]:
         """
         Dequeue a message
@@ -201,53 +426,155 @@ class MessageQueue:
         Returns:
             QueuedMessage or None if timeout/empty
         """
-        start_time = time.time()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout else None
         
-        while True:
-            async with self._queue_lock:
+        async with self._not_empty:
+            while True:
                 # Clean up expired messages
                 await self._cleanup_expired_messages()
                 
-                if self._priority_queue:
-                    message = heapq.heappop(self._priority_queue)
-                    del self._message_lookup[message.id]
-                    self.stats.queue_depth = len(self._priority_queue)
+                message = self._pop_live_message() or self._steal_message()
+                if message:
                     return message
+                
+                # Sleep until an enqueue notifies us or the timeout elapses
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        return None
+                
+                self._idle_workers += 1
+                try:
+                    async with asyncio.timeout(remaining):
+                        await self._not_empty.wait()
+                except TimeoutError:
+                    return None
+                finally:
+                    self._idle_workers -= 1
+    
+    def _is_live(self, message: QueuedMessage) -> bool:
+        """Check that a heap entry has not been expired or superseded"""
+        return self._message_lookup.get(message.id) is message
+    
+    @property
+    def outstanding_work(self) -> int:
+        """Queued, batched, in-flight and retry-pending messages"""
+        return self._live_count + len(self._pending_batch) + self._in_flight + len(self._retry_heap)
+    
+    def expected_wait_ms(self) -> float:
+        """Estimated wait for a new message from the EWMA service time"""
+        processors = max(1, len(self._processors))
+        return (self.outstanding_work + 1) * self.ewma_service_time_ms / processors
+    
+    def _record_service_time(self, per_message_ms: float):
+        if self.ewma_service_time_ms == 0.0:
+            self.ewma_service_time_ms = per_message_ms
+        else:
+            self.ewma_service_time_ms += self.ewma_alpha * (per_message_ms - self.ewma_service_time_ms)
+    
+    def set_steal_peers(self, peers: List["MessageQueue"]):
+        """Set the sibling queues whose backlog idle workers may steal"""
+        # Stolen messages would be acked in the wrong segment log
+        if self._log:
+            peers = []
+        self._steal_peers = [peer for peer in peers if peer is not self and not peer._log]
+    
+    def _steal_message(self) -> Optional[QueuedMessage]:
+        """Take the top message from the peer with the largest backlog"""
+        victim = None
+        for peer in self._steal_peers:
+            if peer._live_count > self.steal_threshold and (
+                victim is None or peer._live_count > victim._live_count
+            ):
+                victim = peer
+        
+        if victim is None:
+            return None
+        
+        message = victim._pop_live_message()
+        if message:
+            self.messages_stolen += 1
+        return message
+    
+    def _wake_idle_peer(self):
+        """Wake one idle worker on a peer so it can steal from this queue"""
+        for peer in self._steal_peers:
+            if peer._idle_workers and not peer._steal_wake_pending:
+                peer._steal_wake_pending = True
+                asyncio.create_task(peer._notify_idle_worker())
+                return
+    
+    async def _notify_idle_worker(self):
+        async with self._not_empty:
+            self._steal_wake_pending = False
+            self._not_empty.notify()
+    
+    def _pop_live_message(self) -> Optional[QueuedMessage]:
+        """Pop the highest priority live message, discarding tombstones"""
+        while self._priority_queue:
+            message = heapq.heappop(self._priority_queue)
+            if not self._is_live(message):
+                continue
             
-            # Check timeout
-            if timeout and (time.time() - start_time) >= timeout:
-                return None
-            
-            # Wait a bit before checking again
-            await asyncio.sleep(0.001)  # 1ms
+            del self._message_lookup[message.id]
+            self._live_count -= 1
+            self.stats.queue_depth = self._live_count
+            self.enqueue_wait_histogram.record((time.monotonic() - message.enqueued_at) * 1000)
+            return message
+        return None
     
     async def _cleanup_expired_messages(self):
-        """Remove expired messages from queue"""
-        if not self._priority_queue:
+        """Remove expired messages from queue in O(expired log n)"""
+        if not self._expiry_heap or self._expiry_heap[0][0] > time.monotonic():
             return
         
-        current_time = datetime.now()
-        expired_messages = []
+        start_time = time.perf_counter()
+        now = time.monotonic()
+        expired_count = 0
         
-        # Find expired messages
-        for msg in self._priority_queue:
-            if msg.expires_at and current_time > msg.expires_at:
-                expired_messages.append(msg)
+        # Pop due deadlines; messages already dequeued are simply skipped
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, _, msg = heapq.heappop(self._expiry_heap)
+            if not self._is_live(msg):
+                continue
+            
+            del self._message_lookup[msg.id]
+            self._live_count -= 1
+            self._acknowledge(msg)
+            expired_count += 1
         
-        # Remove expired messages
-        for msg in expired_messages:
-            try:
-                self._priority_queue.remove(msg)
-                del self._message_lookup[msg.id]
-                self.stats.messages_expired += 1
-                self.logger.debug(f"Message {msg.id} expired")
-            except (ValueError, KeyError):
-                pass  # Already removed
-        
-        # Rebuild heap if we removed messages
-        if expired_messages:
+        if expired_count:
+            self.logger.debug(f"{expired_count} messages expired from queue '{self.name}'")
+            self.stats.messages_expired += expired_count
+            self.stats.queue_depth = self._live_count
+            self._maybe_compact_heap()
+        
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        self.stats.expiry_cleanup_runs += 1
+        self.stats.expiry_cleanup_time_ms += elapsed_ms
+        self.stats.max_expiry_cleanup_ms = max(self.stats.max_expiry_cleanup_ms, elapsed_ms)
+    
+    def _maybe_compact_heap(self):
+        """Compact once tombstones outnumber live messages (amortized O(1))"""
+        if len(self._priority_queue) > 2 * self._live_count + 64:
+            self._priority_queue = [
+                msg for msg in self._priority_queue if self._is_live(msg)
+            ]
             heapq.heapify(self._priority_queue)
-            self.stats.queue_depth = len(self._priority_queue)
+    
+    def _maybe_compact_expiry_heap(self):
+        """Drop deadlines of dequeued messages once they outnumber live ones (amortized O(1))"""
+        if len(self._expiry_heap) > 2 * self._live_count + 64:
+            self._expiry_heap = [
+                entry for entry in self._expiry_heap if self._is_live(entry[2])
+            ]
+            heapq.heapify(self._expiry_heap)
+    
+    @staticmethod
+    def _message_type(message: QueuedMessage) -> str:
+        return message.content.get("type", "default")
     
     def add_handler(self, handler: Callable[[QueuedMessage], Any]):
         """Add a message handler"""
@@ -260,6 +587,49 @@ class MessageQueue:
             self._message_handlers.remove(handler)
             self.logger.debug(f"Handler removed from queue '{self.name}'")
     
+    def add_batch_handler(
+        self,
+        message_type: str,
+        handler: Callable[[List[QueuedMessage]], Any],
+        max_batch_size: int = 100,
+        max_linger: float = 0.005
+    ):
+        """
+        Add a handler that processes messages of one type in batches
+        
+        Workers that dequeue a message of this type drain up to
+        max_batch_size queued messages of the same type, waiting at most
+        max_linger seconds for the batch to fill, and pass them to the
+        handler in one call. Messages of this type bypass add_handler()
+        handlers.
+        
+        Args:
+            message_type: Value of the message "type" field
+            handler: Callable taking a list of QueuedMessage
+            max_batch_size: Maximum messages per call
+            max_linger: Maximum seconds to wait for a batch to fill
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        
+        self._batch_handlers[message_type] = BatchHandler(handler, max_batch_size, max_linger)
+        self._batch_lanes[message_type] = deque(
+            msg for msg in self._message_lookup.values()
+            if self._message_type(msg) == message_type
+        )
+        self._lane_events[message_type] = asyncio.Event()
+        self.logger.debug(
+            f"Batch handler for '{message_type}' added to queue '{self.name}' "
+            f"(max_batch_size: {max_batch_size})"
+        )
+    
+    def remove_batch_handler(self, message_type: str):
+        """Remove the batch handler for a message type"""
+        if self._batch_handlers.pop(message_type, None):
+            self._batch_lanes.pop(message_type, None)
+            self._lane_events.pop(message_type, None)
+            self.logger.debug(f"Batch handler for '{message_type}' removed from queue '{self.name}'")
+    
     async def _processor_loop(self, processor_name: str):
         """Main processor loop"""
         self.logger.debug(f"Processor {processor_name} started for queue '{self.name}'")
@@ -273,7 +643,15 @@ class MessageQueue:
                         message = await self.dequeue(timeout=1.0)
                         
                         if message:
-                            await self._process_message(message, processor_name)
+                            self._in_flight += 1
+                            try:
+                                batch_handler = self._batch_handlers.get(self._message_type(message))
+                                if batch_handler:
+                                    await self._process_typed_batch(message, batch_handler)
+                                else:
+                                    await self._process_message(message, processor_name)
+                            finally:
+                                self._in_flight -= 1
                 
                 except Exception as e:
                     self.logger.error(f"Processor {processor_name} error: {e}")
@@ -296,31 +674,233 @@ class MessageQueue:
             else:
                 # Process immediately
                 await self._handle_message(message)
+                self._acknowledge(message)
             
             # Update statistics
             processing_time = (time.time() - start_time) * 1000  # ms
-            self._processing_times.append(processing_time)
+            self.handler_time_histogram.record(processing_time)
+            self._record_service_time(processing_time)
             self.stats.messages_processed += 1
-            
-            # Update average processing time
-            if self._processing_times:
-                self.stats.avg_processing_time_ms = sum(self._processing_times) / len(self._processing_times)
+            self.stats.avg_processing_time_ms = self.handler_time_histogram.mean_ms
         
         except Exception as e:
             self.logger.error(f"Message processing error: {e}")
             
             # Retry logic
-            if message.retry_count < message.max_retries:
-                message.retry_count += 1
-                await self.enqueue(
-                    message.content,
-                    message.priority,
-                    message_id=message.id
-                )
-                self.logger.debug(f"Message {message.id} requeued (retry {message.retry_count})")
+            await self._retry_or_fail(message, e)
+    
+    async def _process_typed_batch(self, first: QueuedMessage, batch_handler: BatchHandler):
+        """Drain same-type messages behind first and hand them to a batch handler"""
+        message_type = self._message_type(first)
+        lane = self._batch_lanes[message_type]
+        event = self._lane_events[message_type]
+        batch = [first]
+        
+        self._drain_lane(lane, batch, batch_handler.max_batch_size)
+        if len(batch) < batch_handler.max_batch_size and batch_handler.max_linger > 0:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + batch_handler.max_linger
+            while len(batch) < batch_handler.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                event.clear()
+                try:
+                    async with asyncio.timeout(remaining):
+                        await event.wait()
+                except TimeoutError:
+                    break
+                self._drain_lane(lane, batch, batch_handler.max_batch_size)
+        
+        start_time = time.time()
+        try:
+            if asyncio.iscoroutinefunction(batch_handler.handler):
+                await batch_handler.handler(batch)
             else:
-                self.stats.messages_failed += 1
-                self.logger.error(f"Message {message.id} failed after {message.max_retries} retries")
+                batch_handler.handler(batch)
+        except Exception as e:
+            self.logger.error(f"Batch handler error for '{message_type}' ({len(batch)} messages): {e}")
+            for msg in batch:
+                await self._retry_or_fail(msg, e)
+            return
+        
+        processing_time = (time.time() - start_time) * 1000  # ms
+        per_message_time = processing_time / len(batch)
+        for _ in batch:
+            self.handler_time_histogram.record(per_message_time)
+        self._record_service_time(per_message_time)
+        self.stats.messages_processed += len(batch)
+        self.stats.avg_processing_time_ms = self.handler_time_histogram.mean_ms
+        batch_handler.record(len(batch))
+        for msg in batch:
+            self._acknowledge(msg)
+    
+    def _drain_lane(self, lane: deque, batch: List[QueuedMessage], limit: int):
+        """Take live messages from a type lane, leaving tombstones in the heap"""
+        taken = False
+        now = time.monotonic()
+        while lane and len(batch) < limit:
+            msg = lane.popleft()
+            if not self._is_live(msg):
+                continue
+            
+            del self._message_lookup[msg.id]
+            self._live_count -= 1
+            self.enqueue_wait_histogram.record((now - msg.enqueued_at) * 1000)
+            batch.append(msg)
+            taken = True
+        
+        if taken:
+            self.stats.queue_depth = self._live_count
+            self._maybe_compact_heap()
+    
+    async def _retry_or_fail(self, message: QueuedMessage, error: Optional[Exception] = None):
+        """Schedule a backed-off retry, or dead-letter once retries are spent"""
+        message_type = self._message_type(message)
+        self._failures_by_type[message_type] = self._failures_by_type.get(message_type, 0) + 1
+        
+        if message.retry_count < message.max_retries:
+            message.retry_count += 1
+            delay = self._retry_delay(message.retry_count)
+            self._schedule_retry(message, delay)
+            self.logger.debug(
+                f"Message {message.id} retry {message.retry_count} scheduled in {delay * 1000:.0f}ms"
+            )
+        else:
+            self.stats.messages_failed += 1
+            self._dead_letter(message, message_type, error)
+            self._acknowledge(message)
+            self.logger.error(f"Message {message.id} failed after {message.max_retries} retries")
+    
+    def _retry_delay(self, attempt: int) -> float:
+        """Exponential backoff with equal jitter"""
+        ceiling = min(self.retry_max_delay, self.retry_base_delay * (2 ** (attempt - 1)))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+    
+    def _schedule_retry(self, message: QueuedMessage, delay: float):
+        self._retry_sequence += 1
+        entry = (time.monotonic() + delay, self._retry_sequence, message)
+        heapq.heappush(self._retry_heap, entry)
+        self.retries_scheduled += 1
+        
+        # Only an earlier deadline changes when the scheduler must wake
+        if self._retry_heap[0] is entry:
+            self._retry_wakeup.set()
+    
+    async def _retry_scheduler(self):
+        """Move retries back into the queue as their backoff elapses"""
+        while self._processing:
+            try:
+                self._retry_wakeup.clear()
+                delay = None
+                if self._retry_heap:
+                    delay = self._retry_heap[0][0] - time.monotonic()
+                
+                if delay is None or delay > 0:
+                    try:
+                        async with asyncio.timeout(delay):
+                            await self._retry_wakeup.wait()
+                    except TimeoutError:
+                        pass
+                    continue
+                
+                async with self._not_empty:
+                    now = time.monotonic()
+                    while self._retry_heap and self._retry_heap[0][0] <= now:
+                        _, _, message = heapq.heappop(self._retry_heap)
+                        
+                        expires_deadline = None
+                        if message.expires_at:
+                            remaining = (message.expires_at - datetime.now()).total_seconds()
+                            if remaining <= 0:
+                                self.stats.messages_expired += 1
+                                self._acknowledge(message)
+                                continue
+                            expires_deadline = now + remaining
+                        
+                        self._push_message(message, expires_deadline)
+            
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self.logger.error(f"Retry scheduler error: {e}")
+                await asyncio.sleep(0.1)
+    
+    def _dead_letter(self, message: QueuedMessage, message_type: str, error: Optional[Exception]):
+        self._dead_letters.append(DeadLetter(
+            message=message,
+            message_type=message_type,
+            error=str(error) if error else "unknown error",
+            failed_at=datetime.now()
+        ))
+        self.messages_dead_lettered += 1
+        self._dead_lettered_by_type[message_type] = self._dead_lettered_by_type.get(message_type, 0) + 1
+    
+    def get_dead_letters(self, limit: int = 100, message_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get the most recent dead-lettered messages, newest first"""
+        entries = []
+        for dead_letter in reversed(self._dead_letters):
+            if message_type and dead_letter.message_type != message_type:
+                continue
+            entries.append(dead_letter.to_dict())
+            if len(entries) >= limit:
+                break
+        return entries
+    
+    async def replay_dead_letters(
+        self,
+        message_ids: Optional[List[str]] = None,
+        message_type: Optional[str] = None
+    ) -> int:
+        """
+        Re-enqueue dead-lettered messages with a fresh retry budget
+        
+        Messages leave the dead-letter queue only once re-enqueued. If one
+        cannot be (e.g. the queue is full), replay stops and it and the
+        rest stay dead-lettered.
+        
+        Args:
+            message_ids: Only replay these messages (default: all)
+            message_type: Only replay messages of this type
+            
+        Returns:
+            Number of messages re-enqueued
+        """
+        wanted = set(message_ids) if message_ids is not None else None
+        replay = [
+            dead_letter for dead_letter in self._dead_letters
+            if (wanted is None or dead_letter.message.id in wanted) and (
+                message_type is None or dead_letter.message_type == message_type
+            )
+        ]
+        
+        replayed = set()
+        for dead_letter in replay:
+            message = dead_letter.message
+            try:
+                await self.enqueue(message.content, message.priority, message_id=message.id)
+            except Exception as e:
+                self.logger.warning(
+                    f"Dead-letter replay in queue '{self.name}' stopped after "
+                    f"{len(replayed)} of {len(replay)} messages: {e}"
+                )
+                break
+            replayed.add(id(dead_letter))
+        
+        if replayed:
+            # Rebuilt after the awaits, keeping anything dead-lettered meanwhile
+            self._dead_letters = deque(
+                (dead_letter for dead_letter in self._dead_letters if id(dead_letter) not in replayed),
+                maxlen=self._dead_letters.maxlen
+            )
+            self.logger.info(f"Replayed {len(replayed)} dead-lettered messages in queue '{self.name}'")
+        return len(replayed)
+    
+    def purge_dead_letters(self) -> int:
+        """Drop every dead-lettered message"""
+        count = len(self._dead_letters)
+        self._dead_letters.clear()
+        return count
     
     async def _add_to_batch(self, message: QueuedMessage):
         """Add message to batch for processing"""
@@ -363,15 +943,16 @@ class MessageQueue:
             else:
                 # Batch processing
                 await self._handle_message_batch(batch)
+            
+            for msg in batch:
+                self._acknowledge(msg)
         
         except Exception as e:
             self.logger.error(f"Batch processing error: {e}")
             
             # Requeue failed messages
             for msg in batch:
-                if msg.retry_count < msg.max_retries:
-                    msg.retry_count += 1
-                    await self.enqueue(msg.content, msg.priority, message_id=msg.id)
+                await self._retry_or_fail(msg, e)
     
     async def _handle_message(self, message: QueuedMessage):
         """Handle a single message"""
@@ -430,20 +1011,58 @@ class MessageQueue:
     
     def get_stats(self) -> Dict[str, Any]:
         """Get queue statistics"""
-        return {
+        stats = {
             "name": self.name,
             "queue_depth": self.stats.queue_depth,
             "messages_queued": self.stats.messages_queued,
             "messages_processed": self.stats.messages_processed,
             "messages_failed": self.stats.messages_failed,
             "messages_expired": self.stats.messages_expired,
+            "expiry": {
+                "cleanup_runs": self.stats.expiry_cleanup_runs,
+                "total_cleanup_time_ms": round(self.stats.expiry_cleanup_time_ms, 3),
+                "avg_cleanup_time_ms": round(
+                    self.stats.expiry_cleanup_time_ms / self.stats.expiry_cleanup_runs, 3
+                ) if self.stats.expiry_cleanup_runs else 0.0,
+                "max_cleanup_time_ms": round(self.stats.max_expiry_cleanup_ms, 3),
+                "pending_deadlines": len(self._expiry_heap)
+            },
             "avg_processing_time_ms": round(self.stats.avg_processing_time_ms, 2),
+            "latency": {
+                "enqueue_wait": self.enqueue_wait_histogram.summary(),
+                "handler": self.handler_time_histogram.summary()
+            },
+            "ewma_service_time_ms": round(self.ewma_service_time_ms, 3),
+            "outstanding_work": self.outstanding_work,
+            "messages_stolen": self.messages_stolen,
+            "retries": {
+                "scheduled": self.retries_scheduled,
+                "pending": len(self._retry_heap)
+            },
+            "dead_letter": {
+                "size": len(self._dead_letters),
+                "capacity": self._dead_letters.maxlen,
+                "total": self.messages_dead_lettered,
+                "by_type": dict(self._dead_lettered_by_type)
+            },
+            "failures_by_type": dict(self._failures_by_type),
             "throughput_per_second": round(self.stats.throughput_per_second, 2),
             "processor_count": len(self._processors),
             "batch_size": self.batch_size,
             "pending_batch_size": len(self._pending_batch),
             "is_processing": self._processing
         }
+        
+        if self._batch_handlers:
+            stats["batch_handlers"] = {
+                message_type: batch_handler.get_stats()
+                for message_type, batch_handler in self._batch_handlers.items()
+            }
+        
+        if self._log:
+            stats["persistence"] = self._log.get_stats()
+        
+        return stats
 
 
 class MessageQueueManager:
@@ -456,6 +1075,8 @@ class MessageQueueManager:
         self.queues: Dict[str, MessageQueue] = {}
         self.routing_rules: Dict[str, str] = {}  # message_type -> queue_name
         self.load_balancer_queues: Dict[str, List[str]] = {}  # group -> queue_names
+        self.load_balancer_strategies: Dict[str, RoutingStrategy] = {}
+        self.work_stealing_groups: set = set()
         self.round_robin_counters: Dict[str, int] = {}
     
     async def create_queue(
@@ -464,7 +1085,9 @@ class MessageQueueManager:
         max_size: int = 10000,
         batch_size: int = 10,
         batch_timeout: float = 0.01,
-        processor_count: int = 1
+        processor_count: int = 1,
+        enable_persistence: bool = False,
+        persistence_dir: Optional[str] = None
     ) -> MessageQueue:
         """Create and start a new message queue"""
         if name in self.queues:
@@ -474,12 +1097,18 @@ class MessageQueueManager:
             name=name,
             max_size=max_size,
             batch_size=batch_size,
-            batch_timeout=batch_timeout
+            batch_timeout=batch_timeout,
+            enable_persistence=enable_persistence,
+            persistence_dir=persistence_dir
         )
         
         await queue.start(processor_count)
         self.queues[name] = queue
         
+        for group in self.work_stealing_groups:
+            if name in self.load_balancer_queues[group]:
+                self._link_steal_peers(group)
+        
         self.logger.info(f"Queue '{name}' created and started")
         return queue
     
@@ -499,19 +1128,55 @@ class MessageQueueManager:
         for group, queue_names in self.load_balancer_queues.items():
             if name in queue_names:
                 queue_names.remove(name)
+                if group in self.work_stealing_groups:
+                    self._link_steal_peers(group)
         
         self.logger.info(f"Queue '{name}' removed")
     
     def add_routing_rule(self, message_type: str, queue_name: str):
-        """Add a message routing rule"""
+        """
+        Add a message routing rule
+        
+        queue_name may name a load balancer group, in which case the
+        group's strategy picks the queue for each message.
+        """
         self.routing_rules[message_type] = queue_name
         self.logger.debug(f"Routing rule added: {message_type} -> {queue_name}")
     
-    def add_load_balancer_group(self, group_name: str, queue_names: List[str]):
-        """Add a load balancer group"""
+    def add_load_balancer_group(
+        self,
+        group_name: str,
+        queue_names: List[str],
+        strategy: Union[RoutingStrategy, str] = RoutingStrategy.ROUND_ROBIN,
+        work_stealing: bool = False
+    ):
+        """
+        Add a load balancer group
+        
+        Args:
+            group_name: Group name, usable as a routing rule target
+            queue_names: Queues in the group (expected to share handlers)
+            strategy: How route_message picks a queue in the group
+            work_stealing: Let idle workers take backlog from sibling queues
+        """
         self.load_balancer_queues[group_name] = queue_names
+        self.load_balancer_strategies[group_name] = RoutingStrategy(strategy)
         self.round_robin_counters[group_name] = 0
-        self.logger.debug(f"Load balancer group '{group_name}' added with queues: {queue_names}")
+        
+        if work_stealing:
+            self.work_stealing_groups.add(group_name)
+            self._link_steal_peers(group_name)
+        
+        self.logger.debug(
+            f"Load balancer group '{group_name}' added with queues: {queue_names} "
+            f"(strategy: {RoutingStrategy(strategy).value}, work_stealing: {work_stealing})"
+        )
+    
+    def _link_steal_peers(self, group_name: str):
+        """Point each queue in a work-stealing group at its siblings"""
+        queues = [self.queues[name] for name in self.load_balancer_queues[group_name] if name in self.queues]
+        for queue in queues:
+            queue.set_steal_peers(queues)
     
     async def route_message(
         self,
@@ -545,6 +1210,8 @@ class MessageQueueManager:
             # Use routing rules
             message_type = message.get("type", "default")
             queue_name = self.routing_rules.get(message_type, "default")
+            if queue_name not in self.queues and queue_name in self.load_balancer_queues:
+                queue_name = self._get_load_balanced_queue(queue_name)
         
         # Get queue
         if queue_name not in self.queues:
@@ -556,7 +1223,7 @@ class MessageQueueManager:
         return await queue.enqueue(message, priority, ttl_seconds)
     
     def _get_load_balanced_queue(self, group_name: str) -> str:
-        """Get next queue from load balancer group using round-robin"""
+        """Get next queue from load balancer group using the group's strategy"""
         if group_name not in self.load_balancer_queues:
             raise ValueError(f"Load balancer group '{group_name}' not found")
         
@@ -564,12 +1231,33 @@ class MessageQueueManager:
         if not queue_names:
             raise ValueError(f"Load balancer group '{group_name}' has no queues")
         
-        # Round-robin selection
+        # Rotating start point: round-robin, and tie-breaking for the others
         counter = self.round_robin_counters[group_name]
-        queue_name = queue_names[counter % len(queue_names)]
         self.round_robin_counters[group_name] = counter + 1
+        start = counter % len(queue_names)
+        
+        strategy = self.load_balancer_strategies.get(group_name, RoutingStrategy.ROUND_ROBIN)
+        if strategy == RoutingStrategy.ROUND_ROBIN:
+            return queue_names[start]
+        
+        best_name = None
+        best_cost = None
+        for i in range(len(queue_names)):
+            name = queue_names[(start + i) % len(queue_names)]
+            queue = self.queues.get(name)
+            if queue is None:
+                continue
+            
+            if strategy == RoutingStrategy.LEAST_DEPTH:
+                cost = queue.outstanding_work
+            else:
+                # Queues without samples yet cost their depth so they get probed
+                cost = queue.expected_wait_ms() if queue.ewma_service_time_ms else queue.outstanding_work * 1e-3
+            
+            if best_cost is None or cost < best_cost:
+                best_name, best_cost = name, cost
         
-        return queue_name
+        return best_name or queue_names[start]
     
     def get_queue(self, name: str) -> Optional[MessageQueue]:
         """Get a queue by name"""
@@ -579,8 +1267,23 @@ class MessageQueueManager:
         """Get statistics for all queues"""
         return {
             "queues": {name: queue.get_stats() for name, queue in self.queues.items()},
+            "latency": {
+                "enqueue_wait": LatencyHistogram.merged(
+                    queue.enqueue_wait_histogram for queue in self.queues.values()
+                ).summary(),
+                "handler": LatencyHistogram.merged(
+                    queue.handler_time_histogram for queue in self.queues.values()
+                ).summary()
+            },
             "routing_rules": self.routing_rules,
             "load_balancer_groups": self.load_balancer_queues,
+            "load_balancer_strategies": {
+                group: {
+                    "strategy": strategy.value,
+                    "work_stealing": group in self.work_stealing_groups
+                }
+                for group, strategy in self.load_balancer_strategies.items()
+            },
             "total_queues": len(self.queues)
         }
     
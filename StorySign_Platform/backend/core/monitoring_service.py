@@ -403,13 +403,13 @@ class DatabaseMonitoringService(BaseService):
             
             # Store in cache if available
             if self.cache_service and self.cache_service.is_connected():
-                for metric in metrics:
-                    cache_key = f"metric:{metric.name}:{int(metric.timestamp.timestamp())}"
-                    await self.cache_service.set(
-                        cache_key,
-                        asdict(metric),
-                        ttl=self.metric_retention_hours * 3600
-                    )
+                await self.cache_service.set_many(
+                    {
+                        f"metric:{metric.name}:{int(metric.timestamp.timestamp())}": asdict(metric)
+                        for metric in metrics
+                    },
+                    ttl=self.metric_retention_hours * 3600
+                )
             
         except Exception as e:
             self.logger.error(f"Failed to store metrics: {e}")
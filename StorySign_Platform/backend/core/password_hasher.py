@@ -0,0 +1,153 @@
+"""
+Password hashing for StorySign platform
+Runs bcrypt on a dedicated, bounded thread pool so logins never block the event loop
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import bcrypt
+
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHashingBusyError(Exception):
+    """Raised when the hashing queue is full; callers should answer 503"""
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and verification off the event loop
+
+    At most max_pending operations are queued or running at once. Work past
+    that limit is rejected immediately instead of piling up behind a login
+    burst, which would otherwise delay every request that needs a hash.
+    bcrypt releases the GIL, so max_workers hashes run in parallel.
+    """
+
+    def __init__(self, rounds: int = 12, max_workers: int = 4, max_pending: int = 64):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        self.hashes = 0
+        self.verifications = 0
+        self.rejections = 0
+        self.rehashes = 0
+
+    async def hash(self, password: str, rounds: Optional[int] = None) -> str:
+        """
+        Hash a password
+
+        Raises:
+            PasswordHashingBusyError: If the hashing queue is full
+        """
+        self.hashes += 1
+        return await self._submit(_hash, password, rounds or self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """
+        Verify a password against its hash
+
+        Raises:
+            PasswordHashingBusyError: If the hashing queue is full
+        """
+        self.verifications += 1
+        return await self._submit(_verify, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str, rounds: Optional[int] = None) -> bool:
+        """Check whether a hash was made with a different work factor than configured"""
+        cost = hash_rounds(hashed_password)
+        return cost is not None and cost != (rounds or self.rounds)
+
+    async def _submit(self, func: Callable[..., Any], *args: Any) -> Any:
+        if not self._slots.acquire(blocking=False):
+            self.rejections += 1
+            raise PasswordHashingBusyError("Password hashing queue is full")
+
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._release()
+            raise
+
+        # Release the slot when the thread finishes, not when the caller stops
+        # waiting, so cancelled requests still count until their hash is done
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future: Optional[Future] = None) -> None:
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "rounds": self.rounds,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "hashes": self.hashes,
+            "verifications": self.verifications,
+            "rejections": self.rejections,
+            "rehashes": self.rehashes
+        }
+
+
+def _hash(password: str, rounds: int) -> str:
+    salt = bcrypt.gensalt(rounds=rounds)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    except Exception as e:
+        logger.error(f"Password verification error: {e}")
+        return False
+
+
+def hash_rounds(hashed_password: str) -> Optional[int]:
+    """Get the work factor of a bcrypt hash ("$2b$12$..." -> 12), or None if not bcrypt"""
+    parts = hashed_password.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+# Global password hasher instance
+_password_hasher: Optional[PasswordHasher] = None
+
+
+def get_password_hasher(config: Optional[Dict[str, Any]] = None) -> PasswordHasher:
+    """
+    Get or create the global password hasher
+
+    The pool is shared by every AuthService instance; config only applies
+    when the hasher is first created.
+    """
+    global _password_hasher
+
+    if _password_hasher is None:
+        config = config or {}
+        _password_hasher = PasswordHasher(
+            rounds=config.get("bcrypt_rounds", 12),
+            max_workers=config.get("password_hash_workers", 4),
+            max_pending=config.get("password_hash_queue_limit", 64)
+        )
+
+    return _password_hasher
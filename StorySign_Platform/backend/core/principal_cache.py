@@ -0,0 +1,162 @@
+"""
+Authenticated user cache for StorySign platform
+Lets the auth middleware skip the user lookup on most authenticated requests
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from .cache_service import get_cache_service
+from .local_cache import LRUCache
+
+
+logger = logging.getLogger(__name__)
+
+TOKEN_VERSION_PREFIX = "token_version:"
+PRINCIPAL_TOPIC = "principal_invalidations"
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """Identity of an authenticated user, detached from any database session"""
+    id: str
+    email: str
+    role: Any
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: Any) -> "UserPrincipal":
+        return cls(id=str(user.id), email=user.email, role=user.role, is_active=user.is_active)
+
+
+class UserPrincipalCache:
+    """
+    Short-lived, bounded cache of authenticated user principals
+
+    Entries are immutable UserPrincipal values keyed by user ID, so
+    concurrent requests can share them, and each remembers the token
+    version ("tv" claim) it was loaded for. A token carrying a newer
+    version reloads the user. Role, password and activation changes bump
+    the user's version in the cache service, so tokens issued afterwards
+    never see the old principal, and publish an invalidation that makes
+    every worker drop its entry. The TTL bounds staleness for tokens
+    issued before a change if that message is lost.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self._entries = LRUCache(max_bytes=max_entries, max_entries=max_entries)
+        self._cache_service = None
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def _get_cache(self):
+        if self._cache_service is None:
+            cache_service = await get_cache_service()
+            if self._cache_service is None:
+                self._cache_service = cache_service
+                cache_service.subscribe(PRINCIPAL_TOPIC, self._on_event)
+        return self._cache_service
+
+    def _on_event(self, data: Optional[Dict[str, Any]]) -> None:
+        if data is None:
+            # Invalidations may have been missed
+            self.clear()
+        else:
+            self.invalidate(data["user"])
+
+    async def subscribe(self) -> None:
+        """Receive other workers' invalidations; call before loading the first principal"""
+        await self._get_cache()
+
+    @property
+    def generation(self) -> int:
+        """Changes on every invalidation; pass it back to put() to detect races"""
+        return self._entries.generation
+
+    def get(self, user_id: str, token_version: int = 0) -> Optional[UserPrincipal]:
+        """Get the cached principal for a token, or None"""
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < token_version:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, principal: UserPrincipal, token_version: int = 0, generation: Optional[int] = None) -> None:
+        """
+        Cache a principal loaded from the database for a token
+
+        generation is the value of self.generation read before loading; the
+        entry is dropped if an invalidation happened while loading.
+        """
+        if generation is not None and generation != self._entries.generation:
+            return
+        self._entries.set(principal.id, (token_version, principal), ttl=self.ttl, size=1)
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop a user from this worker's cache"""
+        self._entries.pop(user_id)
+        self.invalidations += 1
+
+    async def token_version(self, user_id: str) -> int:
+        """Current token version of a user, for the "tv" claim of new tokens"""
+        cache_service = await self._get_cache()
+        return int(await cache_service.get(f"{TOKEN_VERSION_PREFIX}{user_id}", 0))
+
+    async def bump_version(self, user_id: str) -> None:
+        """Drop a user in every worker and make new tokens reload it after a role, password or activation change"""
+        self.invalidate(user_id)
+        cache_service = await self._get_cache()
+        version = await cache_service.increment(f"{TOKEN_VERSION_PREFIX}{user_id}")
+        await cache_service.publish(PRINCIPAL_TOPIC, {"user": user_id, "tv": version})
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self._entries.evictions
+        }
+
+
+# Global principal cache instance
+_principal_cache: Optional[UserPrincipalCache] = None
+
+
+def get_principal_cache() -> UserPrincipalCache:
+    """Get or create the global user principal cache"""
+    global _principal_cache
+
+    if _principal_cache is None:
+        _principal_cache = UserPrincipalCache()
+
+    return _principal_cache
+
+
+async def get_token_version(user_id: str) -> int:
+    """Token version to issue in a user's access tokens; 0 if the cache service is unreachable"""
+    try:
+        return await get_principal_cache().token_version(user_id)
+    except Exception as e:
+        logger.error(f"Token version lookup failed for user {user_id}: {e}")
+        return 0
+
+
+async def invalidate_user_principal(user_id: str) -> None:
+    """Drop a user's cached principal in every worker; call after changing role, password or is_active"""
+    try:
+        await get_principal_cache().bump_version(user_id)
+    except Exception as e:
+        # This worker already dropped it; others catch up when their TTL runs out
+        logger.error(f"Principal invalidation failed for user {user_id}: {e}")
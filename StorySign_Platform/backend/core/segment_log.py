@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Segment Log
+Append-only, group-committed segment log backing durable message queues
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+# Record frame: payload length, CRC32 of offset + payload, offset
+_HEADER = struct.Struct(">IIQ")
+_OFFSET = struct.Struct(">Q")
+
+SEGMENT_SUFFIX = ".log"
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+@dataclass
+class LogSegment:
+    """One segment file; records are addressed by a global offset"""
+    base_offset: int
+    path: Path
+    size: int = 0
+    records: int = 0
+
+
+class SegmentLog:
+    """
+    Durable append-only log of enqueue and ack records
+
+    Appends are buffered and written by a single flusher task that fsyncs
+    once per batch (group commit), so many enqueues share one fsync. Every
+    append returns a future that resolves once its record is durable.
+
+    Acked messages are reclaimed when segments roll: sealed segments with
+    nothing live are deleted, and mostly-dead sealed segments are rewritten
+    into one segment holding only live records. A checkpoint records the
+    lowest live offset so replay can skip fully acked segments.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        segment_bytes: int = 4 * 1024 * 1024,
+        commit_interval: float = 0.002,  # 2ms linger to grow each group commit
+        checkpoint_interval: float = 1.0,
+        compaction_threshold: float = 0.5
+    ):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.commit_interval = commit_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.compaction_threshold = compaction_threshold
+
+        self.logger = logging.getLogger(f"{__name__}.SegmentLog.{self.directory.name}")
+
+        self._segments: List[LogSegment] = []
+        self._active_file = None
+        self._next_offset = 0
+
+        # message_id -> offset of its latest enqueue record, oldest first
+        self._live: Dict[str, int] = {}
+
+        # Group commit
+        self._buffer: List[bytes] = []
+        self._buffer_records = 0
+        self._commit_future: Optional[asyncio.Future] = None
+        self._pending = asyncio.Event()
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._compaction_task: Optional[asyncio.Task] = None
+        self._last_checkpoint = 0.0
+        self._checkpointed_low_water = -1
+        self._closed = True
+
+        # Statistics
+        self.commits = 0
+        self.records_written = 0
+        self.bytes_written = 0
+        self.fsync_time_ms = 0.0
+        self.compactions = 0
+        self.segments_deleted = 0
+        self.replayed_records = 0
+        self.truncated_bytes = 0
+
+    async def open(self) -> List[Dict[str, Any]]:
+        """
+        Recover the log and start the flusher
+
+        Returns:
+            Payloads of enqueued records that were never acked, oldest first
+        """
+        loop = asyncio.get_running_loop()
+        pending = await loop.run_in_executor(None, self._recover)
+
+        self._commit_future = loop.create_future()
+        self._closed = False
+        self._flusher_task = asyncio.create_task(self._flush_loop())
+
+        self.replayed_records = len(pending)
+        self.logger.info(
+            f"Segment log opened at {self.directory} "
+            f"({len(self._segments)} segments, {len(pending)} unacked records)"
+        )
+        return pending
+
+    async def close(self) -> None:
+        """Flush buffered records, write a final checkpoint and close"""
+        if self._closed:
+            return
+        self._closed = True
+
+        # Let an in-flight write finish rather than cancel it mid-fsync
+        if self._flusher_task:
+            self._pending.set()
+            await asyncio.gather(self._flusher_task, return_exceptions=True)
+            self._flusher_task = None
+
+        if self._compaction_task:
+            await asyncio.gather(self._compaction_task, return_exceptions=True)
+            self._compaction_task = None
+
+        await self._flush()
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._write_checkpoint, self.low_water_offset(), self._next_offset
+        )
+
+        if self._active_file:
+            self._active_file.close()
+            self._active_file = None
+
+    def append(self, message_id: str, payload: Dict[str, Any]) -> asyncio.Future:
+        """
+        Buffer an enqueue record
+
+        A later append with the same message_id supersedes this one.
+
+        Returns:
+            Future resolved once the record is durable on disk
+        """
+        if self._closed:
+            raise RuntimeError(f"Segment log at {self.directory} is closed")
+
+        offset = self._write_record({"op": "enq", "id": message_id, "msg": payload})
+        self._live.pop(message_id, None)
+        self._live[message_id] = offset
+        return self._commit_future
+
+    def ack(self, message_id: str) -> None:
+        """Buffer an ack record; acked messages are not replayed"""
+        if self._closed or self._live.pop(message_id, None) is None:
+            return
+        self._write_record({"op": "ack", "id": message_id})
+
+    def _write_record(self, record: Dict[str, Any]) -> int:
+        offset = self._next_offset
+        self._next_offset += 1
+
+        payload = json.dumps(record, separators=(",", ":"), default=str).encode("utf-8")
+        crc = zlib.crc32(payload, zlib.crc32(_OFFSET.pack(offset)))
+        self._buffer.append(_HEADER.pack(len(payload), crc, offset))
+        self._buffer.append(payload)
+        self._buffer_records += 1
+        self._pending.set()
+        return offset
+
+    async def _flush_loop(self) -> None:
+        """Write and fsync buffered records, one group commit per pass"""
+        while not self._closed:
+            try:
+                await self._pending.wait()
+                if self._closed:
+                    break
+
+                # Linger briefly so concurrent enqueues share the fsync
+                await asyncio.sleep(self.commit_interval)
+                await self._flush()
+
+                if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+                    await self._checkpoint()
+
+            except Exception as e:
+                self.logger.error(f"Segment log flush error: {e}")
+                await asyncio.sleep(0.1)
+
+    async def _flush(self) -> None:
+        self._pending.clear()
+        if not self._buffer:
+            return
+
+        data = b"".join(self._buffer)
+        records = self._buffer_records
+        future = self._commit_future
+        self._buffer = []
+        self._buffer_records = 0
+        self._commit_future = asyncio.get_running_loop().create_future()
+
+        try:
+            fsync_ms = await asyncio.get_running_loop().run_in_executor(
+                None, self._write_sync, data, records
+            )
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            # Nobody may be awaiting the ack-only batches
+            future.exception()
+            raise
+
+        self.commits += 1
+        self.records_written += records
+        self.bytes_written += len(data)
+        self.fsync_time_ms += fsync_ms
+        if not future.done():
+            future.set_result(None)
+
+        if self._segments[-1].size >= self.segment_bytes:
+            # Records buffered during the write go to the new segment, so it
+            # starts at the first of them rather than at the next offset
+            base_offset = self._next_offset - self._buffer_records
+            await asyncio.get_running_loop().run_in_executor(None, self._roll_sync, base_offset)
+            self._maybe_compact()
+
+    def _write_sync(self, data: bytes, records: int) -> float:
+        segment = self._segments[-1]
+        self._active_file.write(data)
+        self._active_file.flush()
+
+        start_time = time.perf_counter()
+        os.fsync(self._active_file.fileno())
+        segment.size += len(data)
+        segment.records += records
+        return (time.perf_counter() - start_time) * 1000
+
+    def _roll_sync(self, base_offset: int) -> None:
+        """Seal the active segment and start a new one"""
+        self._active_file.close()
+        self._open_segment(base_offset)
+        self._fsync_directory()
+
+    def _open_segment(self, base_offset: int) -> None:
+        path = self.directory / f"{base_offset:020d}{SEGMENT_SUFFIX}"
+        self._active_file = open(path, "ab")
+        self._segments.append(LogSegment(base_offset, path, size=self._active_file.tell()))
+
+    # Compaction
+
+    def _maybe_compact(self) -> None:
+        """Reclaim sealed segments once most of their records are dead"""
+        sealed = self._segments[:-1]
+        if not sealed or (self._compaction_task and not self._compaction_task.done()):
+            return
+
+        active_base = self._segments[-1].base_offset
+        live = {
+            message_id: offset
+            for message_id, offset in self._live.items()
+            if offset < active_base
+        }
+        total_records = sum(segment.records for segment in sealed)
+        if live and len(live) > total_records * self.compaction_threshold:
+            return
+
+        self._compaction_task = asyncio.create_task(self._compact(sealed, live))
+
+    async def _compact(self, sealed: List[LogSegment], live: Dict[str, int]) -> None:
+        try:
+            replacement = await asyncio.get_running_loop().run_in_executor(
+                None, self._compact_sync, sealed, live
+            )
+        except Exception as e:
+            self.logger.error(f"Segment log compaction error: {e}")
+            return
+
+        # Segments rolled during compaction stay after the replacement
+        remaining = self._segments[len(sealed):]
+        self._segments = ([replacement] if replacement else []) + remaining
+        self.compactions += 1
+        self.segments_deleted += len(sealed) - (1 if replacement else 0)
+        self.logger.debug(
+            f"Compacted {len(sealed)} segments at {self.directory} ({len(live)} live records kept)"
+        )
+
+    def _compact_sync(self, sealed: List[LogSegment], live: Dict[str, int]) -> Optional[LogSegment]:
+        """
+        Rewrite sealed segments keeping only live enqueue records
+
+        The rewrite replaces the first sealed segment atomically before the
+        others are removed; a crash in between only leaves duplicate
+        enqueue records, which replay collapses by message ID.
+        """
+        replacement = None
+        if live:
+            target = sealed[0]
+            tmp_path = target.path.with_suffix(".compact")
+            size = records = 0
+            with open(tmp_path, "wb") as out:
+                for segment in sealed:
+                    for offset, record, frame in self._read_frames(segment.path):
+                        if record.get("op") == "enq" and live.get(record.get("id")) == offset:
+                            out.write(frame)
+                            size += len(frame)
+                            records += 1
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_path, target.path)
+            replacement = LogSegment(target.base_offset, target.path, size=size, records=records)
+            sealed = sealed[1:]
+
+        for segment in sealed:
+            segment.path.unlink(missing_ok=True)
+        self._fsync_directory()
+        return replacement
+
+    # Checkpoint and recovery
+
+    def low_water_offset(self) -> int:
+        """Lowest offset that replay still needs"""
+        for offset in self._live.values():
+            return offset
+        return self._next_offset
+
+    async def _checkpoint(self) -> None:
+        self._last_checkpoint = time.monotonic()
+        low_water = self.low_water_offset()
+        if low_water != self._checkpointed_low_water:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write_checkpoint, low_water, self._next_offset
+            )
+
+    def _write_checkpoint(self, low_water: int, next_offset: int) -> None:
+        tmp_path = self.directory / (CHECKPOINT_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"low_water_offset": low_water, "next_offset": next_offset}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.directory / CHECKPOINT_FILE)
+        self._checkpointed_low_water = low_water
+
+    def _read_checkpoint(self) -> Tuple[int, int]:
+        try:
+            with open(self.directory / CHECKPOINT_FILE) as f:
+                checkpoint = json.load(f)
+            return int(checkpoint["low_water_offset"]), int(checkpoint["next_offset"])
+        except FileNotFoundError:
+            return 0, 0
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable checkpoint in {self.directory}: {e}")
+            return 0, 0
+
+    def _recover(self) -> List[Dict[str, Any]]:
+        """Scan segments from the checkpoint, truncating any torn tail"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for leftover in self.directory.glob("*.compact"):
+            leftover.unlink()
+
+        low_water, next_offset = self._read_checkpoint()
+        paths = sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+        pending: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+
+        for index, path in enumerate(paths):
+            base_offset = int(path.stem)
+            next_base = int(paths[index + 1].stem) if index + 1 < len(paths) else None
+
+            # Everything below the checkpoint was acked
+            if next_base is not None and next_base <= low_water:
+                path.unlink()
+                self.segments_deleted += 1
+                continue
+
+            segment = LogSegment(base_offset, path)
+            for offset, record, frame in self._read_frames(path, truncate=True):
+                segment.size += len(frame)
+                segment.records += 1
+                next_offset = max(next_offset, offset + 1)
+                if offset < low_water:
+                    continue
+
+                message_id = record.get("id")
+                if record.get("op") == "enq":
+                    pending.pop(message_id, None)
+                    pending[message_id] = (offset, record.get("msg"))
+                else:
+                    pending.pop(message_id, None)
+
+            self._segments.append(segment)
+
+        self._next_offset = next_offset
+        self._live = {message_id: offset for message_id, (offset, _) in pending.items()}
+
+        if self._segments:
+            self._active_file = open(self._segments[-1].path, "ab")
+        else:
+            self._open_segment(self._next_offset)
+        self._fsync_directory()
+
+        return [payload for _, payload in pending.values()]
+
+    def _read_frames(self, path: Path, truncate: bool = False):
+        """Yield (offset, record, raw frame) for each valid record in a segment"""
+        with open(path, "rb") as f:
+            data = f.read()
+
+        position = 0
+        while position + _HEADER.size <= len(data):
+            length, crc, offset = _HEADER.unpack_from(data, position)
+            end = position + _HEADER.size + length
+            payload = data[position + _HEADER.size:end]
+            if end > len(data) or zlib.crc32(payload, zlib.crc32(_OFFSET.pack(offset))) != crc:
+                break
+
+            yield offset, json.loads(payload), data[position:end]
+            position = end
+
+        if truncate and position < len(data):
+            self.logger.warning(
+                f"Truncating {len(data) - position} bytes of torn records from {path.name}"
+            )
+            self.truncated_bytes += len(data) - position
+            with open(path, "r+b") as f:
+                f.truncate(position)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _fsync_directory(self) -> None:
+        """Persist file creations, renames and deletions"""
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get segment log statistics"""
+        return {
+            "directory": str(self.directory),
+            "segments": len(self._segments),
+            "log_bytes": sum(segment.size for segment in self._segments),
+            "next_offset": self._next_offset,
+            "low_water_offset": self.low_water_offset(),
+            "live_records": len(self._live),
+            "buffered_records": self._buffer_records,
+            "commits": self.commits,
+            "records_written": self.records_written,
+            "avg_records_per_commit": round(self.records_written / self.commits, 2) if self.commits else 0.0,
+            "avg_fsync_ms": round(self.fsync_time_ms / self.commits, 3) if self.commits else 0.0,
+            "compactions": self.compactions,
+            "segments_deleted": self.segments_deleted,
+            "replayed_records": self.replayed_records,
+            "truncated_bytes": self.truncated_bytes
+        }
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Session Backplane
+Cross-process pub/sub fan-out for collaborative session events
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+try:
+    import redis.asyncio as redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+
+BackplaneHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class SessionBackplane(ABC):
+    """
+    Abstract pub/sub transport shared by all workers
+
+    Every published message is tagged with the publishing worker's ID and
+    delivered to subscribers on every *other* worker; local delivery is the
+    caller's responsibility. Each channel's messages are handled in order
+    by a dispatcher task of their own, so a slow handler never holds up
+    reading the transport or other channels.
+
+    The backplane also holds counters and epochs shared by all workers, so
+    every copy of a session's state numbers its versions the same way.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None, max_pending: int = 10000):
+        self.worker_id = worker_id or str(uuid.uuid4())
+        self.logger = logging.getLogger(f"{__name__}.{type(self).__name__}")
+        self._handlers: Dict[str, BackplaneHandler] = {}
+        self.max_pending = max_pending  # Received messages queued per channel
+        self._pending: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._dispatchers: Dict[str, asyncio.Task] = {}
+        self.messages_published = 0
+        self.messages_received = 0
+        self.messages_dropped = 0
+
+    @abstractmethod
+    async def start(self) -> None:
+        """Connect the transport"""
+        pass
+
+    @abstractmethod
+    async def stop(self) -> None:
+        """Disconnect the transport and drop all subscriptions"""
+        pass
+
+    @abstractmethod
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        """Publish a message to every other worker subscribed to channel"""
+        pass
+
+    @abstractmethod
+    async def subscribe(self, channel: str, handler: BackplaneHandler) -> None:
+        """Register the handler for messages published on channel"""
+        pass
+
+    @abstractmethod
+    async def unsubscribe(self, channel: str) -> None:
+        """Stop receiving messages published on channel"""
+        pass
+
+    @abstractmethod
+    async def next_version(self, key: str) -> int:
+        """Allocate the next value of a counter shared by all workers"""
+        pass
+
+    @abstractmethod
+    async def shared_epoch(self, key: str) -> Tuple[str, bool]:
+        """
+        Get the epoch all workers use for key, creating it if there is none
+
+        Returns:
+            Tuple of (epoch, whether this call created it)
+        """
+        pass
+
+    def _envelope(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        return {"origin": self.worker_id, "message": message}
+
+    def _queue_dispatch(self, channel: str, envelope: Dict[str, Any]) -> None:
+        """Queue a received envelope for its channel's dispatcher without waiting on the handler"""
+        if envelope.get("origin") == self.worker_id or channel not in self._handlers:
+            return
+
+        pending = self._pending.setdefault(channel, deque())
+        if len(pending) >= self.max_pending:
+            self.messages_dropped += 1
+            self.logger.warning(f"Backplane handler for {channel} is behind; dropped a message")
+            return
+
+        pending.append(envelope)
+        if channel not in self._dispatchers:
+            self._dispatchers[channel] = asyncio.create_task(self._drain(channel))
+
+    async def _drain(self, channel: str) -> None:
+        """Hand a channel's queued envelopes to its handler, in order"""
+        pending = self._pending[channel]
+        try:
+            while pending:
+                await self._dispatch(channel, pending.popleft())
+        finally:
+            self._dispatchers.pop(channel, None)
+            if not pending:
+                self._pending.pop(channel, None)
+
+    def _stop_dispatchers(self) -> None:
+        for task in self._dispatchers.values():
+            task.cancel()
+        self._dispatchers.clear()
+        self._pending.clear()
+
+    async def _dispatch(self, channel: str, envelope: Dict[str, Any]) -> None:
+        """Deliver a received envelope to the channel handler"""
+        if envelope.get("origin") == self.worker_id:
+            return
+
+        handler = self._handlers.get(channel)
+        if handler is None:
+            return
+
+        self.messages_received += 1
+        try:
+            await handler(channel, envelope["message"])
+        except Exception as e:
+            self.logger.error(f"Backplane handler error on {channel}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get backplane statistics"""
+        return {
+            "backend": type(self).__name__,
+            "worker_id": self.worker_id,
+            "subscribed_channels": len(self._handlers),
+            "messages_published": self.messages_published,
+            "messages_received": self.messages_received,
+            "messages_dropped": self.messages_dropped,
+            "pending_messages": sum(len(pending) for pending in self._pending.values())
+        }
+
+
+class InProcessBus:
+    """Shared channel registry, counters and epochs connecting in-process backplanes"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set["InProcessBackplane"]] = defaultdict(set)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.epochs: Dict[str, str] = {}
+
+
+class InProcessBackplane(SessionBackplane):
+    """
+    In-process backplane
+
+    Backplanes sharing one InProcessBus behave like separate workers, which
+    makes this a local stand-in for the Redis backend.
+    """
+
+    def __init__(
+        self,
+        bus: Optional[InProcessBus] = None,
+        worker_id: Optional[str] = None,
+        max_pending: int = 10000
+    ):
+        super().__init__(worker_id, max_pending)
+        self.bus = bus or InProcessBus()
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        for channel in list(self._handlers.keys()):
+            await self.unsubscribe(channel)
+        self._stop_dispatchers()
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        # Round-trip through JSON to match what a network transport delivers
+        envelope_text = json.dumps(self._envelope(message))
+        self.messages_published += 1
+
+        for backplane in list(self.bus.subscribers.get(channel, ())):
+            if backplane is not self:
+                backplane._queue_dispatch(channel, json.loads(envelope_text))
+
+    async def subscribe(self, channel: str, handler: BackplaneHandler) -> None:
+        self._handlers[channel] = handler
+        self.bus.subscribers[channel].add(self)
+
+    async def unsubscribe(self, channel: str) -> None:
+        self._handlers.pop(channel, None)
+        subscribers = self.bus.subscribers.get(channel)
+        if subscribers is not None:
+            subscribers.discard(self)
+            if not subscribers:
+                del self.bus.subscribers[channel]
+
+    async def next_version(self, key: str) -> int:
+        self.bus.counters[key] += 1
+        return self.bus.counters[key]
+
+    async def shared_epoch(self, key: str) -> Tuple[str, bool]:
+        if key in self.bus.epochs:
+            return self.bus.epochs[key], False
+        self.bus.epochs[key] = uuid.uuid4().hex
+        return self.bus.epochs[key], True
+
+
+class RedisBackplane(SessionBackplane):
+    """
+    Redis pub/sub backplane for multi-worker deployments
+
+    Shared counters and epochs are Redis keys that expire after key_ttl
+    seconds without a new version, so ended sessions leave nothing behind.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        channel_prefix: str = "storysign:backplane:",
+        worker_id: Optional[str] = None,
+        key_ttl: int = 7 * 24 * 3600,
+        max_pending: int = 10000
+    ):
+        super().__init__(worker_id, max_pending)
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.channel_prefix = channel_prefix
+        self.key_ttl = key_ttl
+
+        self._redis_client = None
+        self._pubsub = None
+        self._reader_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("Redis backplane requires: pip install redis[hiredis]")
+
+        self._redis_client = redis.Redis(
+            host=self.host,
+            port=self.port,
+            db=self.db,
+            password=self.password,
+            decode_responses=True
+        )
+        await self._redis_client.ping()
+
+        self._pubsub = self._redis_client.pubsub(ignore_subscribe_messages=True)
+        self._reader_task = asyncio.create_task(self._reader_loop())
+        self.logger.info(f"Redis backplane connected at {self.host}:{self.port} (worker {self.worker_id})")
+
+    async def stop(self) -> None:
+        if self._reader_task:
+            self._reader_task.cancel()
+            self._reader_task = None
+        self._stop_dispatchers()
+
+        if self._pubsub:
+            await self._pubsub.close()
+            self._pubsub = None
+
+        if self._redis_client:
+            await self._redis_client.close()
+            self._redis_client = None
+
+        self._handlers.clear()
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        if not self._redis_client:
+            return
+
+        await self._redis_client.publish(
+            self.channel_prefix + channel,
+            json.dumps(self._envelope(message))
+        )
+        self.messages_published += 1
+
+    async def subscribe(self, channel: str, handler: BackplaneHandler) -> None:
+        self._handlers[channel] = handler
+        if self._pubsub:
+            await self._pubsub.subscribe(self.channel_prefix + channel)
+
+    async def unsubscribe(self, channel: str) -> None:
+        self._handlers.pop(channel, None)
+        if self._pubsub:
+            await self._pubsub.unsubscribe(self.channel_prefix + channel)
+
+    async def next_version(self, key: str) -> int:
+        counter_key = f"{self.channel_prefix}version:{key}"
+        epoch_key = f"{self.channel_prefix}epoch:{key}"
+        async with self._redis_client.pipeline(transaction=True) as pipe:
+            pipe.incr(counter_key)
+            pipe.expire(counter_key, self.key_ttl)
+            pipe.expire(epoch_key, self.key_ttl)
+            version, _, _ = await pipe.execute()
+        return int(version)
+
+    async def shared_epoch(self, key: str) -> Tuple[str, bool]:
+        epoch_key = f"{self.channel_prefix}epoch:{key}"
+        while True:
+            epoch = uuid.uuid4().hex
+            if await self._redis_client.set(epoch_key, epoch, nx=True, ex=self.key_ttl):
+                return epoch, True
+            existing = await self._redis_client.get(epoch_key)
+            if existing is not None:
+                return existing, False
+
+    async def _reader_loop(self) -> None:
+        """Read published messages and dispatch them to channel handlers"""
+        while True:
+            try:
+                if not self._handlers:
+                    await asyncio.sleep(0.1)
+                    continue
+
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is None or message.get("type") != "message":
+                    continue
+
+                channel = message["channel"][len(self.channel_prefix):]
+                self._queue_dispatch(channel, json.loads(message["data"]))
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self.logger.error(f"Redis backplane read error: {e}")
+                await asyncio.sleep(1.0)
+
+
+def create_session_backplane(
+    backend: str = "local",
+    config: Optional[Dict[str, Any]] = None
+) -> SessionBackplane:
+    """
+    Create a session backplane
+
+    Args:
+        backend: "local" for in-process, "redis" for Redis pub/sub
+        config: Optional Redis connection settings (host, port, db, password)
+
+    Returns:
+        SessionBackplane instance (not yet started)
+    """
+    if backend == "redis":
+        config = config or {}
+        return RedisBackplane(
+            host=config.get("host", "localhost"),
+            port=config.get("port", 6379),
+            db=config.get("db", 0),
+            password=config.get("password")
+        )
+    if backend == "local":
+        return InProcessBackplane()
+
+    raise ValueError(f"Unknown session backplane backend: {backend}")
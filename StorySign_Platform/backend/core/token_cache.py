@@ -0,0 +1,284 @@
+"""
+Verified access token cache for StorySign platform
+Skips JWT signature checks for tokens seen recently, with immediate revocation
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Any, Dict, Optional
+
+from .bloom_filter import RotatingBloomFilter
+from .cache_service import get_cache_service
+from .local_cache import LRUCache
+
+
+logger = logging.getLogger(__name__)
+
+REVOKED_TOKEN_PREFIX = "revoked_token:"
+REVOKED_USER_PREFIX = "revoked_user:"
+REVOCATION_TOPIC = "token_revocations"
+
+# Access token lifetime assumed when the issuer does not pass its own, in seconds
+DEFAULT_TOKEN_LIFETIME = 15 * 60
+
+
+def token_digest_key(secret: str, algorithm: str) -> bytes:
+    """Key for token_digest, derived from the secret and algorithm tokens are verified with"""
+    return hashlib.blake2b(f"{algorithm}:{secret}".encode("utf-8"), digest_size=32).digest()
+
+
+def token_digest(token: str, key: bytes) -> str:
+    """
+    Digest used to key tokens, so raw bearer tokens are never held in memory
+
+    Keyed with token_digest_key, so a token verified under one secret or
+    algorithm is never a cache hit for a verifier configured with another.
+    """
+    return hashlib.blake2b(token.encode("utf-8"), key=key, digest_size=16).hexdigest()
+
+
+class TokenRevocationList:
+    """
+    Revoked access tokens and per-user revocation cut-offs
+
+    The cache service holds the exact entries, shared by all workers:
+    a token ID (jti) until the token's exp, and for a revoked user the
+    time up to which its tokens were issued, kept for max_token_lifetime.
+    Each worker mirrors them in rotating Bloom filters, so a check only
+    reads the store when a filter reports a possible match. Revocations
+    made by other workers arrive over the cache service's pub/sub. The
+    filters are rebuilt from the store on startup and after missed
+    messages; until a rebuild completes, every check reads the store.
+    Checks fail closed: a token counts as revoked if the store read fails.
+    """
+
+    def __init__(
+        self,
+        max_token_lifetime: float = DEFAULT_TOKEN_LIFETIME,
+        expected_revocations: int = 100000,
+        partition_seconds: float = 60.0,
+        error_rate: float = 0.001
+    ):
+        self.max_token_lifetime = max_token_lifetime
+
+        self._tokens = RotatingBloomFilter(
+            max_token_lifetime, partition_seconds, expected_revocations, error_rate
+        )
+        # User checks probe every partition, so that filter is kept sparser
+        self._users = RotatingBloomFilter(
+            max_token_lifetime, partition_seconds, max(1000, expected_revocations // 10), error_rate / 10
+        )
+
+        self._cache_service = None
+        self._loaded = False
+        self._load_task: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "checks": 0,
+            "exact_lookups": 0,
+            "false_positives": 0,
+            "revoked": 0,
+            "lookup_errors": 0,
+            "loads": 0
+        }
+
+    async def _get_cache(self):
+        if self._cache_service is None:
+            cache_service = await get_cache_service()
+            if self._cache_service is None:
+                self._cache_service = cache_service
+                # Subscribe before loading so no revocation falls in between
+                cache_service.subscribe(REVOCATION_TOPIC, self._on_event)
+                self._schedule_load()
+        return self._cache_service
+
+    def _schedule_load(self) -> None:
+        self._loaded = False
+        if self._load_task is None or self._load_task.done():
+            self._load_task = asyncio.create_task(self._load())
+
+    async def _load(self) -> None:
+        """Add every revocation in the store to the filters"""
+        while True:
+            try:
+                async for batch in self._cache_service.scan_many(f"{REVOKED_TOKEN_PREFIX}*"):
+                    for key, expires_at in batch.items():
+                        self._tokens.add(key[len(REVOKED_TOKEN_PREFIX):], expires_at)
+                async for batch in self._cache_service.scan_many(f"{REVOKED_USER_PREFIX}*"):
+                    for key, entry in batch.items():
+                        self._users.add(key[len(REVOKED_USER_PREFIX):], entry["expires_at"])
+                self._loaded = True
+                self.stats["loads"] += 1
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Token revocation load failed, retrying: {e}")
+                await asyncio.sleep(5.0)
+
+    def _on_event(self, data: Optional[Dict[str, Any]]) -> None:
+        if data is None:
+            # Revocations may have been missed; checks read the store until reloaded
+            self._schedule_load()
+        elif "token" in data:
+            self._tokens.add(data["token"], data["expires_at"])
+        elif "user" in data:
+            self._users.add(data["user"], data["expires_at"])
+
+    async def revoke_token(self, token_id: str, expires_at: float) -> None:
+        """Revoke one token until it expires"""
+        ttl = int(math.ceil(expires_at - time.time()))
+        if ttl <= 0:
+            return
+
+        cache_service = await self._get_cache()
+        self._tokens.add(token_id, expires_at)
+        await cache_service.set(f"{REVOKED_TOKEN_PREFIX}{token_id}", expires_at, ttl=ttl)
+        await cache_service.publish(REVOCATION_TOPIC, {"token": token_id, "expires_at": expires_at})
+
+    async def revoke_user(self, user_id: str) -> None:
+        """Revoke every token issued to a user up to now"""
+        now = time.time()
+        # Sub-second, like the iat AuthService issues; whole-second iats from
+        # older tokens issued earlier in this second still count as revoked
+        entry = {"issued_before": now, "expires_at": now + self.max_token_lifetime}
+
+        cache_service = await self._get_cache()
+        self._users.add(user_id, entry["expires_at"])
+        await cache_service.set(f"{REVOKED_USER_PREFIX}{user_id}", entry, ttl=int(math.ceil(self.max_token_lifetime)))
+        await cache_service.publish(REVOCATION_TOPIC, {"user": user_id, "expires_at": entry["expires_at"]})
+
+    def extend_token_lifetime(self, max_token_lifetime: float) -> None:
+        """Keep user revocations at least max_token_lifetime seconds from now on"""
+        # Later expiries than the filters' window go to their exact overflow map
+        self.max_token_lifetime = max(self.max_token_lifetime, max_token_lifetime)
+
+    async def is_revoked(self, token_id: str, payload: Dict[str, Any]) -> bool:
+        """Check a verified token against both kinds of revocation"""
+        cache_service = await self._get_cache()
+        self.stats["checks"] += 1
+
+        try:
+            return await self._check(cache_service, token_id, payload)
+        except Exception as e:
+            # An unreadable store must not let a revoked token through
+            logger.error(f"Token revocation lookup failed, rejecting token: {e}")
+            self.stats["lookup_errors"] += 1
+            return True
+
+    async def _check(self, cache_service, token_id: str, payload: Dict[str, Any]) -> bool:
+        if not self._loaded or self._tokens.contains(token_id, payload.get("exp")):
+            self.stats["exact_lookups"] += 1
+            if await cache_service.get_or_raise(f"{REVOKED_TOKEN_PREFIX}{token_id}") is not None:
+                self.stats["revoked"] += 1
+                return True
+            if self._loaded:
+                self.stats["false_positives"] += 1
+
+        user_id = str(payload.get("sub"))
+        if not self._loaded or user_id in self._users:
+            self.stats["exact_lookups"] += 1
+            entry = await cache_service.get_or_raise(f"{REVOKED_USER_PREFIX}{user_id}")
+            if entry is not None and payload.get("iat", 0) <= entry["issued_before"]:
+                self.stats["revoked"] += 1
+                return True
+            if self._loaded and entry is None:
+                self.stats["false_positives"] += 1
+
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "loaded": self._loaded,
+            "token_filter": self._tokens.get_stats(),
+            "user_filter": self._users.get_stats()
+        }
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of verified access token payloads
+
+    Entries are keyed by token digest and expire at the token's exp, so a
+    hit is exactly as valid as re-verifying the signature. Callers still
+    check every token against the revocation list, so logout and password
+    changes take effect on the next request.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_token_lifetime: float = DEFAULT_TOKEN_LIFETIME):
+        self._entries = LRUCache(max_bytes=max_entries, max_entries=max_entries)
+        self.revocations = TokenRevocationList(max_token_lifetime)
+
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Get a verified payload, or None if unknown or expired"""
+        payload = self._entries.get(digest)
+        if payload is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return payload
+
+    def put(self, digest: str, payload: Dict[str, Any]) -> None:
+        """Cache a payload whose signature and claims were just verified"""
+        ttl = payload.get("exp", 0) - time.time()
+        if ttl > 0:
+            self._entries.set(digest, payload, ttl=ttl, size=1)
+
+    async def is_revoked(self, digest: str, payload: Dict[str, Any]) -> bool:
+        # Tokens issued before jti was added are identified by digest
+        if await self.revocations.is_revoked(payload.get("jti") or digest, payload):
+            self._entries.pop(digest)
+            self.rejected += 1
+            return True
+        return False
+
+    async def revoke_token(self, digest: str, payload: Dict[str, Any]) -> None:
+        await self.revocations.revoke_token(payload.get("jti") or digest, payload["exp"])
+        self._entries.pop(digest)
+
+    async def revoke_user(self, user_id: str) -> None:
+        await self.revocations.revoke_user(user_id)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revoked": self.rejected,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self._entries.evictions,
+            "revocations": self.revocations.get_stats()
+        }
+
+
+# Global verified token cache instance
+_token_cache: Optional[VerifiedTokenCache] = None
+
+
+def get_token_cache(max_token_lifetime: Optional[float] = None) -> VerifiedTokenCache:
+    """
+    Get or create the global verified token cache
+
+    max_token_lifetime is the caller's access token lifetime in seconds; user
+    revocations are kept as long as the longest lifetime any caller passed.
+    """
+    global _token_cache
+
+    if _token_cache is None:
+        _token_cache = VerifiedTokenCache(max_token_lifetime=max_token_lifetime or DEFAULT_TOKEN_LIFETIME)
+    elif max_token_lifetime:
+        _token_cache.revocations.extend_token_lifetime(max_token_lifetime)
+
+    return _token_cache
@@ -12,11 +12,13 @@ from typing import Dict, List, Optional, Set, Callable, Any
 from dataclasses import dataclass, field
 from collections import defaultdict, deque
 from datetime import datetime, timedelta
-import json
 import uuid
 
 from fastapi import WebSocket, WebSocketDisconnect
 
+from .latency_histogram import LatencyHistogram
+from .wire_codec import WireCodec, Payload, JSON_CODEC, accept_with_codec
+
 
 @dataclass
 class ConnectionMetrics:
@@ -46,7 +48,7 @@ class ConnectionMetrics:
 
 @dataclass
 class PoolStats:
-    """Connection pool statistics"""
+    """Connection pool statistics, maintained incrementally across all connections ever seen"""
     total_connections: int = 0
     active_connections: int = 0
     peak_connections: int = 0
@@ -54,6 +56,8 @@ class PoolStats:
     total_messages_received: int = 0
     total_bytes_sent: int = 0
     total_bytes_received: int = 0
+    total_errors: int = 0
+    queued_messages: int = 0
     avg_latency_ms: float = 0.0
     error_rate: float = 0.0
     uptime_seconds: float = 0.0
@@ -82,6 +86,7 @@ class WebSocketConnectionPool:
         self.connections: Dict[str, WebSocket] = {}
         self.connection_metrics: Dict[str, ConnectionMetrics] = {}
         self.connection_handlers: Dict[str, Callable] = {}
+        self.connection_codecs: Dict[str, WireCodec] = {}
         
         # Message queuing
         self.message_queues: Dict[str, asyncio.Queue] = {}
@@ -93,20 +98,37 @@ class WebSocketConnectionPool:
         
         # Performance monitoring
         self.pool_stats = PoolStats()
+        self.send_latency = LatencyHistogram()  # Pool-wide send time, O(1) per sample
         self.start_time = datetime.now()
         self.monitoring_task: Optional[asyncio.Task] = None
         
-        # Health checking
+        # Health checking: a timer wheel of client IDs, one slot per tick.
+        # Each connection is pinged once per revolution, spread over the
+        # interval instead of in one sweep.
         self.health_check_interval = 30  # seconds
+        self.health_check_slots = 30
+        self.health_check_concurrency = 100
+        self.health_check_timeout = 5.0  # seconds per ping
         self.health_check_task: Optional[asyncio.Task] = None
         self.unhealthy_connections: Set[str] = set()
+        self.health_wheel: List[Set[str]] = [set() for _ in range(self.health_check_slots)]
+        self._health_slots: Dict[str, int] = {}
+        self._health_cursor = 0
+        self._health_placements = 0
+        self._health_semaphore = asyncio.Semaphore(self.health_check_concurrency)
+        self._health_tasks: Set[asyncio.Task] = set()
+        self.health_checks_performed = 0
+        self.health_check_failures = 0
         
         # Message batching
         self.batch_size = 10
         self.batch_timeout = 0.01  # 10ms
-        self.pending_batches: Dict[str, List] = defaultdict(list)
+        self.pending_batches: Dict[str, List[Payload]] = defaultdict(list)
         self.batch_timers: Dict[str, asyncio.Task] = {}
         
+        # Broadcast fan-out
+        self.broadcast_concurrency = 64
+        
         self.logger.info(f"WebSocket connection pool initialized (max_connections: {max_connections})")
     
     async def start(self):
@@ -122,6 +144,8 @@ class WebSocketConnectionPool:
             self.monitoring_task.cancel()
         if self.health_check_task:
             self.health_check_task.cancel()
+        for task in list(self._health_tasks):
+            task.cancel()
         
         # Stop all queue processors
         for task in self.queue_processors.values():
@@ -163,11 +187,12 @@ class WebSocketConnectionPool:
         if not client_id:
             client_id = str(uuid.uuid4())
         
-        # Accept WebSocket connection
-        await websocket.accept()
+        # Accept WebSocket connection with the negotiated wire encoding
+        codec = await accept_with_codec(websocket)
         
         # Store connection
         self.connections[client_id] = websocket
+        self.connection_codecs[client_id] = codec
         self.connection_groups[group].add(client_id)
         
         # Initialize metrics
@@ -189,6 +214,8 @@ class WebSocketConnectionPool:
         if message_handler:
             self.connection_handlers[client_id] = message_handler
         
+        self._schedule_health_check(client_id)
+        
         # Update stats
         self.pool_stats.total_connections += 1
         self.pool_stats.active_connections += 1
@@ -197,7 +224,7 @@ class WebSocketConnectionPool:
             self.pool_stats.active_connections
         )
         
-        self.logger.info(f"Client {client_id} connected to pool (group: {group})")
+        self.logger.info(f"Client {client_id} connected to pool (group: {group}, encoding: {codec.name})")
         return client_id
     
     async def disconnect_client(self, client_id: str):
@@ -234,6 +261,7 @@ class WebSocketConnectionPool:
         # Clear message queue
         if client_id in self.message_queues:
             queue = self.message_queues[client_id]
+            self.pool_stats.queued_messages -= queue.qsize()
             while not queue.empty():
                 try:
                     queue.get_nowait()
@@ -251,9 +279,14 @@ class WebSocketConnectionPool:
         
         # Remove handlers and metrics
         self.connection_handlers.pop(client_id, None)
+        self.connection_codecs.pop(client_id, None)
         self.connection_metrics.pop(client_id, None)
         self.unhealthy_connections.discard(client_id)
         
+        slot = self._health_slots.pop(client_id, None)
+        if slot is not None:
+            self.health_wheel[slot].discard(client_id)
+        
         # Update stats
         self.pool_stats.active_connections = len(self.connections)
     
@@ -295,21 +328,57 @@ class WebSocketConnectionPool:
             await self._mark_connection_unhealthy(client_id)
             return False
     
+    def get_codec(self, client_id: str) -> WireCodec:
+        """Get the wire codec negotiated by a client"""
+        return self.connection_codecs.get(client_id, JSON_CODEC)
+    
+    def _encode_message(self, client_id: str, message: Dict[str, Any]) -> Payload:
+        """Serialize a message once into an immutable wire payload"""
+        return self.get_codec(client_id).encode(message)
+    
+    async def receive_message(self, client_id: str) -> Any:
+        """
+        Receive and decode the next message from a client
+        
+        Raises:
+            WebSocketDisconnect: If the client disconnected
+            ValueError: If the message could not be decoded
+        """
+        websocket = self.connections[client_id]
+        codec = self.get_codec(client_id)
+        payload = await codec.receive_frame(websocket)
+        
+        metrics = self.connection_metrics.get(client_id)
+        if metrics:
+            metrics.messages_received += 1
+            metrics.bytes_received += len(payload)
+            metrics.last_activity = datetime.now()
+        self.pool_stats.total_messages_received += 1
+        self.pool_stats.total_bytes_received += len(payload)
+        
+        return codec.decode_frame(payload)
+    
     async def _send_message_direct(self, client_id: str, message: Dict[str, Any]) -> bool:
         """Send message directly to WebSocket"""
+        return await self._send_encoded(client_id, self._encode_message(client_id, message))
+    
+    async def _send_encoded(self, client_id: str, payload: Payload) -> bool:
+        """Send an already serialized payload directly to WebSocket"""
         try:
             websocket = self.connections[client_id]
-            message_str = json.dumps(message)
             
             start_time = time.time()
-            await websocket.send_text(message_str)
+            await self.get_codec(client_id).send(websocket, payload)
             latency_ms = (time.time() - start_time) * 1000
             
             # Update metrics
             metrics = self.connection_metrics[client_id]
             metrics.messages_sent += 1
-            metrics.bytes_sent += len(message_str)
+            metrics.bytes_sent += len(payload)
             metrics.latency_samples.append(latency_ms)
+            self.pool_stats.total_messages_sent += 1
+            self.pool_stats.total_bytes_sent += len(payload)
+            self.send_latency.record(latency_ms)
             metrics.last_activity = datetime.now()
             
             return True
@@ -324,17 +393,19 @@ class WebSocketConnectionPool:
     
     async def _queue_message(self, client_id: str, message: Dict[str, Any]) -> bool:
         """Queue message for batched sending"""
+        return self._queue_encoded(client_id, self._encode_message(client_id, message))
+    
+    def _queue_encoded(self, client_id: str, payload: Payload) -> bool:
+        """Queue an already serialized payload for batched sending"""
         try:
             queue = self.message_queues[client_id]
-            
-            # Check queue capacity
-            if queue.full():
-                self.logger.warning(f"Message queue full for {client_id}, dropping message")
-                return False
-            
-            await queue.put(message)
+            queue.put_nowait(payload)
+            self.pool_stats.queued_messages += 1
             return True
-            
+        
+        except asyncio.QueueFull:
+            self.logger.warning(f"Message queue full for {client_id}, dropping message")
+            return False
         except Exception as e:
             self.logger.error(f"Queue message error for {client_id}: {e}")
             return False
@@ -349,6 +420,7 @@ class WebSocketConnectionPool:
                         self.message_queues[client_id].get(),
                         timeout=1.0
                     )
+                    self.pool_stats.queued_messages -= 1
                     
                     # Add to batch
                     self.pending_batches[client_id].append(message)
@@ -405,16 +477,13 @@ class WebSocketConnectionPool:
             
             if len(batch) == 1:
                 # Single message - send directly
-                await self._send_message_direct(client_id, batch[0])
+                await self._send_encoded(client_id, batch[0])
             else:
-                # Multiple messages - send as batch
-                batch_message = {
-                    "type": "batch",
-                    "messages": batch,
-                    "count": len(batch),
-                    "timestamp": datetime.now().isoformat()
-                }
-                await self._send_message_direct(client_id, batch_message)
+                # Multiple messages - splice fragments into one frame
+                batch_frame = self.get_codec(client_id).assemble_batch(
+                    batch, datetime.now().isoformat()
+                )
+                await self._send_encoded(client_id, batch_frame)
         
         except Exception as e:
             self.logger.error(f"Batch send error for {client_id}: {e}")
@@ -423,15 +492,24 @@ class WebSocketConnectionPool:
         self, 
         message: Dict[str, Any], 
         group: Optional[str] = None,
-        exclude: Optional[Set[str]] = None
-    ):
+        exclude: Optional[Set[str]] = None,
+        batch: bool = True
+    ) -> int:
         """
         Broadcast message to multiple clients
         
+        The message is serialized once per negotiated codec and the same
+        payload is shared by every recipient using that codec.
+        
         Args:
             message: Message to broadcast
             group: Optional group to broadcast to (all clients if None)
             exclude: Optional set of client IDs to exclude
+            batch: If True, queue for batched sending; otherwise send
+                directly with bounded concurrency
+            
+        Returns:
+            Number of clients the message was queued/sent to
         """
         exclude = exclude or set()
         
@@ -440,23 +518,52 @@ class WebSocketConnectionPool:
         else:
             target_clients = set(self.connections.keys())
         
-        # Remove excluded clients
-        target_clients -= exclude
+        # Remove excluded and unhealthy clients
+        target_clients = [
+            client_id for client_id in target_clients
+            if client_id not in exclude
+            and client_id in self.connections
+            and client_id not in self.unhealthy_connections
+        ]
+        if not target_clients:
+            return 0
         
-        # Send to all targets
-        tasks = []
-        for client_id in target_clients:
-            if client_id not in self.unhealthy_connections:
-                task = asyncio.create_task(
-                    self.send_message(client_id, message, batch=True)
-                )
-                tasks.append(task)
+        payloads: Dict[str, Payload] = {}
+        
+        def payload_for(client_id: str) -> Payload:
+            codec = self.get_codec(client_id)
+            if codec.name not in payloads:
+                payloads[codec.name] = codec.encode(message)
+            return payloads[codec.name]
         
-        # Wait for all sends to complete
-        if tasks:
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            for client_id in target_clients:
+                payload_for(client_id)
+        except (TypeError, ValueError) as e:
+            self.logger.error(f"Broadcast serialization error: {e}")
+            return 0
+        
+        if batch:
+            # Enqueueing never blocks, so no per-client task is needed
+            success_count = sum(
+                1 for client_id in target_clients
+                if self._queue_encoded(client_id, payload_for(client_id))
+            )
+        else:
+            semaphore = asyncio.Semaphore(self.broadcast_concurrency)
+            
+            async def send(client_id: str) -> bool:
+                async with semaphore:
+                    return await self._send_encoded(client_id, payload_for(client_id))
+            
+            results = await asyncio.gather(
+                *(send(client_id) for client_id in target_clients),
+                return_exceptions=True
+            )
             success_count = sum(1 for r in results if r is True)
-            self.logger.debug(f"Broadcast sent to {success_count}/{len(tasks)} clients")
+        
+        self.logger.debug(f"Broadcast sent to {success_count}/{len(target_clients)} clients")
+        return success_count
     
     async def _mark_connection_unhealthy(self, client_id: str):
         """Mark a connection as unhealthy"""
@@ -465,54 +572,89 @@ class WebSocketConnectionPool:
         # Update error metrics
         if client_id in self.connection_metrics:
             self.connection_metrics[client_id].errors += 1
+            self.pool_stats.total_errors += 1
         
         self.logger.warning(f"Connection {client_id} marked as unhealthy")
     
+    def _schedule_health_check(self, client_id: str):
+        """Place a connection in the health wheel, spreading connections evenly over slots"""
+        slot = self._health_placements % len(self.health_wheel)
+        self._health_placements += 1
+        self.health_wheel[slot].add(client_id)
+        self._health_slots[client_id] = slot
+    
     async def _health_check_loop(self):
-        """Periodic health check for connections"""
+        """Advance the health wheel one slot per tick, checking only that slot"""
+        loop = asyncio.get_running_loop()
+        tick = self.health_check_interval / len(self.health_wheel)
+        next_tick = loop.time() + tick
+        
         while True:
             try:
-                await asyncio.sleep(self.health_check_interval)
-                await self._perform_health_checks()
+                # Absolute schedule so slow ticks do not drift the wheel
+                await asyncio.sleep(max(0.0, next_tick - loop.time()))
+                next_tick += tick
+                
+                due = list(self.health_wheel[self._health_cursor])
+                self._health_cursor = (self._health_cursor + 1) % len(self.health_wheel)
+                
+                # Run checks in the background so one slow socket cannot delay the wheel
+                if due:
+                    task = asyncio.create_task(self._perform_health_checks(due))
+                    self._health_tasks.add(task)
+                    task.add_done_callback(self._health_tasks.discard)
             
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 self.logger.error(f"Health check error: {e}")
     
-    async def _perform_health_checks(self):
-        """Perform health checks on all connections"""
+    async def _perform_health_checks(self, client_ids: List[str]):
+        """Ping a set of connections concurrently with bounded parallelism"""
         current_time = datetime.now()
         stale_threshold = timedelta(minutes=5)
+        ping_message = {
+            "type": "ping",
+            "timestamp": current_time.isoformat()
+        }
         
-        unhealthy_clients = []
-        
-        for client_id, metrics in self.connection_metrics.items():
+        async def check(client_id: str):
+            metrics = self.connection_metrics.get(client_id)
+            if metrics is None:
+                return
+            
             # Check for stale connections
             if current_time - metrics.last_activity > stale_threshold:
-                unhealthy_clients.append(client_id)
-                continue
+                await self.disconnect_client(client_id)
+                return
             
-            # Send ping to check connection health
-            try:
-                ping_message = {
-                    "type": "ping",
-                    "timestamp": current_time.isoformat()
-                }
-                success = await self.send_message(client_id, ping_message, priority=True, batch=False)
-                
-                if success and client_id in self.unhealthy_connections:
+            was_unhealthy = client_id in self.unhealthy_connections
+            async with self._health_semaphore:
+                try:
+                    async with asyncio.timeout(self.health_check_timeout):
+                        success = await self._send_message_direct(client_id, ping_message)
+                except TimeoutError:
+                    success = False
+                except Exception as e:
+                    self.logger.debug(f"Health check failed for {client_id}: {e}")
+                    success = False
+            
+            self.health_checks_performed += 1
+            if success:
+                if was_unhealthy:
                     # Connection recovered
-                    self.unhealthy_connections.remove(client_id)
+                    self.unhealthy_connections.discard(client_id)
                     self.logger.info(f"Connection {client_id} recovered")
-                
-            except Exception as e:
-                self.logger.debug(f"Health check failed for {client_id}: {e}")
-                unhealthy_clients.append(client_id)
-        
-        # Disconnect unhealthy clients
-        for client_id in unhealthy_clients:
-            await self.disconnect_client(client_id)
+                return
+            
+            self.health_check_failures += 1
+            if was_unhealthy:
+                # Second failed check in a row
+                await self.disconnect_client(client_id)
+            elif client_id not in self.unhealthy_connections:
+                await self._mark_connection_unhealthy(client_id)
+        
+        await asyncio.gather(*(check(client_id) for client_id in client_ids))
     
     async def _monitoring_loop(self):
         """Periodic monitoring and stats collection"""
@@ -527,43 +669,25 @@ class WebSocketConnectionPool:
                 self.logger.error(f"Monitoring error: {e}")
     
     async def _update_pool_stats(self):
-        """Update pool statistics"""
+        """Refresh derived pool statistics (totals are maintained on each send and receive)"""
         try:
-            # Calculate aggregate metrics
-            total_messages_sent = sum(m.messages_sent for m in self.connection_metrics.values())
-            total_messages_received = sum(m.messages_received for m in self.connection_metrics.values())
-            total_bytes_sent = sum(m.bytes_sent for m in self.connection_metrics.values())
-            total_bytes_received = sum(m.bytes_received for m in self.connection_metrics.values())
-            
-            # Calculate average latency
-            all_latencies = []
-            for metrics in self.connection_metrics.values():
-                all_latencies.extend(metrics.latency_samples)
-            
-            avg_latency = sum(all_latencies) / len(all_latencies) if all_latencies else 0.0
+            stats = self.pool_stats
+            stats.avg_latency_ms = self.send_latency.mean_ms
+            stats.error_rate = self._error_rate()
+            stats.uptime_seconds = (datetime.now() - self.start_time).total_seconds()
             
-            # Calculate error rate
-            total_errors = sum(m.errors for m in self.connection_metrics.values())
-            total_operations = total_messages_sent + total_messages_received
-            error_rate = (total_errors / total_operations * 100) if total_operations > 0 else 0.0
-            
-            # Update stats
-            self.pool_stats.total_messages_sent = total_messages_sent
-            self.pool_stats.total_messages_received = total_messages_received
-            self.pool_stats.total_bytes_sent = total_bytes_sent
-            self.pool_stats.total_bytes_received = total_bytes_received
-            self.pool_stats.avg_latency_ms = avg_latency
-            self.pool_stats.error_rate = error_rate
-            self.pool_stats.uptime_seconds = (datetime.now() - self.start_time).total_seconds()
-            
-            self.logger.debug(f"Pool stats updated: {self.pool_stats.active_connections} active connections, "
-                            f"{avg_latency:.2f}ms avg latency, {error_rate:.2f}% error rate")
+            self.logger.debug(f"Pool stats updated: {stats.active_connections} active connections, "
+                            f"{stats.avg_latency_ms:.2f}ms avg latency, {stats.error_rate:.2f}% error rate")
         
         except Exception as e:
             self.logger.error(f"Stats update error: {e}")
     
+    def _error_rate(self) -> float:
+        total_operations = self.pool_stats.total_messages_sent + self.pool_stats.total_messages_received
+        return (self.pool_stats.total_errors / total_operations * 100) if total_operations > 0 else 0.0
+    
     def get_pool_stats(self) -> Dict[str, Any]:
-        """Get current pool statistics"""
+        """Get current pool statistics in O(1); per-client queue depths are in get_client_metrics"""
         return {
             "total_connections": self.pool_stats.total_connections,
             "active_connections": self.pool_stats.active_connections,
@@ -573,13 +697,19 @@ class WebSocketConnectionPool:
             "total_messages_received": self.pool_stats.total_messages_received,
             "total_bytes_sent": self.pool_stats.total_bytes_sent,
             "total_bytes_received": self.pool_stats.total_bytes_received,
-            "avg_latency_ms": round(self.pool_stats.avg_latency_ms, 2),
-            "error_rate_percent": round(self.pool_stats.error_rate, 2),
-            "uptime_seconds": round(self.pool_stats.uptime_seconds, 2),
-            "queue_depths": {
-                client_id: queue.qsize() 
-                for client_id, queue in self.message_queues.items()
-            }
+            "total_errors": self.pool_stats.total_errors,
+            "avg_latency_ms": round(self.send_latency.mean_ms, 2),
+            "send_latency": self.send_latency.summary(),
+            "error_rate_percent": round(self._error_rate(), 2),
+            "uptime_seconds": round((datetime.now() - self.start_time).total_seconds(), 2),
+            "health_checks": {
+                "interval_seconds": self.health_check_interval,
+                "wheel_slots": len(self.health_wheel),
+                "performed": self.health_checks_performed,
+                "failures": self.health_check_failures,
+                "in_flight_sweeps": len(self._health_tasks)
+            },
+            "queued_messages": self.pool_stats.queued_messages
         }
     
     def get_client_metrics(self, client_id: str) -> Optional[Dict[str, Any]]:
@@ -600,6 +730,7 @@ class WebSocketConnectionPool:
             "errors": metrics.errors,
             "avg_latency_ms": round(metrics.avg_latency_ms, 2),
             "is_healthy": client_id not in self.unhealthy_connections,
+            "encoding": self.get_codec(client_id).name,
             "queue_depth": self.message_queues[client_id].qsize() if client_id in self.message_queues else 0
         }
 
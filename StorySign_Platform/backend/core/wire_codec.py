@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+WebSocket Wire Codecs
+Negotiated message encodings shared by every WebSocket channel
+"""
+
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Union
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+
+logger = logging.getLogger(__name__)
+
+Payload = Union[str, bytes]
+
+
+class WireCodec(ABC):
+    """Base class for WebSocket message encodings"""
+
+    name = ""
+    subprotocol = ""
+    binary = False
+
+    @abstractmethod
+    def encode(self, message: Dict[str, Any]) -> Payload:
+        """Serialize a message into a frame payload"""
+        pass
+
+    @abstractmethod
+    def decode(self, payload: Payload) -> Any:
+        """Deserialize a frame payload"""
+        pass
+
+    @abstractmethod
+    def assemble_batch(self, fragments: List[Payload], timestamp: str) -> Payload:
+        """Build a batch frame from already encoded message fragments"""
+        pass
+
+    async def send(self, websocket: WebSocket, payload: Payload) -> None:
+        """Send an encoded payload with the matching frame type"""
+        if self.binary:
+            await websocket.send_bytes(payload)
+        else:
+            await websocket.send_text(payload)
+
+    async def receive(self, websocket: WebSocket) -> Any:
+        """
+        Receive and decode one message
+
+        Raises:
+            WebSocketDisconnect: If the client disconnected
+            ValueError: If the frame could not be decoded
+        """
+        return self.decode_frame(await self.receive_frame(websocket))
+
+    async def receive_frame(self, websocket: WebSocket) -> Payload:
+        """
+        Receive one frame payload without decoding it
+
+        Raises:
+            WebSocketDisconnect: If the client disconnected
+        """
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+
+        if message.get("bytes") is not None:
+            return message["bytes"]
+        return message.get("text") or ""
+
+    def decode_frame(self, payload: Payload) -> Any:
+        """Decode a received frame, accepting JSON text from any client"""
+        if isinstance(payload, str):
+            return json.loads(payload)
+        return self.decode(payload)
+
+
+class JsonCodec(WireCodec):
+    """
+    JSON text encoding (the default)
+
+    Text frames are compressed by permessage-deflate when the client and
+    server negotiate it during the WebSocket handshake.
+    """
+
+    name = "json"
+    subprotocol = "storysign.json.v1"
+    binary = False
+
+    def encode(self, message: Dict[str, Any]) -> Payload:
+        return json.dumps(message, separators=(",", ":"))
+
+    def decode(self, payload: Payload) -> Any:
+        return json.loads(payload)
+
+    def assemble_batch(self, fragments: List[Payload], timestamp: str) -> Payload:
+        return (
+            '{"type":"batch","messages":['
+            + ",".join(fragments)
+            + '],"count":'
+            + str(len(fragments))
+            + ',"timestamp":'
+            + json.dumps(timestamp)
+            + "}"
+        )
+
+
+class MsgPackCodec(WireCodec):
+    """MessagePack binary encoding"""
+
+    name = "msgpack"
+    subprotocol = "storysign.msgpack.v1"
+    binary = True
+
+    def encode(self, message: Dict[str, Any]) -> Payload:
+        return msgpack.packb(message, use_bin_type=True, default=_msgpack_default)
+
+    def decode(self, payload: Payload) -> Any:
+        try:
+            return msgpack.unpackb(payload, raw=False)
+        except Exception as e:
+            raise ValueError(f"Invalid MessagePack payload: {e}")
+
+    def assemble_batch(self, fragments: List[Payload], timestamp: str) -> Payload:
+        packer = msgpack.Packer(use_bin_type=True)
+        return b"".join([
+            packer.pack_map_header(4),
+            packer.pack("type"), packer.pack("batch"),
+            packer.pack("messages"), packer.pack_array_header(len(fragments)),
+            *fragments,
+            packer.pack("count"), packer.pack(len(fragments)),
+            packer.pack("timestamp"), packer.pack(timestamp),
+        ])
+
+
+def _msgpack_default(value: Any) -> Any:
+    """Fallback for types MessagePack cannot encode natively"""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not MessagePack serializable")
+
+
+# Shared, stateless codec instances
+JSON_CODEC = JsonCodec()
+_CODECS: Dict[str, WireCodec] = {JSON_CODEC.name: JSON_CODEC}
+if MSGPACK_AVAILABLE:
+    _CODECS[MsgPackCodec.name] = MsgPackCodec()
+
+
+def get_codec(name: Optional[str]) -> WireCodec:
+    """Get a codec by name, falling back to JSON"""
+    return _CODECS.get(name or "", JSON_CODEC)
+
+
+def available_codecs() -> List[str]:
+    """Get the names of the codecs this server can speak"""
+    return list(_CODECS.keys())
+
+
+def negotiate_codec(websocket: WebSocket) -> WireCodec:
+    """
+    Pick a codec from the client's handshake
+
+    Clients offer codecs as WebSocket subprotocols (first match wins) or,
+    for clients that cannot set subprotocols, with an ?encoding= query param.
+    """
+    offered = websocket.scope.get("subprotocols") or []
+    for subprotocol in offered:
+        for codec in _CODECS.values():
+            if codec.subprotocol == subprotocol:
+                return codec
+
+    return get_codec(websocket.query_params.get("encoding"))
+
+
+async def accept_with_codec(websocket: WebSocket) -> WireCodec:
+    """Accept a WebSocket with the negotiated codec and return it"""
+    codec = negotiate_codec(websocket)
+    offered = websocket.scope.get("subprotocols") or []
+    subprotocol = codec.subprotocol if codec.subprotocol in offered else None
+
+    await websocket.accept(subprotocol=subprotocol)
+    if codec is not JSON_CODEC:
+        logger.debug(f"WebSocket negotiated {codec.name} encoding")
+    return codec
@@ -30,6 +30,7 @@ import threading
 from concurrent.futures import ThreadPoolExecutor
 
 from config import get_config, AppConfig
+from core.wire_codec import WireCodec, JSON_CODEC, accept_with_codec
 from video_processor import FrameProcessor
 from local_vision_service import get_vision_service, VisionResult
 from ollama_service import get_ollama_service, StoryResponse
@@ -331,6 +332,7 @@ class VideoProcessingService:
         self.frame_queue = asyncio.Queue(maxsize=3)  # Reduced queue size for lower latency
         self.processing_loop_task = None
         self.websocket = None
+        self.codec: WireCodec = JSON_CODEC
 
         # Low latency optimizations
         self.low_latency_mode = True  # Enable aggressive optimizations
@@ -355,10 +357,11 @@ class VideoProcessingService:
         # Processing loop control
         self._shutdown_event = asyncio.Event()
 
-    async def start_processing(self, websocket: WebSocket):
+    async def start_processing(self, websocket: WebSocket, codec: WireCodec = JSON_CODEC):
         """Start video processing for this client session with async processing loop"""
         self.is_active = True
         self.websocket = websocket
+        self.codec = codec
         self.logger.info(f"Starting enhanced video processing for client {self.client_id}")
 
         # Start the async processing loop
@@ -478,7 +481,7 @@ class VideoProcessingService:
             # Send response to client if websocket is still active
             if self.websocket and response:
                 try:
-                    await self.websocket.send_text(json.dumps(response))
+                    await self.codec.send(self.websocket, self.codec.encode(response))
                 except ConnectionResetError:
                     self.logger.info(f"Client {self.client_id} connection reset during send")
                     # Stop processing as client is disconnected
@@ -494,7 +497,7 @@ class VideoProcessingService:
             try:
                 if self.websocket:
                     error_response = self._create_critical_error_response(str(e))
-                    await self.websocket.send_text(json.dumps(error_response))
+                    await self.codec.send(self.websocket, self.codec.encode(error_response))
             except Exception as send_error:
                 self.logger.error(f"Failed to send error response to client {self.client_id}: {send_error}")
 
@@ -658,7 +661,7 @@ class VideoProcessingService:
                 # Send feedback to client
                 if self.websocket:
                     try:
-                        await self.websocket.send_text(json.dumps(feedback_message))
+                        await self.codec.send(self.websocket, self.codec.encode(feedback_message))
                         self.logger.info(f"ASL feedback sent to client {self.client_id}")
                     except Exception as send_error:
                         self.logger.error(f"Failed to send ASL feedback to client {self.client_id}: {send_error}")
@@ -695,7 +698,7 @@ class VideoProcessingService:
                 
                 if self.websocket:
                     try:
-                        await self.websocket.send_text(json.dumps(error_message))
+                        await self.codec.send(self.websocket, self.codec.encode(error_message))
                         self.logger.warning(f"ASL error feedback sent to client {self.client_id}")
                     except Exception as send_error:
                         self.logger.error(f"Failed to send ASL error feedback to client {self.client_id}: {send_error}")
@@ -723,7 +726,7 @@ class VideoProcessingService:
                 }
                 
                 if self.websocket:
-                    await self.websocket.send_text(json.dumps(error_message))
+                    await self.codec.send(self.websocket, self.codec.encode(error_message))
                     
             except Exception as send_error:
                 self.logger.error(f"Failed to send analysis error message to client {self.client_id}: {send_error}")
@@ -1162,6 +1165,7 @@ class ConnectionManager:
 
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
+        self.connection_codecs: Dict[str, WireCodec] = {}
         self.processing_services: Dict[str, VideoProcessingService] = {}
         self.connection_counter = 0
         self.logger = logging.getLogger(f"{__name__}.ConnectionManager")
@@ -1176,11 +1180,12 @@ class ConnectionManager:
         self.connection_counter += 1
         return f"client_{self.connection_counter}"
 
-    async def connect(self, websocket: WebSocket) -> str:
-        """Register WebSocket connection (WebSocket should already be accepted)"""
+    async def connect(self, websocket: WebSocket, codec: WireCodec = JSON_CODEC) -> str:
+        """Register WebSocket connection (WebSocket should already be accepted with codec)"""
         client_id = self.generate_client_id()
 
         self.active_connections[client_id] = websocket
+        self.connection_codecs[client_id] = codec
         # Note: VideoProcessingService will be created and managed by the WebSocket endpoint
         
         logger.info(f"Client {client_id} connected. Total connections: {len(self.active_connections)}")
@@ -1194,6 +1199,7 @@ class ConnectionManager:
         """Disconnect client and cleanup resources"""
         if client_id in self.active_connections:
             del self.active_connections[client_id]
+        self.connection_codecs.pop(client_id, None)
 
         if client_id in self.processing_services:
             await self.processing_services[client_id].stop_processing()
@@ -1205,7 +1211,8 @@ class ConnectionManager:
         """Send message to specific client"""
         if client_id in self.active_connections:
             websocket = self.active_connections[client_id]
-            await websocket.send_text(json.dumps(message))
+            codec = self.connection_codecs.get(client_id, JSON_CODEC)
+            await codec.send(websocket, codec.encode(message))
 
     def get_connection_count(self) -> int:
         """Get current number of active connections"""
@@ -1534,9 +1541,13 @@ async def websocket_video_endpoint(websocket: WebSocket):
             await websocket.close(code=1012, reason="Server shutting down")
             return
 
-        # Accept connection and create processing service
-        client_id = await connection_manager.connect(websocket)
-        logger.info(f"WebSocket connection established for client {client_id}")
+        # Accept connection with the negotiated codec and create processing service
+        codec = await accept_with_codec(websocket)
+        client_id = await connection_manager.connect(websocket, codec)
+        processing_service = VideoProcessingService(client_id, app_config)
+        connection_manager.register_processing_service(client_id, processing_service)
+        await processing_service.start_processing(websocket, codec)
+        logger.info(f"WebSocket connection established for client {client_id} (encoding: {codec.name})")
 
         # Track connection metrics
         message_count = 0
@@ -1548,7 +1559,7 @@ async def websocket_video_endpoint(websocket: WebSocket):
         while not connection_manager.shutdown_initiated:
             try:
                 # Receive message from client with reduced timeout for faster response
-                raw_message = await asyncio.wait_for(websocket.receive_text(), timeout=5.0)
+                raw_message = await asyncio.wait_for(codec.receive_frame(websocket), timeout=5.0)
                 message_count += 1
                 last_activity = time.time()
 
@@ -1567,16 +1578,16 @@ async def websocket_video_endpoint(websocket: WebSocket):
                     await connection_manager.send_message(client_id, error_response)
                     continue
 
-                # Parse JSON message with detailed error handling
+                # Decode message with detailed error handling
                 try:
-                    message_data = json.loads(raw_message)
-                except json.JSONDecodeError as e:
-                    logger.error(f"Invalid JSON received from client {client_id}: {e}")
+                    message_data = codec.decode_frame(raw_message)
+                except ValueError as e:
+                    logger.error(f"Invalid {codec.name} message received from client {client_id}: {e}")
                     error_response = {
                         "type": "error",
-                        "message": f"Invalid JSON format: {str(e)}",
+                        "message": f"Invalid {codec.name} format: {str(e)}",
                         "timestamp": datetime.utcnow().isoformat(),
-                        "error_code": "INVALID_JSON"
+                        "error_code": "INVALID_JSON" if codec is JSON_CODEC else "INVALID_MESSAGE"
                     }
                     await connection_manager.send_message(client_id, error_response)
                     continue
@@ -1586,7 +1597,7 @@ async def websocket_video_endpoint(websocket: WebSocket):
                     logger.error(f"Invalid message structure from client {client_id}")
                     error_response = {
                         "type": "error",
-                        "message": "Message must be JSON object with 'type' field",
+                        "message": "Message must be an object with 'type' field",
                         "timestamp": datetime.utcnow().isoformat(),
                         "error_code": "INVALID_MESSAGE_STRUCTURE"
                     }
@@ -1790,5 +1801,6 @@ if __name__ == "__main__":
         host=app_config.server.host,
         port=app_config.server.port,
         reload=app_config.server.reload,
-        log_level=app_config.server.log_level
+        log_level=app_config.server.log_level,
+        ws_per_message_deflate=True
     )
@@ -433,6 +433,16 @@ async def startup_event():
         # TODO: Initialize database connections
         # TODO: Initialize AI services
         # TODO: Initialize cache
+        
+        # Fan collaborative sessions out across workers when configured
+        backplane_backend = os.getenv("COLLABORATIVE_BACKPLANE")
+        if backplane_backend:
+            from api.collaborative_websocket import collaborative_manager
+            from core.session_backplane import create_session_backplane
+            await collaborative_manager.set_backplane(
+                create_session_backplane(backplane_backend, app_config.cache.model_dump())
+            )
+        
         logger.info("Services initialized successfully")
     except Exception as e:
         logger.error(f"Service initialization failed: {e}")
@@ -451,6 +461,11 @@ async def shutdown_event():
         # TODO: Close database connections
         # TODO: Clean up AI services
         # TODO: Clear cache
+        
+        if os.getenv("COLLABORATIVE_BACKPLANE"):
+            from api.collaborative_websocket import collaborative_manager
+            await collaborative_manager.set_backplane(None)
+        
         logger.info("Resources cleaned up successfully")
     except Exception as e:
         logger.error(f"Cleanup error: {e}")
@@ -478,5 +493,6 @@ if __name__ == "__main__":
         port=args.port,
         reload=args.reload,
         log_level=args.log_level,
-        access_log=True
+        access_log=True,
+        ws_per_message_deflate=True
     )
\ No newline at end of file
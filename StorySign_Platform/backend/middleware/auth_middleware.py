@@ -12,7 +12,7 @@ import time
 
 from ..services.auth_service import AuthService
 from ..repositories.user_repository import UserRepository, UserSessionRepository
-from ..core.database_service import DatabaseService
+from ..core.principal_cache import UserPrincipal, get_principal_cache
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +36,8 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
             "/metrics"
         ]
         self.auth_service = None
+        self.database_service = None
+        self.principal_cache = get_principal_cache()
         self.security = HTTPBearer(auto_error=False)
     
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
@@ -193,6 +195,14 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
             logger.error(f"Failed to initialize auth service: {e}")
             raise HTTPException(status_code=500, detail="Authentication service unavailable")
     
+    async def _get_database_service(self):
+        """Get the application's shared database service lazily"""
+        if self.database_service is None:
+            from ..core.service_container import get_service_container
+            container = get_service_container()
+            self.database_service = await container.get_service("DatabaseService")
+        return self.database_service
+    
     async def _authenticate_request(self, request: Request) -> Optional[object]:
         """
         Authenticate request and return user
@@ -201,7 +211,7 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
             request: FastAPI request
             
         Returns:
-            User object if authenticated, None otherwise
+            UserPrincipal if authenticated, None otherwise
             
         Raises:
             HTTPException: If authentication fails
@@ -225,7 +235,7 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
             token = authorization.split(" ")[1]
             
             # Verify JWT token
-            payload = self.auth_service.verify_access_token(token)
+            payload = await self.auth_service.verify_access_token(token)
             if not payload:
                 raise HTTPException(
                     status_code=401,
@@ -239,12 +249,22 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
                     detail="Invalid token payload"
                 )
             
-            # Get user from database
-            db_service = DatabaseService()
-            session = await db_service.get_session()
-            user_repo = UserRepository(session)
+            # Get user from the principal cache, falling back to the database
+            token_version = payload.get("tv", 0)
+            user = self.principal_cache.get(user_id, token_version)
+            if user is None:
+                await self.principal_cache.subscribe()
+                generation = self.principal_cache.generation
+                db_service = await self._get_database_service()
+                async with db_service.get_session() as session:
+                    user_repo = UserRepository(session)
+                    db_user = await user_repo.get_by_id_with_profile(user_id)
+                
+                if db_user and db_user.is_active:
+                    # Cache plain fields, never the ORM row, so requests share nothing mutable
+                    user = UserPrincipal.from_user(db_user)
+                    self.principal_cache.put(user, token_version, generation)
             
-            user = await user_repo.get_by_id_with_profile(user_id)
             if not user or not user.is_active:
                 raise HTTPException(
                     status_code=401,
@@ -3,10 +3,11 @@ Rate limiting middleware for API endpoints
 """
 
 import logging
+import math
 import time
 import asyncio
 from typing import Dict, Optional, Callable, Tuple
-from collections import defaultdict, deque
+from collections import OrderedDict
 from dataclasses import dataclass
 from fastapi import Request, Response, HTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -16,20 +17,63 @@ import hashlib
 logger = logging.getLogger(__name__)
 
 
+# Burst allowances are per minute, and exceeding one blocks the client for a minute
+BURST_WINDOW = 60
+BURST_COOLDOWN = 60
+
+
 @dataclass
 class RateLimit:
-    """Rate limit configuration"""
+    """
+    Rate limit configuration
+    
+    Enforced with two GCRA states per client: requests per window is the
+    sustained rate, and burst per minute the short-term rate. A rested
+    client may send min(requests, burst) requests at once.
+    """
     requests: int  # Number of requests allowed
     window: int    # Time window in seconds
     burst: int     # Burst allowance
+    
+    @property
+    def emission_interval(self) -> float:
+        """Seconds per request at the sustained rate"""
+        return self.window / self.requests
+    
+    @property
+    def tolerance(self) -> float:
+        """How far a client may run ahead of the sustained rate; lets a rested client send requests at once"""
+        return self.window - self.emission_interval
+    
+    @property
+    def effective_burst(self) -> int:
+        """Burst allowance, at least 1"""
+        return max(self.burst, 1)
+    
+    @property
+    def burst_interval(self) -> float:
+        """Seconds per request at the burst rate"""
+        return BURST_WINDOW / self.effective_burst
+    
+    @property
+    def burst_tolerance(self) -> float:
+        """How far a client may run ahead of the burst rate; lets a rested client send burst requests at once"""
+        return BURST_WINDOW - self.burst_interval
 
 
-@dataclass
 class RateLimitState:
-    """Rate limit state for a client"""
-    requests: deque
-    last_request: float
-    blocked_until: float = 0.0
+    """GCRA state for one client and rule"""
+    
+    __slots__ = ("tat", "burst_tat", "blocked_until")
+    
+    def __init__(self, now: float):
+        self.tat = now            # Theoretical arrival time at the sustained rate
+        self.burst_tat = now      # Theoretical arrival time at the burst rate
+        self.blocked_until = 0.0  # End of a burst cooldown
+    
+    def is_idle(self, now: float) -> bool:
+        """True if the state means the same as no state at all"""
+        return self.tat <= now and self.burst_tat <= now and self.blocked_until <= now
 
 
 class RateLimitingMiddleware(BaseHTTPMiddleware):
@@ -44,7 +88,8 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
         endpoint_limits: Optional[Dict[str, RateLimit]] = None,
         user_limits: Optional[Dict[str, RateLimit]] = None,
         ip_limits: Optional[Dict[str, RateLimit]] = None,
-        cleanup_interval: int = 300  # 5 minutes
+        cleanup_interval: int = 300,  # 5 minutes
+        max_clients: int = 200000
     ):
         super().__init__(app)
         
@@ -75,12 +120,22 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
         # IP-specific limits
         self.ip_limits = ip_limits or {}
         
-        # State storage
-        self.client_states: Dict[str, RateLimitState] = {}
+        # GCRA state: "client|rule" -> RateLimitState, least recently used
+        # first. An idle state means the same as no entry, so idle clients
+        # can be dropped without changing any decision.
+        self.client_states: "OrderedDict[str, RateLimitState]" = OrderedDict()
+        self.max_clients = max_clients
         self.blocked_ips: Dict[str, float] = {}  # IP -> blocked_until timestamp
         
+        # Rejections per IP: IP -> (violation window start, count)
+        self.ip_violations: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self.ip_violation_window = 3600  # 1 hour
+        self.ip_violation_threshold = 50
+        self.ip_block_duration = 3600  # 1 hour
+        
         # Cleanup
         self.cleanup_interval = cleanup_interval
+        self.cleanup_batch_size = 10000  # Client states examined per cleanup
         self.last_cleanup = time.time()
         
         # Statistics
@@ -88,7 +143,8 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
             "total_requests": 0,
             "blocked_requests": 0,
             "rate_limited_ips": set(),
-            "rate_limited_users": set()
+            "rate_limited_users": set(),
+            "evicted_clients": 0
         }
     
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
@@ -127,21 +183,21 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
                 )
             
             # Get applicable rate limit
-            rate_limit = self._get_rate_limit(request)
+            rule, rate_limit = self._get_rate_rule(request)
             
             # Check rate limit
-            allowed, retry_after = await self._check_rate_limit(client_id, rate_limit)
+            allowed, retry_after = await self._check_rate_limit(client_id, rate_limit, rule)
             
             if not allowed:
                 self.stats["blocked_requests"] += 1
                 
-                # Track rate limited clients
+                # Track rate limited clients, up to the same bound as client state
                 if hasattr(request.state, 'current_user') and request.state.current_user:
-                    self.stats["rate_limited_users"].add(request.state.current_user.id)
+                    self._track(self.stats["rate_limited_users"], request.state.current_user.id)
                 
                 client_ip = self._get_client_ip(request)
                 if client_ip:
-                    self.stats["rate_limited_ips"].add(client_ip)
+                    self._track(self.stats["rate_limited_ips"], client_ip)
                 
                 # Consider blocking IP for repeated violations
                 await self._consider_ip_blocking(request)
@@ -161,10 +217,10 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
             response = await call_next(request)
             
             # Add rate limit headers
-            remaining = await self._get_remaining_requests(client_id, rate_limit)
+            remaining = await self._get_remaining_requests(client_id, rate_limit, rule)
             response.headers["X-RateLimit-Limit"] = str(rate_limit.requests)
             response.headers["X-RateLimit-Remaining"] = str(remaining)
-            response.headers["X-RateLimit-Reset"] = str(int(time.time() + rate_limit.window))
+            response.headers["X-RateLimit-Reset"] = str(self._get_reset_time(client_id, rule))
             response.headers["X-RateLimit-Window"] = str(rate_limit.window)
             
             return response
@@ -250,101 +306,146 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
         Returns:
             Applicable rate limit configuration
         """
+        return self._get_rate_rule(request)[1]
+    
+    def _get_rate_rule(self, request: Request) -> Tuple[str, RateLimit]:
+        """
+        Get applicable rate limit for request and the name its state is kept under
+        
+        Args:
+            request: FastAPI request
+            
+        Returns:
+            Tuple of (rule name, rate limit configuration)
+        """
         # Check endpoint-specific limits first
         path = request.url.path
         for endpoint_pattern, limit in self.endpoint_limits.items():
             if path.startswith(endpoint_pattern):
-                return limit
+                return endpoint_pattern, limit
         
         # Check user role limits
         if hasattr(request.state, 'current_user') and request.state.current_user:
             user_role = getattr(request.state.current_user, 'role', 'learner')
             if user_role in self.user_limits:
-                return self.user_limits[user_role]
+                return f"role:{user_role}", self.user_limits[user_role]
         
         # Check IP-specific limits
         client_ip = self._get_client_ip(request)
         if client_ip and client_ip in self.ip_limits:
-            return self.ip_limits[client_ip]
+            return f"ip:{client_ip}", self.ip_limits[client_ip]
         
         # Return default limit
-        return self.default_rate_limit
+        return "default", self.default_rate_limit
     
-    async def _check_rate_limit(self, client_id: str, rate_limit: RateLimit) -> Tuple[bool, int]:
+    async def _check_rate_limit(
+        self,
+        client_id: str,
+        rate_limit: RateLimit,
+        rule: str = "default"
+    ) -> Tuple[bool, int]:
         """
         Check if request is within rate limit
         
+        GCRA keeps a theoretical arrival time (TAT) per client and rule for
+        each of the sustained and burst rates: a request is allowed unless a
+        TAT is more than its tolerance ahead of now, and each allowed request
+        pushes both TATs one interval further. Exceeding the burst blocks the
+        client for BURST_COOLDOWN seconds.
+        
         Args:
             client_id: Client identifier
             rate_limit: Rate limit configuration
+            rule: Name of the rule the limit came from
             
         Returns:
             Tuple of (allowed, retry_after_seconds)
         """
         current_time = time.time()
+        key = f"{client_id}|{rule}"
+        states = self.client_states
         
-        # Get or create client state
-        if client_id not in self.client_states:
-            self.client_states[client_id] = RateLimitState(
-                requests=deque(),
-                last_request=current_time
-            )
+        state = states.get(key) or RateLimitState(current_time)
         
-        state = self.client_states[client_id]
-        
-        # Check if client is currently blocked
+        # Check if client is in a burst cooldown
         if state.blocked_until > current_time:
-            return False, int(state.blocked_until - current_time)
-        
-        # Clean old requests outside the window
-        window_start = current_time - rate_limit.window
-        while state.requests and state.requests[0] < window_start:
-            state.requests.popleft()
+            return False, max(1, math.ceil(state.blocked_until - current_time))
         
-        # Check burst limit (requests in last minute)
-        burst_window_start = current_time - 60  # 1 minute burst window
-        recent_requests = sum(1 for req_time in state.requests if req_time > burst_window_start)
+        tat = max(state.tat, current_time)
+        burst_tat = max(state.burst_tat, current_time)
         
-        if recent_requests >= rate_limit.burst:
-            # Block for burst cooldown
-            state.blocked_until = current_time + 60  # 1 minute cooldown
-            return False, 60
+        # The TATs are sums of intervals; the slack stops float error from cutting a burst short
+        if burst_tat - rate_limit.burst_tolerance > current_time + 1e-6:
+            state.blocked_until = current_time + BURST_COOLDOWN
+            self._store_state(key, state)
+            return False, BURST_COOLDOWN
         
-        # Check window limit
-        if len(state.requests) >= rate_limit.requests:
-            # Calculate retry after based on oldest request
-            oldest_request = state.requests[0]
-            retry_after = int(oldest_request + rate_limit.window - current_time)
-            return False, max(retry_after, 1)
+        allowed_at = tat - rate_limit.tolerance
+        if allowed_at > current_time + 1e-6:
+            return False, max(1, math.ceil(allowed_at - current_time))
         
         # Allow request and record it
-        state.requests.append(current_time)
-        state.last_request = current_time
+        state.tat = tat + rate_limit.emission_interval
+        state.burst_tat = burst_tat + rate_limit.burst_interval
+        self._store_state(key, state)
         
         return True, 0
     
-    async def _get_remaining_requests(self, client_id: str, rate_limit: RateLimit) -> int:
+    def _store_state(self, key: str, state: RateLimitState) -> None:
+        """Store a client state as the most recently used, evicting beyond max_clients"""
+        states = self.client_states
+        if key in states:
+            states.move_to_end(key)
+            return
+        states[key] = state
+        if len(states) > self.max_clients:
+            # Least recently seen client; at worst it starts over with a full allowance
+            states.popitem(last=False)
+            self.stats["evicted_clients"] += 1
+    
+    async def _get_remaining_requests(
+        self,
+        client_id: str,
+        rate_limit: RateLimit,
+        rule: str = "default"
+    ) -> int:
         """
         Get remaining requests for client
         
         Args:
             client_id: Client identifier
             rate_limit: Rate limit configuration
+            rule: Name of the rule the limit came from
             
         Returns:
-            Number of remaining requests
+            Number of requests the client may send right now, back to back
         """
-        if client_id not in self.client_states:
-            return rate_limit.requests
-        
-        state = self.client_states[client_id]
         current_time = time.time()
-        window_start = current_time - rate_limit.window
-        
-        # Count requests in current window
-        current_requests = sum(1 for req_time in state.requests if req_time > window_start)
+        state = self.client_states.get(f"{client_id}|{rule}") or RateLimitState(current_time)
+        if state.blocked_until > current_time:
+            return 0
         
-        return max(0, rate_limit.requests - current_requests)
+        # Requests that fit before each TAT runs a full tolerance ahead of now;
+        # the epsilon keeps float error from rounding an exact count down
+        remaining = math.floor(
+            (current_time + rate_limit.window - max(state.tat, current_time))
+            / rate_limit.emission_interval + 1e-9
+        )
+        remaining_burst = math.floor(
+            (current_time + BURST_WINDOW - max(state.burst_tat, current_time))
+            / rate_limit.burst_interval + 1e-9
+        )
+        return max(0, min(remaining, remaining_burst, rate_limit.requests))
+    
+    def _get_reset_time(self, client_id: str, rule: str = "default") -> int:
+        """Timestamp at which the client has its full limit and burst again"""
+        current_time = time.time()
+        state = self.client_states.get(f"{client_id}|{rule}") or RateLimitState(current_time)
+        return math.ceil(max(state.tat, state.burst_tat, state.blocked_until, current_time))
+    
+    def _track(self, clients: set, client: str) -> None:
+        if len(clients) < self.max_clients:
+            clients.add(client)
     
     def _is_ip_blocked(self, request: Request) -> bool:
         """
@@ -384,6 +485,9 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
         """
         Consider blocking IP for repeated rate limit violations
         
+        An IP whose requests were rejected more than ip_violation_threshold
+        times within ip_violation_window is blocked for ip_block_duration.
+        
         Args:
             request: FastAPI request
         """
@@ -391,24 +495,22 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
         if not client_ip:
             return
         
-        # Count recent violations for this IP
         current_time = time.time()
-        ip_violations = 0
+        window_start, violations = self.ip_violations.get(client_ip, (current_time, 0))
+        if window_start + self.ip_violation_window <= current_time:
+            window_start, violations = current_time, 0
+        violations += 1
         
-        # Check all client states for this IP
-        for client_id, state in self.client_states.items():
-            if client_id.startswith(f"ip:{client_ip}"):
-                # Count violations in last hour
-                violations_window = current_time - 3600  # 1 hour
-                violations = sum(1 for req_time in state.requests if req_time > violations_window)
-                if violations > 50:  # Threshold for blocking
-                    ip_violations += 1
+        self.ip_violations[client_ip] = (window_start, violations)
+        self.ip_violations.move_to_end(client_ip)
+        if len(self.ip_violations) > self.max_clients:
+            self.ip_violations.popitem(last=False)
         
         # Block IP if too many violations
-        if ip_violations >= 3:  # Block after 3 violation patterns
-            block_duration = 3600  # Block for 1 hour
-            self.blocked_ips[client_ip] = current_time + block_duration
-            logger.warning(f"Blocked IP {client_ip} for {block_duration} seconds due to rate limit violations")
+        if violations > self.ip_violation_threshold:
+            self.blocked_ips[client_ip] = current_time + self.ip_block_duration
+            del self.ip_violations[client_ip]
+            logger.warning(f"Blocked IP {client_ip} for {self.ip_block_duration} seconds due to rate limit violations")
     
     async def _cleanup_if_needed(self):
         """
@@ -421,15 +523,23 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
         
         self.last_cleanup = current_time
         
-        # Clean up old client states
-        inactive_threshold = current_time - 7200  # 2 hours
-        inactive_clients = [
-            client_id for client_id, state in self.client_states.items()
-            if state.last_request < inactive_threshold
-        ]
-        
-        for client_id in inactive_clients:
-            del self.client_states[client_id]
+        # Examine a bounded batch of client states from the least recently
+        # used end: idle ones are dropped and live ones move to the back, so
+        # the next cleanup carries on past them and no cleanup scans the whole table
+        idle_clients = 0
+        for _ in range(min(self.cleanup_batch_size, len(self.client_states))):
+            key, state = next(iter(self.client_states.items()))
+            if state.is_idle(current_time):
+                del self.client_states[key]
+                idle_clients += 1
+            else:
+                self.client_states.move_to_end(key)
+        
+        while self.ip_violations:
+            ip, (window_start, _) = next(iter(self.ip_violations.items()))
+            if window_start + self.ip_violation_window > current_time:
+                break
+            del self.ip_violations[ip]
         
         # Clean up expired IP blocks
         expired_blocks = [
@@ -440,7 +550,7 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
         for ip in expired_blocks:
             del self.blocked_ips[ip]
         
-        logger.info(f"Rate limit cleanup: removed {len(inactive_clients)} inactive clients, "
+        logger.info(f"Rate limit cleanup: removed {idle_clients} idle client states, "
                    f"{len(expired_blocks)} expired IP blocks")
     
     def get_statistics(self) -> Dict[str, any]:
@@ -459,6 +569,8 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
                 self.stats["blocked_requests"] / max(1, self.stats["total_requests"])
             ) * 100,
             "active_clients": len(self.client_states),
+            "max_clients": self.max_clients,
+            "evicted_clients": self.stats["evicted_clients"],
             "blocked_ips": len(self.blocked_ips),
             "rate_limited_ips_count": len(self.stats["rate_limited_ips"]),
             "rate_limited_users_count": len(self.stats["rate_limited_users"]),
@@ -475,10 +587,11 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
         Returns:
             True if client was found and reset, False otherwise
         """
-        if client_id in self.client_states:
-            del self.client_states[client_id]
-            return True
-        return False
+        prefix = f"{client_id}|"
+        keys = [key for key in self.client_states if key.startswith(prefix)]
+        for key in keys:
+            del self.client_states[key]
+        return bool(keys)
     
     def block_ip(self, ip_address: str, duration: int = 3600):
         """
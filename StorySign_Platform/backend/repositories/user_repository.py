@@ -10,6 +10,7 @@ from sqlalchemy import select, update, delete, and_, or_
 from sqlalchemy.orm import selectinload
 
 from models.user import User, UserProfile, UserSession
+from core.principal_cache import invalidate_user_principal
 from .base_repository import BaseRepository
 
 
@@ -144,6 +145,8 @@ class UserRepository(BaseRepository[User]):
             return None
             
         await self.session.commit()
+        # Role, password or activation may have changed
+        await invalidate_user_principal(user_id)
         return await self.get_by_id_with_profile(user_id)
     
     async def update_user_profile(self, user_id: str, profile_data: Dict[str, Any]) -> Optional[UserProfile]:
@@ -192,6 +195,7 @@ class UserRepository(BaseRepository[User]):
         )
         result = await self.session.execute(stmt)
         await self.session.commit()
+        await invalidate_user_principal(user_id)
         
         return result.rowcount > 0
     
@@ -209,6 +213,7 @@ class UserRepository(BaseRepository[User]):
         stmt = delete(User).where(User.id == user_id)
         result = await self.session.execute(stmt)
         await self.session.commit()
+        await invalidate_user_principal(user_id)
         
         return result.rowcount > 0
     
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Cache bulk operations benchmark
+Round trips and wall time for 1000-key writes, reads, deletes and increments, per-key loops vs pipelines
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from core.cache_service import CacheService
+from core.local_cache import LocalPipeline, LocalRedis
+
+
+class RoundTripRedis(LocalRedis):
+    """The in-process Redis stand-in with a simulated network round trip per command or pipeline"""
+
+    def __init__(self, rtt: float):
+        super().__init__(max_entries=1_000_000)
+        self.rtt = rtt
+        self.round_trips = 0
+        self._pipelined = False
+
+    def pipeline(self, transaction: bool = False) -> LocalPipeline:
+        return RoundTripPipeline(self)
+
+    async def _round_trip(self):
+        if not self._pipelined:
+            self.round_trips += 1
+            await asyncio.sleep(self.rtt)
+
+    async def get(self, name):
+        await self._round_trip()
+        return await super().get(name)
+
+    async def set(self, name, value, *args, **kwargs):
+        await self._round_trip()
+        return await super().set(name, value, *args, **kwargs)
+
+    async def mget(self, keys):
+        await self._round_trip()
+        return await super().mget(keys)
+
+    async def mset(self, mapping):
+        await self._round_trip()
+        return await super().mset(mapping)
+
+    async def expire(self, name, time, *args, **kwargs):
+        await self._round_trip()
+        return await super().expire(name, time, *args, **kwargs)
+
+    async def delete(self, *names):
+        await self._round_trip()
+        return await super().delete(*names)
+
+    async def incrby(self, name, amount=1):
+        await self._round_trip()
+        return await super().incrby(name, amount)
+
+
+class RoundTripPipeline(LocalPipeline):
+    async def execute(self, raise_on_error: bool = True):
+        client = self._client
+        await client._round_trip()
+        client._pipelined = True
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            client._pipelined = False
+
+
+async def run(keys: int, rtt: float) -> None:
+    cache = CacheService(config={"cache": {"memory_sample_interval": 0, "l1_enabled": False}})
+    backend = RoundTripRedis(rtt)
+    cache._redis_client = backend
+    cache._is_connected = True
+
+    names = [f"progress:{i}" for i in range(keys)]
+    mapping = {name: {"user_id": i, "score": i % 100, "streak": i % 7} for i, name in enumerate(names)}
+
+    async def set_loop():
+        # DatabaseMonitoringService._store_metrics before: one awaited set() per key
+        for name, value in mapping.items():
+            await cache.set(name, value, ttl=300)
+
+    async def mset_then_expire():
+        # The previous set_many: MSET, then one awaited EXPIRE per key
+        await backend.mset({cache._make_key(name): cache._serialize_value(value) for name, value in mapping.items()})
+        for name in mapping:
+            await backend.expire(cache._make_key(name), 300)
+
+    async def get_loop():
+        for name in names:
+            await cache.get(name)
+
+    async def delete_loop():
+        for name in names:
+            await cache.delete(name)
+
+    async def increment_loop():
+        for name in names:
+            await cache.increment(name)
+
+    cases = [
+        ("set() loop (before)", set_loop),
+        ("MSET + EXPIRE loop (before)", mset_then_expire),
+        ("set_many", lambda: cache.set_many(mapping, ttl=300)),
+        ("get() loop", get_loop),
+        ("get_many", lambda: cache.get_many(names)),
+        ("delete() loop", delete_loop),
+        ("delete_many", lambda: cache.delete_many(names)),
+        ("increment() loop", increment_loop),
+        ("increment_many", lambda: cache.increment_many({name: 1 for name in names}, ttl=300)),
+    ]
+
+    print(f"{keys} keys, simulated RTT {rtt * 1000:.1f} ms, bulk_chunk_size {cache.bulk_chunk_size}")
+    print(f"{'operation':<30} {'round trips':>12} {'wall ms':>9}")
+    for label, operation in cases:
+        backend.round_trips = 0
+        start = time.perf_counter()
+        await operation()
+        wall_ms = (time.perf_counter() - start) * 1000
+        print(f"{label:<30} {backend.round_trips:>12} {wall_ms:>9.1f}")
+
+
+def main() -> None:
+    logging.disable(logging.CRITICAL)
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rtt_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+    asyncio.run(run(keys, rtt_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
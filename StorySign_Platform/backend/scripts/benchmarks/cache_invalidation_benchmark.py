@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Cache invalidation benchmark
+Invalidation time and longest event-loop block at 1M keys: KEYS+DEL vs SCAN vs tag sets
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from core.cache_service import CacheService
+from core.local_cache import LocalRedis
+
+
+async def _cache(keys: int, tagged: int) -> CacheService:
+    """A cache on the in-process Redis stand-in holding `keys` keys, `tagged` of them story:* keys in one tag"""
+    cache = CacheService(config={"cache": {"memory_sample_interval": 0, "l1_enabled": False}})
+    backend = LocalRedis(max_bytes=1 << 34, max_entries=keys * 2)
+    cache._redis_client = backend
+    cache._is_connected = True
+
+    value = cache._serialize_value({"title": "story", "sentences": 8})
+    store = backend._store
+    story_keys = []
+    for i in range(tagged):
+        cache_key = cache._make_key(f"story:{i}")
+        store.set(cache_key, value, size=len(value))
+        story_keys.append(cache_key)
+    for i in range(keys - tagged):
+        cache_key = cache._make_key(f"progress:{i}")
+        store.set(cache_key, value, size=len(value))
+    await backend.sadd(cache._tag_key("stories"), *story_keys)
+    return cache
+
+
+async def _measure(operation: Callable[[], Awaitable[int]]) -> Dict[str, Any]:
+    """Run an operation while a ticker records how long the event loop goes without running it"""
+    gaps = []
+    running = True
+
+    async def ticker():
+        last = time.perf_counter()
+        while running:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    deleted = await operation()
+    total = time.perf_counter() - start
+    running = False
+    await task
+
+    gaps.sort()
+    return {
+        "deleted": deleted,
+        "total_ms": total * 1000,
+        "max_block_ms": gaps[-1] * 1000 if gaps else total * 1000,
+        # A single-step operation never lets the ticker run
+        "p99_step_ms": gaps[int(len(gaps) * 0.99)] * 1000 if len(gaps) > 1 else None,
+    }
+
+
+async def run(keys: int, tagged: int) -> None:
+    print(f"{keys} keys, {tagged} story:* keys tagged 'stories', in-process Redis stand-in")
+    print(f"{'operation':<34} {'deleted':>8} {'total ms':>9} {'max block ms':>13} {'p99 step ms':>12}")
+
+    async def keys_and_delete(cache: CacheService, pattern: str) -> int:
+        # The previous clear_pattern: one KEYS over the keyspace, then one DEL
+        backend = cache._backend
+        matched = await backend.keys(cache._make_key(pattern))
+        return await backend.delete(*matched) if matched else 0
+
+    cases = [
+        ("KEYS+DEL story:* (previous)", lambda cache: keys_and_delete(cache, "story:*")),
+        ("SCAN clear_pattern story:*", lambda cache: cache.clear_pattern("story:*")),
+        ("invalidate_tags stories", lambda cache: cache.invalidate_tags("stories")),
+        ("KEYS+DEL * (previous)", lambda cache: keys_and_delete(cache, "*")),
+        ("SCAN clear_pattern *", lambda cache: cache.clear_pattern("*")),
+    ]
+    for label, operation in cases:
+        cache = await _cache(keys, tagged)
+        result = await _measure(lambda: operation(cache))
+        p99 = f"{result['p99_step_ms']:.2f}" if result["p99_step_ms"] is not None else "-"
+        print(
+            f"{label:<34} {result['deleted']:>8} {result['total_ms']:>9.0f} "
+            f"{result['max_block_ms']:>13.1f} {p99:>12}"
+        )
+
+
+def main() -> None:
+    logging.disable(logging.CRITICAL)
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    tagged = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    asyncio.run(run(keys, tagged))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Cache serializer benchmark
+Stored bytes and encode/decode time for cached story lists, progress summaries and analytics
+"""
+
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from core.cache_serializer import LZ4_AVAILABLE, JsonSerializer, MsgPackSerializer
+
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def _story(i: int) -> Dict[str, Any]:
+    return {
+        "id": str(uuid.UUID(int=i)),
+        "title": f"The Curious Fox, part {i}",
+        "difficulty_level": ["beginner", "intermediate", "advanced"][i % 3],
+        "sentences": [
+            {"text": f"The fox looked at sentence {n} and signed it slowly.", "gloss": f"FOX LOOK SENTENCE {n}"}
+            for n in range(8)
+        ],
+        "created_at": NOW - timedelta(days=i),
+        "is_public": True,
+    }
+
+
+def _progress_summary() -> Dict[str, Any]:
+    return {
+        "user_id": str(uuid.UUID(int=7)),
+        "total_sessions": 184,
+        "average_score": Decimal("87.25"),
+        "skill_levels": {f"skill_{n}": {"level": n % 5, "confidence": 0.61 + n / 100} for n in range(20)},
+        "recent_sessions": [
+            {"session_id": str(uuid.UUID(int=n)), "score": 70 + n, "completed_at": NOW - timedelta(hours=n)}
+            for n in range(10)
+        ],
+        "updated_at": NOW,
+    }
+
+
+def _analytics_events(count: int) -> list:
+    return [
+        {
+            "event_type": "gesture_attempt",
+            "user_id": str(uuid.UUID(int=n % 50)),
+            "session_id": str(uuid.UUID(int=n % 7)),
+            "occurred_at": NOW + timedelta(seconds=n),
+            "data": {"sentence_index": n % 8, "confidence": 0.5 + (n % 50) / 100, "passed": n % 3 != 0},
+        }
+        for n in range(count)
+    ]
+
+
+def _json_compatible(value: Any) -> Any:
+    """The JSON envelope cannot store datetimes, Decimals or UUIDs: pre-format them as callers had to"""
+    if isinstance(value, dict):
+        return {key: _json_compatible(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_json_compatible(item) for item in value]
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _time_us(function: Callable[[], Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    payloads = {
+        "small dict": {"count": 3, "ok": True},
+        "story list (20 stories)": [_story(i) for i in range(20)],
+        "progress summary": _progress_summary(),
+        "analytics (200 events)": _analytics_events(200),
+    }
+    serializers = {
+        "json": JsonSerializer(),
+        "msgpack": MsgPackSerializer(compression=None),
+        "msgpack+zlib": MsgPackSerializer(compression="zlib"),
+    }
+    if LZ4_AVAILABLE:
+        serializers["msgpack+lz4"] = MsgPackSerializer(compression="lz4")
+
+    print("bytes stored, encode/decode us per value")
+    print(f"{'payload':<26}" + "".join(f"{name:>24}" for name in serializers))
+    for label, payload in payloads.items():
+        cells = []
+        for name, serializer in serializers.items():
+            value = _json_compatible(payload) if name == "json" else payload
+            stored = serializer.dumps(value)
+            assert serializer.loads(stored) == value
+            encode_us = _time_us(lambda: serializer.dumps(value), iterations)
+            decode_us = _time_us(lambda: serializer.loads(stored), iterations)
+            cells.append(f"{len(stored)}B {encode_us:.1f}/{decode_us:.1f}")
+        print(f"{label:<26}" + "".join(f"{cell:>24}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Latency histogram benchmark
+Per-sample recording overhead, summary and merge cost, and quantile error against exact percentiles
+"""
+
+import random
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from core.latency_histogram import LatencyHistogram
+
+
+def _per_call_ns(function, values) -> float:
+    start = time.perf_counter_ns()
+    for value in values:
+        function(value)
+    return (time.perf_counter_ns() - start) / len(values)
+
+
+def main() -> None:
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(0)
+    # Log-normal around 2ms with a long tail, like handler and send times
+    values = [rng.lognormvariate(0.7, 1.0) for _ in range(samples)]
+
+    # Recording: the histogram against the bounded deque it replaced
+    histogram = LatencyHistogram()
+    samples_deque = deque(maxlen=1000)
+    deque_ns = _per_call_ns(samples_deque.append, values)
+    record_ns = _per_call_ns(histogram.record, values)
+    print(f"{samples} samples")
+    print(f"record:        {record_ns:7.0f} ns/sample (deque.append {deque_ns:.0f} ns)")
+
+    # Reading: one summary, and merging per-queue histograms for a manager-wide one
+    start = time.perf_counter()
+    summary = histogram.summary()
+    print(f"summary:       {(time.perf_counter() - start) * 1e6:7.0f} us over {len(histogram._buckets)} buckets")
+
+    shards = [LatencyHistogram() for _ in range(64)]
+    for i, value in enumerate(values):
+        shards[i % len(shards)].record(value)
+    start = time.perf_counter()
+    LatencyHistogram.merged(shards).summary()
+    print(f"merge 64:      {(time.perf_counter() - start) * 1e6:7.0f} us")
+
+    # The pool used to average by concatenating every connection's last 100 samples
+    connections = [deque(values[i * 100:(i + 1) * 100], maxlen=100) for i in range(min(1000, samples // 100))]
+    start = time.perf_counter()
+    all_latencies = []
+    for connection in connections:
+        all_latencies.extend(connection)
+    sum(all_latencies) / len(all_latencies)
+    print(f"old pool mean: {(time.perf_counter() - start) * 1e6:7.0f} us over {len(connections)} connections")
+
+    # Accuracy against exact percentiles
+    ordered = sorted(values)
+    print(f"{'quantile':>9} {'exact ms':>10} {'histogram':>10} {'error':>7}")
+    for key, q in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99), ("p999_ms", 0.999)):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        print(f"{key[:-3]:>9} {exact:>10.3f} {summary[key]:>10.3f} {abs(summary[key] - exact) / exact:>7.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Message queue batch handler benchmark
+Analytics events written to an in-memory SQLite sink, one INSERT per message vs one per batch
+"""
+
+import asyncio
+import logging
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from core.message_queue import MessageQueue
+
+
+def _sink() -> sqlite3.Connection:
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE events (user_id TEXT, event TEXT, value REAL)")
+    return connection
+
+
+def _row(message):
+    content = message.content
+    return content["user_id"], content["event"], content["value"]
+
+
+async def run(max_batch_size: int, messages: int, workers: int) -> Dict[str, Any]:
+    queue = MessageQueue("bench", max_size=messages * 2, batch_size=1)
+    connection = _sink()
+    done = asyncio.Event()
+
+    def single(message):
+        connection.execute("INSERT INTO events VALUES (?, ?, ?)", _row(message))
+        connection.commit()
+        if queue.stats.messages_processed + 1 == messages:
+            done.set()
+
+    def batched(batch):
+        connection.executemany("INSERT INTO events VALUES (?, ?, ?)", [_row(message) for message in batch])
+        connection.commit()
+        if queue.stats.messages_processed + len(batch) == messages:
+            done.set()
+
+    if max_batch_size > 1:
+        queue.add_batch_handler("analytics_event", batched, max_batch_size=max_batch_size)
+    else:
+        queue.add_handler(single)
+
+    # Queue everything first so the workers run flat out
+    for i in range(messages):
+        await queue.enqueue({"type": "analytics_event", "user_id": f"u{i % 500}", "event": "view", "value": i})
+
+    start = time.perf_counter()
+    await queue.start(processor_count=workers)
+    await asyncio.wait_for(done.wait(), timeout=120)
+    seconds = time.perf_counter() - start
+    stats = queue.get_stats()
+    await queue.stop()
+
+    rows = connection.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+    connection.close()
+    batch_stats = stats.get("batch_handlers", {}).get("analytics_event", {})
+    return {
+        "messages_per_second": messages / seconds,
+        "rows": rows,
+        "avg_batch_size": batch_stats.get("avg_batch_size", 1.0),
+    }
+
+
+def main() -> None:
+    logging.disable(logging.CRITICAL)
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print(f"{messages} analytics events, {workers} workers")
+    print(f"{'handler':<12} {'msgs/s':>10} {'avg batch':>10} {'rows':>8}")
+    for max_batch_size in (1, 10, 100, 500):
+        label = "single" if max_batch_size == 1 else f"batch {max_batch_size}"
+        result = asyncio.run(run(max_batch_size, messages, workers))
+        print(
+            f"{label:<12} {result['messages_per_second']:>10.0f} "
+            f"{result['avg_batch_size']:>10.1f} {result['rows']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
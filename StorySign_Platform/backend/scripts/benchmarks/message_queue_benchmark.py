@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Message queue benchmark
+Enqueue and end-to-end throughput with segment log persistence on and off
+"""
+
+import asyncio
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from core.message_queue import MessageQueue
+
+
+async def run(persistence: bool, messages: int, producers: int) -> Dict[str, Any]:
+    directory = tempfile.mkdtemp(prefix="mq-bench-")
+    queue = MessageQueue(
+        "bench",
+        max_size=messages * 2,
+        batch_size=1,
+        enable_persistence=persistence,
+        persistence_dir=directory
+    )
+
+    handled = 0
+    done = asyncio.Event()
+
+    def handler(message):
+        nonlocal handled
+        handled += 1
+        if handled == messages:
+            done.set()
+
+    queue.add_handler(handler)
+    await queue.start()
+
+    async def produce(producer: int):
+        for i in range(producer, messages, producers):
+            await queue.enqueue({"i": i, "payload": "x" * 100})
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(produce(producer) for producer in range(producers)))
+    enqueue_seconds = time.perf_counter() - start_time
+    await asyncio.wait_for(done.wait(), timeout=120)
+    total_seconds = time.perf_counter() - start_time
+
+    stats = queue.get_stats()
+    await queue.stop()
+    shutil.rmtree(directory, ignore_errors=True)
+
+    persistence_stats = stats.get("persistence", {})
+    return {
+        "enqueue_per_second": messages / enqueue_seconds,
+        "end_to_end_per_second": messages / total_seconds,
+        "records_per_commit": persistence_stats.get("avg_records_per_commit", 0.0),
+        "avg_fsync_ms": persistence_stats.get("avg_fsync_ms", 0.0)
+    }
+
+
+def main(messages: int = 20000, producers: int = 200) -> None:
+    print(f"{messages} messages from {producers} concurrent producers")
+    print(f"{'persistence':<12} {'enqueue/s':>10} {'end-to-end/s':>13} {'records/commit':>15} {'fsync ms':>9}")
+    for persistence in (False, True):
+        result = asyncio.run(run(persistence, messages, producers))
+        print(
+            f"{'on' if persistence else 'off':<12} {result['enqueue_per_second']:>10.0f} "
+            f"{result['end_to_end_per_second']:>13.0f} {result['records_per_commit']:>15} "
+            f"{result['avg_fsync_ms']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Message queue routing simulation
+Queue wait per routing strategy when one queue in a load balancer group has a much slower handler
+"""
+
+import asyncio
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from core.latency_histogram import LatencyHistogram
+from core.message_queue import MessageQueueManager, RoutingStrategy
+
+
+async def run(
+    strategy: RoutingStrategy,
+    work_stealing: bool,
+    handler_ms: List[float],
+    rate: float,
+    seconds: float
+) -> Dict[str, Any]:
+    manager = MessageQueueManager()
+    names = []
+    for i, latency_ms in enumerate(handler_ms):
+        queue = await manager.create_queue(f"worker-{i}", max_size=100_000, batch_size=1)
+
+        async def handler(message, latency_ms=latency_ms):
+            await asyncio.sleep(latency_ms / 1000)
+
+        queue.add_handler(handler)
+        names.append(queue.name)
+    manager.add_load_balancer_group("group", names, strategy, work_stealing)
+
+    # Poisson arrivals, sent in 5ms ticks
+    rng = random.Random(0)
+    tick = 0.005
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    sent = 0
+    next_arrival = 0.0
+    while loop.time() - start < seconds:
+        now = loop.time() - start
+        while next_arrival <= now:
+            await manager.route_message({"type": "work"}, load_balancer_group="group")
+            sent += 1
+            next_arrival += rng.expovariate(rate)
+        await asyncio.sleep(tick)
+
+    queues = [manager.get_queue(name) for name in names]
+    deadline = time.monotonic() + 60
+    while sum(queue.stats.messages_processed for queue in queues) < sent:
+        if time.monotonic() > deadline:
+            raise TimeoutError("backlog did not drain")
+        await asyncio.sleep(0.01)
+
+    wait = LatencyHistogram.merged(queue.enqueue_wait_histogram for queue in queues).summary()
+    handled = [queue.stats.messages_processed for queue in queues]
+    stolen = sum(queue.messages_stolen for queue in queues)
+    await manager.shutdown()
+    return {"wait": wait, "handled": handled, "stolen": stolen}
+
+
+def main() -> None:
+    logging.disable(logging.CRITICAL)
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    # Three fast queues and one 10x slower: about 3100 msgs/s of capacity
+    handler_ms = [1.0, 1.0, 1.0, 10.0]
+    rate = 1500.0
+    print(f"{rate:.0f} msgs/s for {seconds:.0f}s, handler latency per queue {handler_ms} ms")
+    print(f"{'strategy':<22} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'stolen':>7}  handled per queue")
+    for strategy, work_stealing in (
+        (RoutingStrategy.ROUND_ROBIN, False),
+        (RoutingStrategy.LEAST_DEPTH, False),
+        (RoutingStrategy.EWMA, False),
+        (RoutingStrategy.ROUND_ROBIN, True),
+    ):
+        label = strategy.value + (" + stealing" if work_stealing else "")
+        result = asyncio.run(run(strategy, work_stealing, handler_ms, rate, seconds))
+        wait = result["wait"]
+        print(
+            f"{label:<22} {wait['p50_ms']:>8.2f} {wait['p99_ms']:>8.2f} {wait['max_ms']:>8.1f} "
+            f"{result['stolen']:>7}  {result['handled']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Password hashing benchmark
+Event-loop lag during a 200-login burst, bcrypt on the loop vs on the bounded hashing pool
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import bcrypt
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from core.password_hasher import PasswordHasher, PasswordHashingBusyError
+
+
+async def run(logins: int, rounds: int, max_pending: Optional[int]) -> Dict[str, Any]:
+    """max_pending None verifies on the event loop, as AuthService did before"""
+    password = "correct horse battery staple"
+    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+    hasher = PasswordHasher(rounds=rounds, max_pending=max_pending) if max_pending else None
+
+    # A 5ms ticker stands in for the WebSocket sessions sharing the loop
+    lags = []
+    running = True
+
+    async def ticker():
+        interval = 0.005
+        expected = time.perf_counter() + interval
+        while running:
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            lags.append(max(0.0, now - expected) * 1000)
+            expected = now + interval
+
+    async def login():
+        if hasher is None:
+            return bcrypt.checkpw(password.encode(), hashed.encode())
+        try:
+            return await hasher.verify(password, hashed)
+        except PasswordHashingBusyError:
+            return None
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    wall = time.perf_counter() - start
+    await asyncio.sleep(0.05)
+    running = False
+    await task
+    if hasher:
+        hasher.shutdown()
+
+    lags.sort()
+    return {
+        "wall_s": wall,
+        "verified": sum(1 for result in results if result),
+        "rejected": sum(1 for result in results if result is None),
+        "p99_lag_ms": lags[int(len(lags) * 0.99) - 1] if len(lags) > 1 else lags[-1],
+        "max_lag_ms": lags[-1],
+    }
+
+
+def main() -> None:
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print(f"{logins} concurrent logins, bcrypt cost {rounds}, {os.cpu_count()} CPUs, 4 hashing threads")
+    print(f"{'verification':<20} {'wall s':>7} {'verified':>9} {'rejected':>9} {'p99 lag ms':>11} {'max lag ms':>11}")
+    for label, max_pending in (("on the event loop", None), ("pool, limit 256", 256), ("pool, limit 64", 64)):
+        result = asyncio.run(run(logins, rounds, max_pending))
+        print(
+            f"{label:<20} {result['wall_s']:>7.2f} {result['verified']:>9} {result['rejected']:>9} "
+            f"{result['p99_lag_ms']:>11.1f} {result['max_lag_ms']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Rate limiter benchmark
+Per-request cost and memory of the GCRA rate limiter with 100k distinct clients
+"""
+
+import asyncio
+import importlib.util
+import logging
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+# The middleware package __init__ pulls in auth_middleware, so load the module on its own
+_spec = importlib.util.spec_from_file_location(
+    "rate_limiting", Path(__file__).parent.parent.parent / "middleware" / "rate_limiting.py"
+)
+rate_limiting = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(rate_limiting)
+
+
+async def run(clients: int, requests_per_client: int) -> None:
+    limiter = rate_limiting.RateLimitingMiddleware(None, cleanup_interval=0)
+    limit = limiter.default_rate_limit
+    client_ids = [f"ip:10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(clients)]
+
+    # State memory: one request from every client
+    tracemalloc.start()
+    for client_id in client_ids:
+        await limiter._check_rate_limit(client_id, limit)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    allowed = 0
+    for _ in range(requests_per_client):
+        for client_id in client_ids:
+            ok, _ = await limiter._check_rate_limit(client_id, limit)
+            allowed += ok
+            await limiter._get_remaining_requests(client_id, limit)
+    elapsed = time.perf_counter() - start
+
+    total = clients * requests_per_client
+    print(f"{clients} clients x {requests_per_client} requests, limit {limit.requests}/{limit.window}s burst {limit.burst}")
+    print(f"check + remaining: {elapsed / total * 1e6:.2f}us per request, {allowed} allowed, {total - allowed} rejected")
+    print(f"state: {memory / 1e6:.1f}MB, {memory / clients:.0f}B per client")
+
+    # Cleanup cost once every client has gone idle
+    idle_at = time.time() + 2 * limit.window
+    rate_limiting.time = SimpleNamespace(time=lambda: idle_at)
+    start = time.perf_counter()
+    while limiter.client_states:
+        limiter.last_cleanup = 0
+        await limiter._cleanup_if_needed()
+    print(f"cleanup: {(time.perf_counter() - start) * 1000:.1f}ms for {clients} idle clients, "
+          f"in batches of {limiter.cleanup_batch_size}")
+
+
+def main() -> None:
+    logging.disable(logging.CRITICAL)
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    asyncio.run(run(clients, requests_per_client=25))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Session backplane benchmark
+Latency from a state change on one worker to its delta reaching a client on another
+"""
+
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from api.collaborative_websocket import CollaborativeConnectionManager
+from core.session_backplane import InProcessBackplane, InProcessBus, create_session_backplane
+
+
+class FakeWebSocket:
+    """Drops what it is sent; a watched one records when each session delta version arrives"""
+
+    def __init__(self, watched: bool = False):
+        self.scope = {"subprotocols": []}
+        self.query_params = {}
+        self.watched = watched
+        self.arrivals = {}
+        self.arrived = asyncio.Event()
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, payload):
+        if not self.watched:
+            return
+        message = json.loads(payload)
+        if message["type"] == "session_delta":
+            self.arrivals[message["version"]] = time.perf_counter()
+            self.arrived.set()
+
+    async def send_bytes(self, payload):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run(workers: int, clients_per_worker: int, changes: int, backend: str) -> None:
+    bus = InProcessBus()
+    managers = []
+    for _ in range(workers):
+        # Room for the burst below, which no client drains until it ends
+        manager = CollaborativeConnectionManager(max_outbound_queue=changes * workers + 16)
+        backplane = InProcessBackplane(bus) if backend == "local" else create_session_backplane(backend)
+        await manager.set_backplane(backplane)
+        managers.append(manager)
+
+    remote_clients = []
+    for manager in managers:
+        for i in range(clients_per_worker):
+            websocket = FakeWebSocket(watched=manager is managers[-1])
+            await manager.connect_to_session(websocket, "bench", f"{id(manager)}-{i}", "bench")
+            # A real accept yields, letting writers drain earlier joins
+            await asyncio.sleep(0)
+            if websocket.watched:
+                remote_clients.append(websocket)
+    await asyncio.sleep(0.2)
+    watched = remote_clients[0]
+
+    # One change at a time: publish-to-delivery latency
+    latencies = []
+    for i in range(changes):
+        watched.arrived.clear()
+        sent_at = time.perf_counter()
+        version = await managers[0].apply_state_ops("bench", [{"op": "set", "path": ["current_sentence"], "value": i}])
+        while version not in watched.arrivals:
+            await asyncio.wait_for(watched.arrived.wait(), timeout=5)
+            watched.arrived.clear()
+        latencies.append((watched.arrivals[version] - sent_at) * 1000)
+
+    # A burst from every worker at once: sustained throughput
+    start = time.perf_counter()
+    versions = await asyncio.gather(*(
+        manager.apply_state_ops("bench", [{"op": "set", "path": ["practice_data", str(i)], "value": i}])
+        for i in range(changes)
+        for manager in managers
+    ))
+    last = max(versions)
+    deadline = time.perf_counter() + 60
+    while any(last not in client.arrivals for client in remote_clients):
+        if time.perf_counter() > deadline:
+            raise TimeoutError("burst was not delivered to every client")
+        await asyncio.sleep(0.001)
+    burst_seconds = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{workers} workers x {clients_per_worker} clients, {backend} backplane")
+    print(f"cross-worker delta latency: p50 {statistics.median(latencies):.3f}ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.3f}ms, max {latencies[-1]:.3f}ms")
+    # Every change goes to every client in the session, on every worker
+    frames = len(versions) * workers * clients_per_worker
+    print(f"burst: {len(versions)} changes from all workers in {burst_seconds * 1000:.1f}ms "
+          f"({len(versions) / burst_seconds:.0f} changes/s, {frames / burst_seconds:.0f} client frames/s)")
+    states = {(m.session_states["bench"].epoch, m.session_states["bench"].version) for m in managers}
+    print(f"workers agree on (epoch, version): {len(states) == 1}")
+
+    for manager in managers:
+        await manager.set_backplane(None)
+
+
+def main() -> None:
+    logging.disable(logging.CRITICAL)
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    backend = sys.argv[2] if len(sys.argv) > 2 else "local"
+    asyncio.run(run(workers, clients_per_worker=25, changes=1000, backend=backend))
+
+
+if __name__ == "__main__":
+    main()
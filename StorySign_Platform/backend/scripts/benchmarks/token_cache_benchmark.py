@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Verified token cache benchmark
+Per-request access token verification cost for hot and cold tokens, with revocation checks
+"""
+
+import asyncio
+import logging
+import secrets
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import jwt
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from core.cache_service import CacheService
+from core.token_cache import VerifiedTokenCache, token_digest, token_digest_key
+
+
+SECRET = secrets.token_urlsafe(32)
+ALGORITHM = "HS256"
+
+
+def _tokens(count: int) -> List[str]:
+    now = time.time()
+    return [
+        jwt.encode(
+            {
+                "sub": f"user-{i}", "email": f"user{i}@example.com", "role": "learner", "type": "access",
+                "iat": round(now, 6), "exp": now + 900, "jti": secrets.token_urlsafe(16)
+            },
+            SECRET,
+            algorithm=ALGORITHM
+        )
+        for i in range(count)
+    ]
+
+
+async def _verify(token_cache: VerifiedTokenCache, digest_key: bytes, token: str) -> Optional[Dict[str, Any]]:
+    """The steps of AuthService.verify_access_token"""
+    digest = token_digest(token, digest_key)
+    payload = token_cache.get(digest)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET, algorithms=[ALGORITHM])
+        except jwt.InvalidTokenError:
+            return None
+        if payload.get("type") != "access":
+            return None
+        token_cache.put(digest, payload)
+
+    if await token_cache.is_revoked(digest, payload):
+        return None
+    return payload
+
+
+async def run(tokens: int, repeats: int) -> Dict[str, float]:
+    cache = CacheService(config={"cache": {"memory_sample_interval": 0}})
+    await cache.initialize()
+    token_cache = VerifiedTokenCache()
+    token_cache.revocations._cache_service = cache
+    await token_cache.revocations._load()
+    digest_key = token_digest_key(SECRET, ALGORITHM)
+    issued = _tokens(tokens)
+
+    start = time.perf_counter()
+    for token in issued:
+        jwt.decode(token, SECRET, algorithms=[ALGORITHM])
+    baseline_us = (time.perf_counter() - start) / tokens * 1e6
+
+    # Cold: every token seen for the first time
+    start = time.perf_counter()
+    for token in issued:
+        assert await _verify(token_cache, digest_key, token)
+    cold_us = (time.perf_counter() - start) / tokens * 1e6
+
+    # Hot: a polling client presenting the same tokens again
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for token in issued:
+            assert await _verify(token_cache, digest_key, token)
+    hot_us = (time.perf_counter() - start) / (tokens * repeats) * 1e6
+
+    # Revocation takes effect on the next request, cached or not
+    revoked = issued[0]
+    payload = await _verify(token_cache, digest_key, revoked)
+    await token_cache.revoke_token(token_digest(revoked, digest_key), payload)
+    await token_cache.revoke_user("user-1")
+    assert await _verify(token_cache, digest_key, revoked) is None
+    assert await _verify(token_cache, digest_key, issued[1]) is None
+    token_cache.clear()
+    assert await _verify(token_cache, digest_key, revoked) is None
+
+    await cache.cleanup()
+    return {"baseline_us": baseline_us, "cold_us": cold_us, "hot_us": hot_us}
+
+
+def main() -> None:
+    logging.disable(logging.CRITICAL)
+    tokens = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeats = 10
+    runs = [asyncio.run(run(tokens, repeats)) for _ in range(4)]
+    print(f"PyJWT {ALGORITHM}, {tokens} tokens, median of {len(runs)} runs")
+    for label, key in (
+        ("jwt.decode only", "baseline_us"),
+        ("cold token (miss + fill)", "cold_us"),
+        ("hot token (cache hit)", "hot_us"),
+    ):
+        print(f"{label:<26} {statistics.median(run[key] for run in runs):>7.1f} us/request")
+    print("revoked token and user rejected on the next request, cached and after clear()")
+
+
+if __name__ == "__main__":
+    main()
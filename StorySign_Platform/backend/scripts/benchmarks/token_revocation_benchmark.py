@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Token revocation filter benchmark
+False positive rate, memory and speed of the revocation Bloom filters at 1M revoked tokens
+"""
+
+import random
+import secrets
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from core.token_cache import TokenRevocationList
+
+
+def run(label: str, expected_revocations: int, revocations: int, probes: int, same_expiry: bool) -> None:
+    now = time.time()
+    revocation_list = TokenRevocationList(expected_revocations=expected_revocations)
+    lifetime = revocation_list.max_token_lifetime
+
+    def expiry() -> float:
+        return now + (lifetime * 2 / 3 if same_expiry else random.uniform(1, lifetime))
+
+    token_ids = [(secrets.token_urlsafe(16), expiry()) for _ in range(revocations)]
+    probe_ids = [(secrets.token_urlsafe(16), expiry()) for _ in range(probes)]
+
+    start = time.perf_counter()
+    for token_id, expires_at in token_ids:
+        revocation_list._tokens.add(token_id, expires_at, now)
+    add_us = (time.perf_counter() - start) / revocations * 1e6
+
+    # Revoked tokens must always be found
+    assert all(revocation_list._tokens.contains(t, e, now) for t, e in token_ids[:100000])
+
+    start = time.perf_counter()
+    false_positives = sum(revocation_list._tokens.contains(t, e, now) for t, e in probe_ids)
+    lookup_us = (time.perf_counter() - start) / probes * 1e6
+
+    stats = revocation_list._tokens.get_stats(now)
+    print(
+        f"{label:<36} {stats['memory_bytes'] / 1e6:>9.2f} "
+        f"{add_us:>7.2f} {lookup_us:>8.2f} {false_positives / probes * 100:>8.4f} "
+        f"{stats['estimated_false_positive_rate'] * 100:>8.4f}"
+    )
+
+
+def main(revocations: int = 1_000_000, probes: int = 200_000) -> None:
+    print(f"{revocations} revoked tokens, {probes} probes of unrevoked tokens, target FP rate 0.1%")
+    print(f"{'configuration':<36} {'memory MB':>9} {'add us':>7} {'probe us':>8} {'FP %':>8} {'est FP %':>8}")
+    run("sized for 1M, spread expiries", revocations, revocations, probes, same_expiry=False)
+    run("default 100k, spread expiries", 100_000, revocations, probes, same_expiry=False)
+    run("default 100k, one expiry", 100_000, revocations, probes, same_expiry=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
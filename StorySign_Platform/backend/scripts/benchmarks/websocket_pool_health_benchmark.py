@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+WebSocket pool health check benchmark
+Drives the health wheel over thousands of fake sockets, some of them slow
+"""
+
+import asyncio
+import logging
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from core.websocket_pool import WebSocketConnectionPool
+
+
+class FakeWebSocket:
+    """Accepts every frame after a short delay; slow sockets take seconds"""
+
+    def __init__(self, slow_seconds: float = 0.0):
+        self.scope = {"subprotocols": []}
+        self.query_params = {}
+        self.slow_seconds = slow_seconds
+        self.sent_at = []
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, payload):
+        await asyncio.sleep(self.slow_seconds or random.uniform(0.0005, 0.003))
+        self.sent_at.append(time.monotonic())
+
+    async def send_bytes(self, payload):
+        await self.send_text(payload)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run(connections: int, interval: float, duration: float, slow_every: int) -> None:
+    pool = WebSocketConnectionPool(max_connections=connections)
+    pool.health_check_interval = interval
+
+    sockets = [
+        FakeWebSocket(2.0 if i % slow_every == 0 else 0.0)
+        for i in range(connections)
+    ]
+    for i, websocket in enumerate(sockets):
+        await pool.connect_client(websocket, client_id=f"client_{i}")
+    # Let every per-client queue processor start before measuring
+    await asyncio.sleep(0.5)
+
+    lags = []
+    running = True
+
+    async def probe():
+        # Event-loop lag: how late a 1ms sleep wakes up
+        while running:
+            start = time.monotonic()
+            await asyncio.sleep(0.001)
+            lags.append(time.monotonic() - start - 0.001)
+
+    await pool.start()
+    start_time = time.monotonic()
+    probe_task = asyncio.create_task(probe())
+    await asyncio.sleep(duration)
+    running = False
+    await probe_task
+
+    pings = [sent_at - start_time for websocket in sockets for sent_at in websocket.sent_at]
+    per_window = Counter(int(sent_at * 10) for sent_at in pings)
+    stats = pool.get_pool_stats()
+    await pool.stop()
+
+    lags.sort()
+    print(f"{connections} sockets, 1 in {slow_every} taking 2s, {interval}s interval, {duration}s run")
+    print(f"pings sent: {len(pings)} (expected ~{int(connections * duration / interval)})")
+    print(f"max pings per 100ms: {max(per_window.values(), default=0)}")
+    print(f"event loop lag p99: {lags[int(0.99 * len(lags))] * 1000:.2f}ms, max: {lags[-1] * 1000:.2f}ms")
+    print({key: value for key, value in stats.items() if "health" in key})
+
+
+def main() -> None:
+    logging.disable(logging.CRITICAL)
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    asyncio.run(run(connections, interval=3.0, duration=7.5, slow_every=500))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+WebSocket pool stats benchmark
+Cost of get_pool_stats and of the receive-side counters with 10k connections
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from core.websocket_pool import WebSocketConnectionPool
+
+
+FRAME = '{"type":"gesture","landmarks":[0.1,0.2,0.3],"confidence":0.93}'
+
+
+class FakeWebSocket:
+    """Returns the same text frame on every receive and drops everything sent"""
+
+    def __init__(self):
+        self.scope = {"subprotocols": []}
+        self.query_params = {}
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def receive(self):
+        return {"type": "websocket.receive", "text": FRAME}
+
+    async def send_text(self, payload):
+        pass
+
+    async def send_bytes(self, payload):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run(connections: int, calls: int, receives_per_client: int) -> None:
+    pool = WebSocketConnectionPool(max_connections=connections)
+    client_ids = [
+        await pool.connect_client(FakeWebSocket(), client_id=f"client_{i}")
+        for i in range(connections)
+    ]
+    await asyncio.sleep(0.1)
+
+    start = time.perf_counter()
+    for _ in range(receives_per_client):
+        for client_id in client_ids:
+            await pool.receive_message(client_id)
+    receives = connections * receives_per_client
+    receive_us = (time.perf_counter() - start) / receives * 1e6
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        stats = pool.get_pool_stats()
+    stats_us = (time.perf_counter() - start) / calls * 1e6
+
+    expected_bytes = receives * len(FRAME)
+    print(f"{connections} connections, {receives} frames received")
+    print(f"receive_message: {receive_us:.2f}us per frame")
+    print(f"get_pool_stats: {stats_us:.2f}us per call over {calls} calls")
+    print(f"total_bytes_received: {stats['total_bytes_received']} (expected {expected_bytes})")
+    assert stats["total_bytes_received"] == expected_bytes
+
+    for client_id in client_ids:
+        await pool.disconnect_client(client_id)
+
+
+def main() -> None:
+    logging.disable(logging.CRITICAL)
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    asyncio.run(run(connections, calls=10000, receives_per_client=5))
+
+
+if __name__ == "__main__":
+    main()
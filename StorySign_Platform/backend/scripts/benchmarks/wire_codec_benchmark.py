@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Wire codec benchmark
+Encode CPU and bytes on the wire for the main WebSocket message types
+"""
+
+import base64
+import os
+import sys
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from core.wire_codec import available_codecs, get_codec
+
+
+def sample_messages() -> Dict[str, Dict[str, Any]]:
+    """Representative messages, shaped like the ones main.py and the collaborative API send"""
+    # A 640x480 JPEG frame is typically 20-40 KB; random bytes stand in for it
+    frame_data = "data:image/jpeg;base64," + base64.b64encode(os.urandom(30000)).decode("ascii")
+    landmarks = {"hands": True, "face": True, "pose": False}
+
+    return {
+        "processed_frame": {
+            "type": "processed_frame",
+            "timestamp": datetime.utcnow().isoformat(),
+            "frame_data": frame_data,
+            "metadata": {
+                "client_id": "client_42",
+                "server_frame_number": 1234,
+                "client_frame_number": 1234,
+                "processing_time_ms": 12.5,
+                "total_pipeline_time_ms": 18.25,
+                "landmarks_detected": landmarks,
+                "quality_metrics": {"landmarks_confidence": 0.93, "processing_efficiency": 0.88},
+                "encoding_info": {"quality": 75, "size_bytes": 30000},
+                "success": True,
+                "gesture_detection": {
+                    "is_detecting": True,
+                    "practice_mode": "listening",
+                    "analysis_in_progress": False,
+                    "buffer_size": 24
+                }
+            }
+        },
+        "asl_feedback": {
+            "type": "asl_feedback",
+            "timestamp": datetime.utcnow().isoformat(),
+            "data": {
+                "target_sentence": "The little cat sat on the warm mat.",
+                "feedback": "Good handshape on CAT; keep the movement for SIT shorter.",
+                "confidence_score": 0.82,
+                "suggestions": [
+                    "Hold the final handshape a little longer",
+                    "Keep your dominant hand in the signing space",
+                    "Slow down between signs"
+                ],
+                "analysis_summary": "3 of 4 signs recognised"
+            },
+            "metadata": {"client_id": "client_42", "analysis_success": True}
+        },
+        "session_state": {
+            "type": "session_state",
+            "session_id": "session_7",
+            "your_user_id": "user_1",
+            "epoch": "4f1c2b7e9a8d4e6f8b3c1d2e5f6a7b8c",
+            "version": 57,
+            "state": {
+                "participants": {
+                    f"user_{i}": {
+                        "username": f"learner{i}",
+                        "connected_at": datetime.utcnow().isoformat(),
+                        "status": "connected",
+                        "current_sentence": i % 5,
+                        "performance": {"accuracy": 0.8 + i / 100, "attempts": 10 + i}
+                    }
+                    for i in range(8)
+                },
+                "current_sentence": 3,
+                "session_status": "active",
+                "story_content": {"title": "The Cat", "sentences": [f"Sentence {i}." for i in range(10)]},
+                "practice_data": {},
+                "peer_feedback": {}
+            },
+            "recent_chat": [
+                {"user_id": f"user_{i % 8}", "username": f"learner{i % 8}", "message": "Nice signing!",
+                 "timestamp": datetime.utcnow().isoformat(), "seq": i}
+                for i in range(20)
+            ],
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    }
+
+
+def measure(codec_name: str, message: Dict[str, Any], iterations: int) -> Dict[str, float]:
+    codec = get_codec(codec_name)
+    payload = codec.encode(message)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.encode(message)
+    encode_us = (time.perf_counter() - start) / iterations * 1e6
+
+    raw = payload.encode("utf-8") if isinstance(payload, str) else payload
+    # permessage-deflate is raw DEFLATE; a fresh compressor per message matches no_context_takeover
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    deflated = compressor.compress(raw) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    return {"encode_us": encode_us, "bytes": len(raw), "deflated_bytes": len(deflated)}
+
+
+def main(iterations: int = 2000) -> None:
+    messages = sample_messages()
+    print(f"{'message':<16} {'codec':<8} {'encode us':>10} {'bytes':>8} {'deflated':>9}")
+    for message_type, message in messages.items():
+        for codec_name in available_codecs():
+            result = measure(codec_name, message, iterations)
+            print(
+                f"{message_type:<16} {codec_name:<8} {result['encode_us']:>10.1f} "
+                f"{result['bytes']:>8} {result['deflated_bytes']:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
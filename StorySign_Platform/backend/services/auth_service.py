@@ -4,12 +4,15 @@ Authentication service for user management and security
 
 import secrets
 import hashlib
+import time
 import jwt
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, Tuple
-import bcrypt
 
 from core.base_service import BaseService
+from core.password_hasher import get_password_hasher, PasswordHashingBusyError
+from core.principal_cache import get_token_version
+from core.token_cache import get_token_cache, token_digest, token_digest_key
 from repositories.user_repository import UserRepository, UserSessionRepository
 from models.user import User, UserSession
 from models.integrations import ExternalIntegration
@@ -26,6 +29,12 @@ class AuthService(BaseService):
         self.jwt_algorithm = "HS256"
         self.access_token_expire_minutes = 15
         self.refresh_token_expire_days = 7
+        self.bcrypt_rounds = config.get("bcrypt_rounds", 12) if config else 12
+        self.password_hasher = get_password_hasher(config)
+        # User revocations must outlive every access token this service issues
+        self.token_cache = get_token_cache(self.access_token_expire_minutes * 60)
+        # The token cache is shared, so digests are bound to this service's secret
+        self._token_digest_key = token_digest_key(self.jwt_secret, self.jwt_algorithm)
         
     async def initialize(self) -> None:
         """Initialize authentication service"""
@@ -35,23 +44,24 @@ class AuthService(BaseService):
         """Clean up authentication service"""
         pass
     
-    def hash_password(self, password: str) -> str:
+    async def hash_password(self, password: str) -> str:
         """
-        Hash a password using bcrypt
+        Hash a password using bcrypt on the password hashing pool
         
         Args:
             password: Plain text password
             
         Returns:
             Hashed password
+            
+        Raises:
+            PasswordHashingBusyError: If too many hashes are already queued
         """
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-        return hashed.decode('utf-8')
+        return await self.password_hasher.hash(password, self.bcrypt_rounds)
     
-    def verify_password(self, password: str, hashed_password: str) -> bool:
+    async def verify_password(self, password: str, hashed_password: str) -> bool:
         """
-        Verify a password against its hash
+        Verify a password against its hash on the password hashing pool
         
         Args:
             password: Plain text password
@@ -59,12 +69,27 @@ class AuthService(BaseService):
             
         Returns:
             True if password matches, False otherwise
+            
+        Raises:
+            PasswordHashingBusyError: If too many hashes are already queued
         """
+        return await self.password_hasher.verify(password, hashed_password)
+    
+    async def _rehash_if_needed(self, user_repository: UserRepository, user: User, password: str) -> None:
+        """Re-hash a verified password whose hash uses an old work factor"""
+        if not self.password_hasher.needs_rehash(user.password_hash, self.bcrypt_rounds):
+            return
+        
         try:
-            return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+            password_hash = await self.hash_password(password)
+            await user_repository.update_user(user.id, {"password_hash": password_hash})
+            self.password_hasher.rehashes += 1
+            self.logger.info(f"Password rehashed with {self.bcrypt_rounds} rounds for user: {user.id}")
+        except PasswordHashingBusyError:
+            # Try again on a later login
+            pass
         except Exception as e:
-            self.logger.error(f"Password verification error: {e}")
-            return False
+            self.logger.warning(f"Password rehash failed for user {user.id}: {e}")
     
     def generate_session_token(self) -> str:
         """
@@ -84,13 +109,19 @@ class AuthService(BaseService):
         """
         return secrets.token_urlsafe(32)
     
-    def create_access_token(self, user_id: str, additional_claims: Optional[Dict[str, Any]] = None) -> str:
+    def create_access_token(
+        self,
+        user_id: str,
+        additional_claims: Optional[Dict[str, Any]] = None,
+        token_version: int = 0
+    ) -> str:
         """
         Create a JWT access token
         
         Args:
             user_id: User ID to encode in token
             additional_claims: Additional claims to include
+            token_version: The user's token version (see get_token_version)
             
         Returns:
             JWT access token
@@ -100,8 +131,12 @@ class AuthService(BaseService):
         payload = {
             "sub": user_id,
             "exp": expire,
-            "iat": datetime.utcnow(),
-            "type": "access"
+            # Sub-second, so a user revocation spares tokens issued right after it
+            "iat": round(time.time(), 6),
+            "type": "access",
+            "jti": secrets.token_urlsafe(16),
+            # Tokens issued after a role, password or activation change reload the user
+            "tv": token_version
         }
         
         if additional_claims:
@@ -109,30 +144,63 @@ class AuthService(BaseService):
         
         return jwt.encode(payload, self.jwt_secret, algorithm=self.jwt_algorithm)
     
-    def verify_access_token(self, token: str) -> Optional[Dict[str, Any]]:
+    async def verify_access_token(self, token: str) -> Optional[Dict[str, Any]]:
         """
         Verify and decode a JWT access token
         
+        Recently verified tokens are served from the token cache until
+        their exp; every token is checked against the revocation list.
+        
         Args:
             token: JWT token to verify
             
         Returns:
             Decoded token payload or None if invalid
         """
-        try:
-            payload = jwt.decode(token, self.jwt_secret, algorithms=[self.jwt_algorithm])
+        digest = token_digest(token, self._token_digest_key)
+        payload = self.token_cache.get(digest)
+        if payload is None:
+            try:
+                payload = jwt.decode(token, self.jwt_secret, algorithms=[self.jwt_algorithm])
+            except jwt.ExpiredSignatureError:
+                self.logger.debug("Access token expired")
+                return None
+            except jwt.InvalidTokenError as e:
+                self.logger.debug(f"Invalid access token: {e}")
+                return None
             
             # Check token type
             if payload.get("type") != "access":
                 return None
-                
-            return payload
-        except jwt.ExpiredSignatureError:
-            self.logger.debug("Access token expired")
-            return None
-        except jwt.InvalidTokenError as e:
-            self.logger.debug(f"Invalid access token: {e}")
+            
+            self.token_cache.put(digest, payload)
+        
+        if await self.token_cache.is_revoked(digest, payload):
+            self.logger.debug("Access token revoked")
             return None
+        
+        return payload
+    
+    async def revoke_access_token(self, token: str) -> bool:
+        """
+        Revoke a single access token until it expires
+        
+        Args:
+            token: JWT access token
+            
+        Returns:
+            True if the token was valid and is now revoked
+        """
+        payload = await self.verify_access_token(token)
+        if not payload:
+            return False
+        
+        await self.token_cache.revoke_token(token_digest(token, self._token_digest_key), payload)
+        return True
+    
+    async def revoke_user_tokens(self, user_id: str) -> None:
+        """Revoke every access token issued to a user so far"""
+        await self.token_cache.revoke_user(user_id)
     
     async def register_user(
         self, 
@@ -165,7 +233,7 @@ class AuthService(BaseService):
         self._validate_password(registration_data["password"])
         
         # Hash password
-        password_hash = self.hash_password(registration_data["password"])
+        password_hash = await self.hash_password(registration_data["password"])
         
         # Prepare user data
         user_data = {
@@ -227,9 +295,12 @@ class AuthService(BaseService):
             raise ValueError("Account is deactivated")
         
         # Verify password
-        if not self.verify_password(password, user.password_hash):
+        if not await self.verify_password(password, user.password_hash):
             raise ValueError("Invalid credentials")
         
+        # Upgrade the hash if the configured work factor changed
+        await self._rehash_if_needed(user_repository, user, password)
+        
         # Create session tokens
         session_token = self.generate_session_token()
         refresh_token = self.generate_refresh_token()
@@ -247,7 +318,9 @@ class AuthService(BaseService):
         await session_repository.create_session(user.id, session_data)
         
         # Create access token
-        access_token = self.create_access_token(user.id, {"role": user.role})
+        access_token = self.create_access_token(
+            user.id, {"role": user.role}, await get_token_version(str(user.id))
+        )
         
         self.logger.info(f"User authenticated successfully: {user.id}")
         return user, access_token, refresh_token
@@ -273,7 +346,9 @@ class AuthService(BaseService):
             return None
         
         # Create new access token
-        access_token = self.create_access_token(session.user_id, {"role": session.user.role})
+        access_token = self.create_access_token(
+            session.user_id, {"role": session.user.role}, await get_token_version(str(session.user_id))
+        )
         
         self.logger.debug(f"Access token refreshed for user: {session.user_id}")
         return access_token
@@ -281,28 +356,36 @@ class AuthService(BaseService):
     async def logout_user(
         self,
         session_repository: UserSessionRepository,
-        session_token: str
+        session_token: Optional[str] = None,
+        access_token: Optional[str] = None
     ) -> bool:
         """
-        Logout user by deactivating session
+        Logout user by revoking their access token and deactivating their session
         
         Args:
             session_repository: Session repository instance
-            session_token: Session token to deactivate
+            session_token: Session token to deactivate, if the client has it
+            access_token: JWT access token to revoke, if the client has it
             
         Returns:
-            True if logout successful, False otherwise
+            True if the access token was revoked or the session deactivated
         """
+        # The access token must stop working now, not when it expires
+        revoked = bool(access_token) and await self.revoke_access_token(access_token)
+        
+        if not session_token:
+            return revoked
+        
         session = await session_repository.get_by_session_token(session_token)
         if not session:
-            return False
+            return revoked
         
         success = await session_repository.deactivate_session(session.id)
         
         if success:
             self.logger.info(f"User logged out: {session.user_id}")
         
-        return success
+        return success or revoked
     
     async def logout_all_sessions(
         self,
@@ -320,6 +403,7 @@ class AuthService(BaseService):
             Number of sessions deactivated
         """
         count = await session_repository.deactivate_user_sessions(user_id)
+        await self.revoke_user_tokens(user_id)
         
         self.logger.info(f"All sessions logged out for user {user_id}: {count} sessions")
         return count
@@ -375,14 +459,14 @@ class AuthService(BaseService):
             return False
         
         # Verify current password
-        if not self.verify_password(current_password, user.password_hash):
+        if not await self.verify_password(current_password, user.password_hash):
             raise ValueError("Current password is incorrect")
         
         # Validate new password
         self._validate_password(new_password)
         
         # Hash new password
-        new_password_hash = self.hash_password(new_password)
+        new_password_hash = await self.hash_password(new_password)
         
         # Update user password
         success = await user_repository.update_user(user_id, {"password_hash": new_password_hash})
@@ -390,6 +474,7 @@ class AuthService(BaseService):
         if success:
             # Logout all sessions to force re-authentication
             await session_repository.deactivate_user_sessions(user_id)
+            await self.revoke_user_tokens(user_id)
             self.logger.info(f"Password changed for user: {user_id}")
         
         return success is not None
@@ -480,7 +565,7 @@ class AuthService(BaseService):
             user_data = {
                 "email": email,
                 "username": self._generate_username_from_email(email),
-                "password_hash": self.hash_password(secrets.token_urlsafe(32)),  # Random password
+                "password_hash": await self.hash_password(secrets.token_urlsafe(32)),  # Random password
                 "first_name": user_info.get("given_name") or user_info.get("first_name"),
                 "last_name": user_info.get("family_name") or user_info.get("last_name"),
                 "is_active": True,
@@ -546,7 +631,7 @@ class AuthService(BaseService):
             user_data = {
                 "email": email,
                 "username": self._generate_username_from_email(email),
-                "password_hash": self.hash_password(secrets.token_urlsafe(32)),  # Random password
+                "password_hash": await self.hash_password(secrets.token_urlsafe(32)),  # Random password
                 "first_name": assertion_data.get("firstname") or assertion_data.get("givenname"),
                 "last_name": assertion_data.get("lastname") or assertion_data.get("surname"),
                 "is_active": True,
@@ -620,7 +705,7 @@ class AuthService(BaseService):
             user_data = {
                 "email": email or f"lti_user_{user_id}@example.com",
                 "username": username,
-                "password_hash": self.hash_password(secrets.token_urlsafe(32)),  # Random password
+                "password_hash": await self.hash_password(secrets.token_urlsafe(32)),  # Random password
                 "first_name": lti_params.get("lis_person_name_given"),
                 "last_name": lti_params.get("lis_person_name_family"),
                 "is_active": True,
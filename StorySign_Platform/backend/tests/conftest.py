@@ -0,0 +1,9 @@
+"""
+Shared pytest configuration for backend tests
+"""
+
+import sys
+from pathlib import Path
+
+# Make backend packages (core, api, services, ...) importable from tests
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,80 @@
+"""
+Tests for the cache value serializers and reads of the JSON envelope
+"""
+
+import json
+import random
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from core.cache_serializer import JsonSerializer, MsgPackSerializer, create_serializer
+
+pytest.importorskip("msgpack")
+
+
+def test_msgpack_round_trips_extension_types():
+    serializer = MsgPackSerializer(compression=None)
+    value = {
+        "at": datetime(2024, 5, 1, 12, 30, 15, 250),
+        "on": date(2024, 5, 1),
+        "score": Decimal("87.25"),
+        "id": uuid.UUID(int=7),
+        "nested": [{"n": 1, "ok": True, "none": None}],
+        3: "int keys survive",
+    }
+
+    stored = serializer.dumps(value)
+    assert stored[:2] == b"\x00\x01"
+    assert serializer.loads(stored) == value
+
+    with pytest.raises(TypeError):
+        serializer.dumps(object())
+
+
+def test_compression_applies_above_the_threshold_only():
+    serializer = MsgPackSerializer(compression="zlib", compression_threshold=256)
+    small, large = ["x"] * 10, ["the same sentence, again"] * 100
+
+    assert serializer.dumps(small)[:2] == b"\x00\x01"
+    stored = serializer.dumps(large)
+    assert stored[:2] == b"\x00\x02"
+    assert len(stored) < len(MsgPackSerializer(compression=None).dumps(large))
+    assert serializer.loads(stored) == large
+
+    # Incompressible payloads stay uncompressed
+    noise = random.Random(0).randbytes(512)
+    assert serializer.dumps(noise)[:2] == b"\x00\x01"
+
+
+def test_every_serializer_reads_the_json_envelope_and_binary():
+    legacy = [
+        (json.dumps({"type": "str", "value": "hi"}), "hi"),
+        (json.dumps({"type": "int", "value": 3}), 3),
+        (json.dumps({"type": "json", "value": {"a": [1, 2]}}), {"a": [1, 2]}),
+        # INCR counters and plain strings written outside the envelope
+        (b"42", 42),
+        ("not json", "not json"),
+    ]
+    binary = MsgPackSerializer().dumps({"a": 1})
+
+    for serializer in (JsonSerializer(), MsgPackSerializer(), create_serializer()):
+        for stored, expected in legacy:
+            assert serializer.loads(stored) == expected
+        assert serializer.loads(binary) == {"a": 1}
+
+    assert JsonSerializer().dumps(1.5) == json.dumps({"type": "float", "value": 1.5})
+
+
+def test_create_serializer_picks_by_name():
+    assert create_serializer().name == "msgpack"
+    assert create_serializer("json").name == "json"
+    # lz4 falls back to zlib when it is not installed
+    assert create_serializer("msgpack", compression="lz4").compression in ("lz4", "zlib")
+
+    with pytest.raises(ValueError):
+        create_serializer("pickle")
+    with pytest.raises(ValueError):
+        create_serializer("msgpack", compression="brotli")
@@ -0,0 +1,328 @@
+"""
+Tests for CacheService's L1 cache, tags, bulk operations, per-prefix stats and cache_result
+"""
+
+import asyncio
+import random
+
+from core import service_container
+from core.cache_service import CacheService, cache_result
+from core.local_cache import LocalPipeline, LocalRedis
+
+
+async def _redis_backed_cache(**cache_config) -> CacheService:
+    cache = CacheService(config={"cache": {"memory_sample_interval": 0, **cache_config}})
+    # LocalRedis stands in for a Redis server, with L1 in front as it would be for Redis
+    cache._redis_client = LocalRedis()
+    cache._is_connected = True
+    cache._l1_active = True
+    return cache
+
+
+def test_l1_fill_does_not_outlive_redis_ttl():
+    async def run():
+        cache = await _redis_backed_cache(l1_ttl=30)
+        backend = cache._redis_client
+
+        # Written by another worker with a TTL shorter than l1_ttl
+        for key in ("single", "many"):
+            await backend.set(cache._make_key(key), cache._serialize_value(key), ex=1)
+
+        assert await cache.get("single") == "single"
+        assert await cache.get_many(["many"]) == {"many": "many"}
+        for key in ("single", "many"):
+            assert 0 < cache._l1.ttl(cache._make_key(key)) <= 1
+
+        # Natural expiry publishes no invalidation, so only the capped TTL evicts L1
+        await asyncio.sleep(1.1)
+        assert await cache.get("single") is None
+        assert await cache.get_many(["many"]) == {}
+
+    asyncio.run(run())
+
+
+def test_l1_fill_uses_l1_ttl_for_keys_without_expiry():
+    async def run():
+        cache = await _redis_backed_cache(l1_ttl=30)
+        await cache._redis_client.set(cache._make_key("forever"), cache._serialize_value(1))
+
+        assert await cache.get("forever") == 1
+        assert 29 < cache._l1.ttl(cache._make_key("forever")) <= 30
+
+    asyncio.run(run())
+
+
+class _SlowReplyRedis(LocalRedis):
+    """LocalRedis whose pipelined reads reply slowly, after reading the store, and whose deletes are slow"""
+
+    def pipeline(self, transaction: bool = False) -> LocalPipeline:
+        return _SlowReplyPipeline(self)
+
+    async def delete(self, *names: str) -> int:
+        await asyncio.sleep(0.02)
+        return await super().delete(*names)
+
+
+class _SlowReplyPipeline(LocalPipeline):
+    async def execute(self, raise_on_error: bool = True):
+        reads = any(name == "get" for name, _, _ in self._commands)
+        results = await super().execute(raise_on_error)
+        if reads:
+            await asyncio.sleep(0.05)
+        return results
+
+
+def test_l1_fill_does_not_overwrite_a_concurrent_set():
+    async def run():
+        cache = await _redis_backed_cache()
+        cache._redis_client = _SlowReplyRedis()
+        await cache._redis_client.set(cache._make_key("k"), cache._serialize_value("old"))
+
+        # The read sees "old", then the set completes before its reply arrives
+        read = asyncio.create_task(cache.get("k"))
+        await asyncio.sleep(0.01)
+        assert await cache.set("k", "new")
+        assert await read == "old"
+
+        assert await cache.get("k") == "new"
+
+    asyncio.run(run())
+
+
+def test_l1_fill_does_not_restore_a_concurrent_delete():
+    async def run():
+        cache = await _redis_backed_cache()
+        cache._redis_client = _SlowReplyRedis()
+        await cache._redis_client.set(cache._make_key("k"), cache._serialize_value("old"))
+
+        # The read starts during the delete and sees "old"
+        delete = asyncio.create_task(cache.delete("k"))
+        await asyncio.sleep(0.01)
+        assert await cache.get("k") == "old"
+        assert await delete
+
+        assert await cache.get("k") is None
+
+    asyncio.run(run())
+
+
+class _CountingBackend:
+    """Slow data source that counts how often it is called"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return {"version": self.calls}
+
+
+async def _expired_key(cache: CacheService, backend: _CountingBackend, stale_ttl: int) -> None:
+    await cache.get_or_compute("hot", backend, ttl=1, stale_ttl=stale_ttl, early_expiration=0)
+    await asyncio.sleep(1.05)
+
+
+def test_get_or_compute_coalesces_concurrent_misses():
+    async def run():
+        cache = CacheService(config={"cache": {"memory_sample_interval": 0}})
+        await cache.initialize()
+        backend = _CountingBackend()
+        await _expired_key(cache, backend, stale_ttl=0)
+
+        results = await asyncio.gather(*[
+            cache.get_or_compute("hot", backend, ttl=1, early_expiration=0) for _ in range(500)
+        ])
+
+        assert backend.calls == 2
+        assert {result["version"] for result in results} == {2}
+        assert cache.get_stats()["coalesced_waits"] == 499
+
+    asyncio.run(run())
+
+
+def test_get_or_compute_serves_stale_while_one_caller_refreshes():
+    async def run():
+        cache = CacheService(config={"cache": {"memory_sample_interval": 0}})
+        await cache.initialize()
+        backend = _CountingBackend()
+        await _expired_key(cache, backend, stale_ttl=30)
+
+        results = await asyncio.gather(*[
+            cache.get_or_compute("hot", backend, ttl=1, stale_ttl=30, early_expiration=0)
+            for _ in range(500)
+        ])
+        # Every caller got the stale value without waiting on the refresh
+        assert {result["version"] for result in results} == {1}
+
+        await asyncio.sleep(0.1)
+        assert backend.calls == 2
+        assert (await cache.get_or_compute("hot", backend, ttl=1, stale_ttl=30))["version"] == 2
+        assert cache.get_stats()["stale_served"] == 500
+
+    asyncio.run(run())
+
+
+def test_cache_result_coalesces_concurrent_calls(monkeypatch):
+    container = service_container.ServiceContainer()
+    container.register_service(CacheService, config={"cache": {"memory_sample_interval": 0}})
+    monkeypatch.setattr(service_container, "_service_container", container)
+    calls = []
+
+    @cache_result("lesson:{0}", ttl=60)
+    async def load_lesson(lesson_id):
+        """Load a lesson"""
+        calls.append(lesson_id)
+        await asyncio.sleep(0.05)
+        return {"id": lesson_id}
+
+    async def run():
+        results = await asyncio.gather(*[load_lesson(7) for _ in range(500)])
+        assert results == [{"id": 7}] * 500
+        assert await load_lesson(7) == {"id": 7}
+        assert await load_lesson(8) == {"id": 8}
+        await container.shutdown_all_services()
+
+    asyncio.run(run())
+    assert calls == [7, 8]
+    assert load_lesson.__name__ == "load_lesson"
+    assert load_lesson.__doc__ == "Load a lesson"
+
+
+def test_cache_result_calls_through_without_a_cache_service(monkeypatch):
+    monkeypatch.setattr(service_container, "_service_container", service_container.ServiceContainer())
+
+    @cache_result("lesson:{0}")
+    async def load_lesson(lesson_id):
+        return {"id": lesson_id}
+
+    assert asyncio.run(load_lesson(3)) == {"id": 3}
+
+
+def test_conditional_set_tags_only_what_it_wrote():
+    async def run():
+        cache = await _redis_backed_cache()
+        assert await cache.set("lesson:1", "first", tags=["lessons"])
+        assert not await cache.set("lesson:1", "second", nx=True, tags=["drafts"])
+        assert await cache.set("lesson:2", "new", nx=True, tags=["drafts"])
+
+        assert await cache.invalidate_tags("drafts") == 1
+        assert await cache.get("lesson:1") == "first"
+        assert await cache.get("lesson:2") is None
+        assert await cache.invalidate_tags("lessons") == 1
+
+    asyncio.run(run())
+
+
+def test_invalidate_tags_survives_a_failed_cleanup():
+    async def run():
+        cache = await _redis_backed_cache()
+        await cache.set("lesson:1", "first", tags=["lessons"])
+
+        async def unlink_fails(*names):
+            raise ConnectionError("connection reset")
+
+        unlink = cache._redis_client.unlink
+        cache._redis_client.unlink = lambda *names: (
+            unlink_fails(*names) if names[0].startswith(cache._tag_key("lessons")) else unlink(*names)
+        )
+        assert await cache.invalidate_tags("lessons") == 1
+        assert await cache.get("lesson:1") is None
+
+    asyncio.run(run())
+
+
+def test_clear_pattern_scans_in_batches_and_drops_l1():
+    async def run():
+        cache = await _redis_backed_cache(scan_batch_size=2, pipeline_batches=2)
+        for i in range(9):
+            await cache.set(f"story:{i}", i)
+        await cache.set("progress:1", 1)
+        assert await cache.get("story:0") == 0
+        assert cache._l1.get(cache._make_key("story:0")) is not None
+
+        assert await cache.clear_pattern("story:*") == 9
+        assert cache._l1.get(cache._make_key("story:0")) is None
+        assert [await cache.get(f"story:{i}") for i in range(9)] == [None] * 9
+        assert await cache.get("progress:1") == 1
+
+    asyncio.run(run())
+
+
+def test_bulk_operations_chunk_and_report_per_key_failures():
+    async def run():
+        cache = await _redis_backed_cache(bulk_chunk_size=3)
+        backend = cache._redis_client
+
+        mapping = {f"k{i}": i for i in range(7)}
+        mapping["bad"] = object()
+        result = await cache.set_many(mapping, ttl=60, ttls={"k0": 5})
+        assert not result and set(result.errors) == {"bad"}
+        assert len(result.results) == 7 and result.round_trips == 3
+        assert 0 < await backend.pttl(cache._make_key("k0")) <= 5000
+        assert 5000 < await backend.pttl(cache._make_key("k1")) <= 60000
+
+        assert await cache.get_many([f"k{i}" for i in range(8)]) == {f"k{i}": i for i in range(7)}
+
+        # A failing command fails its own key only: k1 holds a serialized value
+        await backend.set(cache._make_key("visits"), "5", ex=120)
+        counters = await cache.increment_many({"hits": 2, "k1": 1, "visits": 1}, ttl=30)
+        assert counters.results == {"hits": 2, "visits": 6} and set(counters.errors) == {"k1"}
+        assert 0 < await backend.pttl(cache._make_key("hits")) <= 30000
+        # Running counters keep their window
+        assert await backend.pttl(cache._make_key("visits")) > 30000
+
+        deleted = await cache.delete_many(["k2", "k3", "missing"])
+        assert deleted and deleted.results == {"k2": True, "k3": True, "missing": False}
+        assert await cache.get_many(["k2", "k3", "k4"]) == {"k4": 4}
+
+    asyncio.run(run())
+
+
+def test_prefix_stats_count_traffic_per_keyspace():
+    async def run():
+        cache = await _redis_backed_cache(max_tracked_prefixes=3, l1_max_entries=2)
+        await cache.set("story:1", "once upon a time")
+        await cache.set("story:2", "the end")
+        assert await cache.get("story:1") == "once upon a time"
+        assert await cache.get("progress:1") is None
+        await cache.delete("story:2")
+        for i in range(3):
+            # Fills L1 past its two entries
+            await cache.set(f"session:{i}", i)
+            await cache.get(f"session:{i}")
+        # Prefixes past max_tracked_prefixes share one row
+        await cache.get("analytics:1")
+        await cache.get("lesson:1")
+        return cache.get_prefix_stats()
+
+    stats = asyncio.run(run())
+    story, progress, other = (stats["prefixes"][name] for name in ("story", "progress", "__other__"))
+    assert (story["hits"], story["misses"], story["writes"], story["deletes"]) == (1, 0, 2, 1)
+    assert story["bytes_read"] > 0 and story["bytes_written"] > story["bytes_read"]
+    assert story["latency"]["count"] > 0
+    assert (progress["hits"], progress["misses"]) == (0, 1)
+    assert set(stats["prefixes"]) == {"story", "progress", "session", "__other__"}
+    assert stats["prefixes"]["session"]["l1_evictions"] >= 1
+    assert other["misses"] == 2
+
+
+def test_memory_sample_estimates_our_keyspaces_only():
+    async def run():
+        random.seed(0)
+        cache = await _redis_backed_cache()
+        backend = cache._redis_client
+        await cache.set_many({f"story:{i}": "x" * 500 for i in range(300)})
+        await cache.set_many({f"progress:{i}": i for i in range(100)})
+        # Another application's keys in the same database
+        for i in range(100):
+            await backend.set(f"other-app:{i}", "y")
+        return await cache.sample_memory_usage(sample_size=400)
+
+    stats = asyncio.run(run())
+    story = stats["prefixes"]["story"]["memory"]
+    progress = stats["prefixes"]["progress"]["memory"]
+    assert 200 < story["estimated_keys"] < 400
+    assert 50 < progress["estimated_keys"] < 150
+    assert story["average_key_bytes"] > 500 > progress["average_key_bytes"]
+    assert 300 < stats["memory_sample"]["total_keys"] < 500
@@ -0,0 +1,286 @@
+"""
+Tests for CollaborativeConnectionManager outbound queues, delta resync, chat history and cross-worker session state
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from core.session_backplane import InProcessBackplane, InProcessBus
+
+collaborative_websocket = pytest.importorskip("api.collaborative_websocket")
+
+CollaborativeConnectionManager = collaborative_websocket.CollaborativeConnectionManager
+EnqueueResult = collaborative_websocket.EnqueueResult
+SessionState = collaborative_websocket.SessionState
+
+
+class FakeWebSocket:
+    """Records sent messages; a stalled socket never completes a send"""
+
+    def __init__(self, stalled: bool = False):
+        self.scope = {"subprotocols": []}
+        self.query_params = {}
+        self.stalled = stalled
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, payload):
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(json.loads(payload))
+
+    async def send_bytes(self, payload):
+        await self.send_text(payload)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+def _queued_types(manager, websocket):
+    return [json.loads(payload)["type"] for payload, _, _ in manager.outbound[websocket].queue]
+
+
+async def _connect(manager, websocket, user_id="u1"):
+    await manager.connect_to_session(websocket, "s", user_id, user_id)
+    # Let the writer take the initial session_state off the queue
+    await asyncio.sleep(0)
+
+
+def test_drop_oldest_never_drops_state_frames():
+    async def run():
+        manager = CollaborativeConnectionManager(max_outbound_queue=3)
+        stalled = FakeWebSocket(stalled=True)
+        await _connect(manager, stalled)
+
+        await manager.send_state(stalled, "s", None, None, {"type": "session_sync"})
+        for i in range(5):
+            await manager.broadcast_to_session("s", {"type": "progress", "n": i})
+        assert _queued_types(manager, stalled) == ["session_sync", "progress", "progress"]
+        assert manager.outbound[stalled].messages_dropped == 3
+
+        # Once only state frames are left, the next one disconnects instead of dropping
+        for _ in range(2):
+            await manager.send_state(stalled, "s", None, None, {"type": "session_sync"})
+        assert _queued_types(manager, stalled) == ["session_sync"] * 3
+        await manager.send_state(stalled, "s", None, None, {"type": "session_sync"})
+
+        assert stalled.close_code == 1013
+        assert manager.slow_consumer_disconnects == 1
+        assert manager.get_session_participants("s") == []
+
+    asyncio.run(run())
+
+
+def test_drop_newest_makes_room_for_a_state_frame():
+    async def run():
+        manager = CollaborativeConnectionManager(
+            max_outbound_queue=2, slow_consumer_policy=CollaborativeConnectionManager.POLICY_DROP_NEWEST
+        )
+        stalled = FakeWebSocket(stalled=True)
+        await _connect(manager, stalled)
+
+        for i in range(3):
+            await manager.broadcast_to_session("s", {"type": "progress", "n": i})
+        await manager.send_state(stalled, "s", None, None, {"type": "session_sync"})
+
+        assert _queued_types(manager, stalled) == ["progress", "session_sync"]
+        assert manager.outbound[stalled].messages_dropped == 2
+        assert manager.slow_consumer_disconnects == 0
+
+    asyncio.run(run())
+
+
+def test_closed_connections_are_not_counted_as_slow():
+    async def run():
+        # Room for the delta and participant_joined the first client gets when the second joins
+        manager = CollaborativeConnectionManager(
+            max_outbound_queue=2, slow_consumer_policy=CollaborativeConnectionManager.POLICY_DISCONNECT
+        )
+        gone, stalled = FakeWebSocket(), FakeWebSocket(stalled=True)
+        await _connect(manager, gone, "u1")
+        await _connect(manager, stalled, "u2")
+
+        # The writer failed and closed the queue; the session cleanup has not run yet
+        manager._close_outbound(gone)
+        assert manager._enqueue(gone, "{}") is EnqueueResult.GONE
+
+        for i in range(3):
+            await manager.broadcast_to_session("s", {"type": "progress", "n": i})
+
+        assert gone.close_code is None
+        assert stalled.close_code == 1013
+        assert manager.slow_consumer_disconnects == 1
+
+    asyncio.run(run())
+
+
+def _set(key, value):
+    return {"op": "set", "path": [key], "value": value}
+
+
+async def _workers(count: int, **options):
+    """Managers on one in-process bus, standing in for workers sharing a Redis backplane"""
+    bus = InProcessBus()
+    workers = []
+    for _ in range(count):
+        manager = CollaborativeConnectionManager(**options)
+        await manager.set_backplane(InProcessBackplane(bus))
+        workers.append(manager)
+    return workers
+
+
+def test_state_changes_on_one_worker_reach_clients_on_another():
+    async def run():
+        worker_a, worker_b = await _workers(2)
+        client_a, client_b = FakeWebSocket(), FakeWebSocket()
+        await _connect(worker_a, client_a, "u1")
+        await worker_a.add_chat_message("s", {"message": "hi"})
+
+        # Worker b joins the running session and takes over worker a's state
+        await _connect(worker_b, client_b, "u2")
+        await asyncio.sleep(0.01)
+        joined_version = worker_b.session_states["s"].version
+
+        await worker_b.update_session_state("s", {"current_sentence": 3})
+        await asyncio.sleep(0.01)
+
+        state_a, state_b = worker_a.session_states["s"], worker_b.session_states["s"]
+        assert (state_a.epoch, state_a.version) == (state_b.epoch, state_b.version)
+        assert state_a.data == state_b.data
+        assert set(state_a.data["participants"]) == {"u1", "u2"}
+        assert list(state_b.chat) == list(state_a.chat)
+
+        delta = client_a.sent[-1]
+        assert delta["type"] == "session_delta"
+        assert delta["changes"] == [{"version": state_a.version, "ops": [_set("current_sentence", 3)]}]
+
+        # A client moving to the other worker catches up with a delta
+        moved = FakeWebSocket()
+        await worker_b.connect_to_session(moved, "s", "u3", "u3", state_a.epoch, joined_version)
+        await asyncio.sleep(0.01)
+        assert moved.sent[-1]["type"] == "session_delta"
+        assert [change["version"] for change in moved.sent[-1]["changes"]] == [
+            joined_version + 1, joined_version + 2
+        ]
+
+    asyncio.run(run())
+
+
+def test_shared_batches_are_applied_in_version_order():
+    state = SessionState(shared=True)
+
+    assert state.apply_at(5, [_set("a", 1)]) == [(5, [_set("a", 1)])]
+    assert state.apply_at(7, [_set("a", 3)]) == []
+    assert state.pending
+    assert [version for version, _ in state.apply_at(6, [_set("a", 2)])] == [6, 7]
+    assert state.data["a"] == 3 and not state.pending
+
+    # Versions before this copy's first one were never seen here
+    assert state.delta_since(state.epoch, 4) is None
+    assert [change["version"] for change in state.delta_since(state.epoch, 5)] == [6, 7]
+    assert state.apply_at(6, [_set("a", 2)]) == []
+
+
+def test_a_lost_batch_is_skipped_and_clients_resynced():
+    async def run():
+        (worker,) = await _workers(1, state_sync_timeout=0.01)
+        client = FakeWebSocket()
+        await _connect(worker, client)
+        state = worker.session_states["s"]
+
+        # The batch before this one never arrives and no other worker has it
+        await worker._handle_session_event("session:s", {
+            "kind": "state_ops", "version": state.version + 2, "ops": [_set("current_sentence", 4)]
+        })
+        assert state.pending and state.data["current_sentence"] == 0
+
+        await asyncio.sleep(0.05)
+        assert not state.pending and state.data["current_sentence"] == 4
+        assert client.sent[-1]["type"] == "session_sync"
+        assert client.sent[-1]["version"] == state.version
+
+    asyncio.run(run())
+
+
+def test_delta_since_covers_the_logged_window_only():
+    state = SessionState(ops_log_size=3)
+    for value in range(5):
+        state.apply([_set("current_sentence", value)])
+
+    assert state.delta_since(state.epoch, 5) == []
+    assert state.delta_since(state.epoch, 3) == [
+        {"version": 4, "ops": [_set("current_sentence", 3)]},
+        {"version": 5, "ops": [_set("current_sentence", 4)]},
+    ]
+    assert [change["version"] for change in state.delta_since(state.epoch, 2)] == [3, 4, 5]
+
+    # Older than the log, from another epoch, ahead of the state or unknown: full snapshot
+    assert state.delta_since(state.epoch, 1) is None
+    assert state.delta_since("other-epoch", 4) is None
+    assert state.delta_since(state.epoch, 6) is None
+    assert state.delta_since(state.epoch, None) is None
+
+
+def test_chat_is_a_bounded_ring_fetched_in_pages():
+    state = SessionState(chat_history_size=5)
+    for i in range(8):
+        state.apply([{"op": "chat", "value": {"text": f"m{i}"}}])
+
+    assert [message["seq"] for message in state.chat] == [4, 5, 6, 7, 8]
+    assert [message["text"] for message in state.snapshot(recent_chat=2)["recent_chat"]] == ["m6", "m7"]
+    assert "chat" not in state.snapshot()["state"]
+
+    page = state.chat_page(limit=3)
+    assert [message["seq"] for message in page["messages"]] == [6, 7, 8]
+    assert page["has_more"]
+    page = state.chat_page(before=6, limit=3)
+    assert [message["seq"] for message in page["messages"]] == [4, 5]
+    assert not page["has_more"]
+
+
+def test_reconnecting_clients_get_a_delta_or_a_full_snapshot():
+    async def run():
+        manager = CollaborativeConnectionManager()
+        first = FakeWebSocket()
+        await _connect(manager, first)
+        state = manager.session_states["s"]
+        epoch, seen_version = state.epoch, state.version
+
+        await manager.apply_state_ops("s", [_set("current_sentence", 2)])
+
+        # Close enough to catch up: only the batches since the last seen version
+        recent = FakeWebSocket()
+        await manager.connect_to_session(recent, "s", "u2", "u2", epoch, seen_version)
+        await asyncio.sleep(0)
+        delta = recent.sent[-1]
+        assert delta["type"] == "session_delta"
+        assert delta["from_version"] == seen_version and delta["version"] == state.version
+        assert [change["version"] for change in delta["changes"]] == list(range(seen_version + 1, state.version + 1))
+        assert "state" not in delta
+
+        # Fallen out of the ops log: the full state instead
+        for value in range(state.ops_log.maxlen + 1):
+            await manager.apply_state_ops("s", [_set("current_sentence", value)])
+            # Let the writers keep up so nobody is dropped as a slow consumer
+            await asyncio.sleep(0)
+        stale = FakeWebSocket()
+        await manager.connect_to_session(stale, "s", "u3", "u3", epoch, seen_version)
+        await asyncio.sleep(0)
+        full = stale.sent[-1]
+        assert full["type"] == "session_state"
+        assert full["version"] == state.version and full["epoch"] == epoch
+        assert full["state"]["current_sentence"] == state.ops_log.maxlen
+        assert set(full["state"]["participants"]) == {"u1", "u2", "u3"}
+
+        # A state from before a restart never matches the epoch
+        restarted = FakeWebSocket()
+        await manager.connect_to_session(restarted, "s", "u4", "u4", "old-epoch", state.version)
+        await asyncio.sleep(0)
+        assert restarted.sent[-1]["type"] == "session_state"
+
+    asyncio.run(run())
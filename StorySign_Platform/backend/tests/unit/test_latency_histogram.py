@@ -0,0 +1,63 @@
+"""
+Tests for LatencyHistogram quantiles and merging
+"""
+
+import random
+
+import pytest
+
+from core.latency_histogram import LatencyHistogram
+
+
+def _lognormal(count: int, seed: int):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(0.7, 1.0) for _ in range(count)]
+
+
+def test_percentiles_are_within_the_relative_accuracy():
+    values = _lognormal(50_000, seed=1)
+    histogram = LatencyHistogram(relative_accuracy=0.01)
+    for value in values:
+        histogram.record(value)
+
+    ordered = sorted(values)
+    for q in (0.5, 0.95, 0.99, 0.999):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert histogram.percentile(q) == pytest.approx(exact, rel=0.02)
+
+    summary = histogram.summary()
+    assert summary["count"] == len(values)
+    assert summary["mean_ms"] == pytest.approx(sum(values) / len(values), abs=0.001)
+    assert summary["max_ms"] == pytest.approx(max(values), abs=0.001)
+    assert summary["p50_ms"] <= summary["p95_ms"] <= summary["p99_ms"] <= summary["p999_ms"] <= summary["max_ms"]
+
+
+def test_merged_shards_match_one_histogram():
+    values = _lognormal(10_000, seed=2)
+    whole = LatencyHistogram()
+    shards = [LatencyHistogram() for _ in range(4)]
+    for i, value in enumerate(values):
+        whole.record(value)
+        shards[i % len(shards)].record(value)
+
+    merged = LatencyHistogram.merged(shards)
+    assert merged.summary() == whole.summary()
+    assert merged._buckets == whole._buckets
+    # Merging builds a new histogram and leaves the shards alone
+    assert sum(shard.count for shard in shards) == len(values)
+
+    with pytest.raises(ValueError):
+        whole.merge(LatencyHistogram(relative_accuracy=0.05))
+
+
+def test_out_of_range_values_are_clamped_and_empty_reads_zero():
+    histogram = LatencyHistogram(min_value_ms=0.001, max_value_ms=1000.0)
+    assert histogram.summary()["p99_ms"] == 0.0
+    assert LatencyHistogram.merged([]).count == 0
+
+    for value in (0.0, 1e-9, 5e6):
+        histogram.record(value)
+    assert len(histogram._buckets) == 2
+    assert histogram.percentile(0.0) == pytest.approx(0.001, rel=0.02)
+    assert histogram.percentile(1.0) == pytest.approx(1000.0, rel=0.02)
+    assert histogram.max_ms == 5e6
@@ -0,0 +1,289 @@
+"""
+Tests for MessageQueue dequeueing, expiry, batch handlers, routing, retries and the dead-letter queue
+"""
+
+import asyncio
+import time
+
+from core.message_queue import MessageQueue, MessageQueueManager, RoutingStrategy
+
+
+BASE_DELAY = 0.05
+MAX_DELAY = 0.4
+
+
+def _failing_queue(max_size: int = 10000) -> MessageQueue:
+    return MessageQueue(
+        "retry-test",
+        max_size=max_size,
+        batch_size=1,
+        retry_base_delay=BASE_DELAY,
+        retry_max_delay=MAX_DELAY
+    )
+
+
+async def _wait_for(condition, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_failing_handler_backs_off_then_dead_letters():
+    async def run():
+        queue = _failing_queue()
+        attempts = {}
+        healthy = []
+
+        def handler(message):
+            if message.content.get("ok"):
+                healthy.append(time.monotonic())
+                return
+            attempts.setdefault(message.id, []).append(time.monotonic())
+            raise RuntimeError("downstream unavailable")
+
+        queue.add_handler(handler)
+        await queue.start(processor_count=2)
+        for i in range(20):
+            await queue.enqueue({"type": "notify", "i": i}, message_id=f"m{i}")
+
+        # Backoff waits in the retry scheduler, not in a processor
+        await asyncio.sleep(BASE_DELAY / 4)
+        sent_at = time.monotonic()
+        await queue.enqueue({"type": "notify", "ok": True})
+        await _wait_for(lambda: healthy)
+        healthy_latency = healthy[0] - sent_at
+
+        await _wait_for(lambda: queue.get_stats()["dead_letter"]["total"] == 20)
+        stats = queue.get_stats()
+        await queue.stop()
+        return attempts, healthy_latency, stats
+
+    attempts, healthy_latency, stats = asyncio.run(run())
+
+    assert healthy_latency < BASE_DELAY
+    assert stats["retries"]["scheduled"] == 20 * 3
+    assert stats["dead_letter"]["by_type"] == {"notify": 20}
+
+    for times in attempts.values():
+        # One first attempt plus max_retries (3) retries
+        assert len(times) == 4
+        for attempt, gap in enumerate((b - a for a, b in zip(times, times[1:])), start=1):
+            # Equal jitter: between half and all of the capped exponential delay
+            ceiling = min(MAX_DELAY, BASE_DELAY * 2 ** (attempt - 1))
+            assert ceiling / 2 - 0.005 <= gap <= ceiling + 0.1
+
+
+def test_replay_dead_letters_requeues_with_fresh_budget():
+    async def run():
+        queue = _failing_queue()
+        handled = []
+        fail = True
+
+        def handler(message):
+            if fail:
+                raise RuntimeError("downstream unavailable")
+            handled.append(message.id)
+
+        queue.add_handler(handler)
+        await queue.start()
+        for i in range(5):
+            await queue.enqueue({"type": "notify"}, message_id=f"n{i}")
+        await queue.enqueue({"type": "email"}, message_id="e0")
+        await _wait_for(lambda: queue.get_stats()["dead_letter"]["size"] == 6)
+
+        fail = False
+        replayed = await queue.replay_dead_letters(message_type="notify")
+        await _wait_for(lambda: len(handled) == 5)
+        remaining = [entry["id"] for entry in queue.get_dead_letters()]
+        await queue.stop()
+        return replayed, sorted(handled), remaining
+
+    replayed, handled, remaining = asyncio.run(run())
+    assert replayed == 5
+    assert handled == [f"n{i}" for i in range(5)]
+    assert remaining == ["e0"]
+
+
+def test_replay_keeps_dead_letters_that_could_not_be_enqueued():
+    async def run():
+        queue = _failing_queue(max_size=5)
+
+        def handler(message):
+            raise RuntimeError("downstream unavailable")
+
+        queue.add_handler(handler)
+        await queue.start()
+        for i in range(5):
+            await queue.enqueue({"type": "notify"}, message_id=f"m{i}")
+        await _wait_for(lambda: queue.get_stats()["dead_letter"]["size"] == 5)
+        await queue.stop()
+
+        # Leave room for only two of the five
+        for i in range(3):
+            await queue.enqueue({"type": "filler"}, message_id=f"f{i}")
+        dead_lettered = [entry["id"] for entry in reversed(queue.get_dead_letters())]
+        replayed = await queue.replay_dead_letters()
+        remaining = [entry["id"] for entry in reversed(queue.get_dead_letters())]
+        return replayed, dead_lettered, remaining
+
+    replayed, dead_lettered, remaining = asyncio.run(run())
+    assert replayed == 2
+    assert remaining == dead_lettered[2:]
+
+
+def test_idle_dequeue_wakes_on_enqueue_and_times_out():
+    async def run():
+        queue = MessageQueue("dequeue-test", batch_size=1)
+        waiter = asyncio.create_task(queue.dequeue())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+
+        await queue.enqueue({"type": "notify"}, message_id="m1")
+        message = await asyncio.wait_for(waiter, timeout=0.1)
+
+        started = time.monotonic()
+        timed_out = await queue.dequeue(timeout=0.05)
+        return message.id, timed_out, time.monotonic() - started
+
+    message_id, timed_out, waited = asyncio.run(run())
+    assert message_id == "m1"
+    assert timed_out is None
+    assert 0.04 <= waited < 0.5
+
+
+def test_expired_messages_are_never_delivered():
+    async def run():
+        queue = MessageQueue("expiry-test", batch_size=1)
+        await queue.enqueue({"type": "a"}, ttl_seconds=0.01, message_id="short")
+        await queue.enqueue({"type": "a"}, ttl_seconds=60, message_id="long")
+        await queue.enqueue({"type": "a"}, message_id="forever")
+        # An expired message re-enqueued under its ID is live again
+        await queue.enqueue({"type": "a"}, ttl_seconds=0.01, message_id="renewed")
+        await asyncio.sleep(0.02)
+        await queue.enqueue({"type": "a"}, ttl_seconds=60, message_id="renewed")
+
+        delivered = []
+        while (message := await queue.dequeue(timeout=0.01)) is not None:
+            delivered.append(message.id)
+        return delivered, queue.get_stats()
+
+    delivered, stats = asyncio.run(run())
+    assert delivered == ["long", "forever", "renewed"]
+    assert stats["messages_expired"] == 1
+    assert stats["queue_depth"] == 0
+    assert stats["expiry"]["cleanup_runs"] >= 1
+
+
+def test_deadlines_of_dequeued_messages_do_not_pile_up():
+    async def run():
+        queue = MessageQueue("expiry-test", batch_size=1)
+        for i in range(1000):
+            await queue.enqueue({"type": "a"}, ttl_seconds=60, message_id=str(i))
+            await queue.dequeue(timeout=0.01)
+        return queue.get_stats()["expiry"]["pending_deadlines"]
+
+    assert asyncio.run(run()) <= 65
+
+
+def test_batch_handler_drains_same_type_messages_per_call():
+    async def run():
+        queue = MessageQueue("batch-test", batch_size=1)
+        batches, singles = [], []
+        queue.add_batch_handler("event", lambda batch: batches.append([m.id for m in batch]), max_batch_size=4)
+        queue.add_handler(lambda message: singles.append(message.id))
+
+        for i in range(10):
+            await queue.enqueue({"type": "event"}, message_id=f"e{i}")
+        await queue.enqueue({"type": "other"}, message_id="o1")
+
+        await queue.start()
+        await _wait_for(lambda: queue.stats.messages_processed == 11)
+        stats = queue.get_stats()
+        await queue.stop()
+        return batches, singles, stats
+
+    batches, singles, stats = asyncio.run(run())
+    assert batches == [["e0", "e1", "e2", "e3"], ["e4", "e5", "e6", "e7"], ["e8", "e9"]]
+    assert singles == ["o1"]
+    event_stats = stats["batch_handlers"]["event"]
+    assert (event_stats["batches"], event_stats["messages"]) == (3, 10)
+    assert event_stats["batch_size_distribution"] == {"<=2": 1, "<=4": 2}
+
+
+def test_batch_handler_waits_up_to_max_linger_for_a_batch():
+    async def run():
+        queue = MessageQueue("batch-test", batch_size=1)
+        batches = []
+        queue.add_batch_handler("event", lambda batch: batches.append(len(batch)), max_batch_size=3, max_linger=0.5)
+        await queue.start()
+
+        # Stragglers inside the linger window join the first message's batch
+        for i in range(3):
+            await queue.enqueue({"type": "event"}, message_id=f"e{i}")
+            await asyncio.sleep(0.01)
+        await _wait_for(lambda: queue.stats.messages_processed == 3)
+        await queue.stop()
+        return batches
+
+    assert asyncio.run(run()) == [3]
+
+
+def test_load_balancer_strategies_avoid_the_busy_queue():
+    async def run():
+        manager = MessageQueueManager()
+        # Not started: queue depth alone decides the routing
+        for name in ("a", "b"):
+            manager.queues[name] = MessageQueue(name, batch_size=1)
+        for i in range(3):
+            await manager.queues["a"].enqueue({"type": "work"}, message_id=f"a{i}")
+
+        manager.add_load_balancer_group("depth", ["a", "b"], RoutingStrategy.LEAST_DEPTH)
+        manager.add_load_balancer_group("ewma", ["a", "b"], "ewma")
+        manager.add_routing_rule("work", "depth")
+        picks = [manager._get_load_balanced_queue("depth") for _ in range(4)]
+        await manager.route_message({"type": "work"})
+
+        # b is shallower but much slower per message
+        manager.queues["a"].ewma_service_time_ms = 1.0
+        manager.queues["b"].ewma_service_time_ms = 50.0
+        return picks, manager.queues["b"].get_stats()["queue_depth"], manager._get_load_balanced_queue("ewma")
+
+    picks, routed_to_b, ewma_pick = asyncio.run(run())
+    assert picks == ["b"] * 4
+    assert routed_to_b == 1
+    assert ewma_pick == "a"
+
+
+def test_idle_workers_steal_from_a_busy_sibling_queue():
+    async def run():
+        manager = MessageQueueManager()
+        release = asyncio.Event()
+        handled_by = {}
+
+        async def blocked(message):
+            handled_by[message.id] = "busy"
+            await release.wait()
+
+        busy = await manager.create_queue("busy", batch_size=1)
+        idle = await manager.create_queue("idle", batch_size=1)
+        busy.add_handler(blocked)
+        idle.add_handler(lambda message: handled_by.setdefault(message.id, "idle"))
+        manager.add_load_balancer_group("group", ["busy", "idle"], work_stealing=True)
+
+        for i in range(4):
+            await busy.enqueue({"type": "work"}, message_id=f"m{i}")
+        await _wait_for(lambda: len(handled_by) == 3)
+        # One message is not a backlog worth stealing: it waits for its own queue
+        await asyncio.sleep(0.05)
+        waiting = set(f"m{i}" for i in range(4)) - set(handled_by)
+        release.set()
+        await _wait_for(lambda: len(handled_by) == 4)
+        stolen = idle.messages_stolen
+        await manager.shutdown()
+        return handled_by, waiting, stolen
+
+    handled_by, waiting, stolen = asyncio.run(run())
+    assert handled_by == {"m0": "busy", "m1": "idle", "m2": "idle", "m3": "busy"}
+    assert waiting == {"m3"}
+    assert stolen == 2
@@ -0,0 +1,71 @@
+"""
+Tests for the bounded bcrypt hashing pool
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from core import password_hasher
+from core.password_hasher import PasswordHasher, PasswordHashingBusyError, hash_rounds
+
+
+def test_hash_and_verify_off_the_loop_and_detect_rehash():
+    async def run():
+        hasher = PasswordHasher(rounds=4)
+        hashed = await hasher.hash("secret")
+        results = (
+            await hasher.verify("secret", hashed),
+            await hasher.verify("wrong", hashed),
+            await hasher.verify("secret", "not a bcrypt hash"),
+        )
+        hasher.shutdown()
+        return hashed, results, hasher
+
+    hashed, results, hasher = asyncio.run(run())
+    assert results == (True, False, False)
+    assert hash_rounds(hashed) == 4
+    assert hash_rounds("plain") is None
+    assert not hasher.needs_rehash(hashed)
+    assert hasher.needs_rehash(hashed, rounds=5)
+    assert not hasher.needs_rehash("plain")
+
+
+def test_work_past_the_limit_is_rejected_until_a_slot_frees(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def blocked_verify(password, hashed_password):
+        started.set()
+        release.wait(5)
+        return True
+
+    monkeypatch.setattr(password_hasher, "_verify", blocked_verify)
+
+    async def run():
+        hasher = PasswordHasher(rounds=4, max_workers=1, max_pending=1)
+        waiter = asyncio.create_task(hasher.verify("secret", "hash"))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+
+        with pytest.raises(PasswordHashingBusyError):
+            await hasher.verify("secret", "hash")
+
+        # A caller that stops waiting keeps its slot until the thread is done
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+        with pytest.raises(PasswordHashingBusyError):
+            await hasher.verify("secret", "hash")
+
+        release.set()
+        for _ in range(100):
+            if hasher.get_stats()["pending"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        verified = await hasher.verify("secret", "hash")
+        hasher.shutdown()
+        return verified, hasher.get_stats()
+
+    verified, stats = asyncio.run(run())
+    assert verified
+    assert stats["rejections"] == 2
+    assert stats["pending"] == 0
@@ -0,0 +1,97 @@
+"""
+Tests for the user principal cache and its cross-worker invalidation
+"""
+
+import asyncio
+
+from core import principal_cache
+from core.cache_service import CacheService
+from core.principal_cache import UserPrincipal, UserPrincipalCache
+
+
+def _principal(role: str = "learner") -> UserPrincipal:
+    return UserPrincipal(id="user-1", email="user@example.com", role=role, is_active=True)
+
+
+async def _workers(monkeypatch):
+    """Two workers' principal caches whose cache services share a store and deliver each other's events"""
+    caches = [CacheService(config={"cache": {"memory_sample_interval": 0}}) for _ in range(2)]
+    for cache in caches:
+        await cache.initialize()
+    caches[1]._local_backend = caches[0]._local_backend
+
+    def deliver_to(other):
+        async def publish(topic, data):
+            other._notify_subscribers(topic, data)
+            return True
+        return publish
+
+    caches[0].publish, caches[1].publish = deliver_to(caches[1]), deliver_to(caches[0])
+
+    workers = []
+    for cache in caches:
+        async def get_cache_service(cache=cache):
+            return cache
+        monkeypatch.setattr(principal_cache, "get_cache_service", get_cache_service)
+        worker = UserPrincipalCache()
+        await worker.subscribe()
+        workers.append(worker)
+    return workers
+
+
+def test_role_change_drops_the_principal_in_every_worker(monkeypatch):
+    async def run():
+        worker_a, worker_b = await _workers(monkeypatch)
+        for worker in (worker_a, worker_b):
+            assert await worker.token_version("user-1") == 0
+            worker.put(_principal(), 0)
+            assert worker.get("user-1", 0) == _principal()
+
+        await worker_a.bump_version("user-1")
+
+        assert worker_a.get("user-1") is None
+        assert worker_b.get("user-1") is None
+        assert await worker_b.token_version("user-1") == 1
+
+    asyncio.run(run())
+
+
+def test_tokens_issued_after_a_change_reload_the_user(monkeypatch):
+    async def run():
+        worker_a, worker_b = await _workers(monkeypatch)
+        worker_b.put(_principal("learner"), 0)
+
+        async def lost(topic, data):
+            return False
+
+        # Worker b misses the invalidation and still holds the old role
+        worker_a._cache_service.publish = lost
+
+        await worker_a.bump_version("user-1")
+        token_version = await worker_a.token_version("user-1")
+
+        assert worker_b.get("user-1", 0).role == "learner"
+        assert worker_b.get("user-1", token_version) is None
+        worker_b.put(_principal("educator"), token_version)
+        assert worker_b.get("user-1", token_version).role == "educator"
+        # Older tokens get the newer principal too
+        assert worker_b.get("user-1", 0).role == "educator"
+
+    asyncio.run(run())
+
+
+def test_remote_invalidation_during_a_load_discards_it(monkeypatch):
+    async def run():
+        worker_a, worker_b = await _workers(monkeypatch)
+
+        generation = worker_b.generation
+        await worker_a.bump_version("user-1")
+        worker_b.put(_principal(), 0, generation)
+        assert worker_b.get("user-1") is None
+
+        # Messages may have been missed: everything goes
+        worker_b.put(_principal(), 1)
+        worker_b._on_event(None)
+        assert worker_b.get("user-1", 1) is None
+
+    asyncio.run(run())
@@ -0,0 +1,161 @@
+"""
+Tests for the GCRA rate limiting middleware
+"""
+
+import asyncio
+import importlib.util
+from pathlib import Path
+
+import pytest
+from starlette.requests import Request
+from starlette.responses import Response
+
+# The middleware package __init__ pulls in auth_middleware, so load the module on its own
+_spec = importlib.util.spec_from_file_location(
+    "rate_limiting", Path(__file__).parents[2] / "middleware" / "rate_limiting.py"
+)
+rate_limiting = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(rate_limiting)
+
+RateLimit = rate_limiting.RateLimit
+RateLimitingMiddleware = rate_limiting.RateLimitingMiddleware
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiting, "time", clock)
+    return clock
+
+
+def _check(limiter, rate_limit, client_id="ip:10.0.0.1", rule="default"):
+    return asyncio.run(limiter._check_rate_limit(client_id, rate_limit, rule))
+
+
+def _request(path: str = "/api/v1/lessons", ip: str = "10.0.0.1") -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": [],
+        "client": (ip, 50000),
+        "server": ("testserver", 80),
+        "scheme": "http",
+    })
+
+
+async def _ok(request):
+    return Response("ok")
+
+
+def test_burst_is_per_minute_with_a_cooldown(clock):
+    limiter = RateLimitingMiddleware(None)
+    limit = RateLimit(100, 3600, 20)
+
+    assert all(_check(limiter, limit)[0] for _ in range(20))
+    assert _check(limiter, limit) == (False, 60)
+
+    # The cooldown holds even once the burst rate would allow a request
+    clock.now += 30
+    assert not _check(limiter, limit)[0]
+
+    # After the cooldown a full burst is available again
+    clock.now += 30
+    assert all(_check(limiter, limit)[0] for _ in range(20))
+    assert not _check(limiter, limit)[0]
+
+
+def test_requests_per_window_is_the_sustained_rate(clock):
+    limiter = RateLimitingMiddleware(None)
+    limit = RateLimit(5, 300, 10)
+
+    assert all(_check(limiter, limit)[0] for _ in range(5))
+    allowed, retry_after = _check(limiter, limit)
+    assert not allowed and retry_after == 60
+
+    # One request per window / requests once the allowance is spent, for as long as the client keeps going
+    allowed_times = []
+    for _ in range(3000):
+        clock.now += 1
+        if _check(limiter, limit)[0]:
+            allowed_times.append(clock.now)
+    assert len(allowed_times) == 50
+    assert {b - a for a, b in zip(allowed_times, allowed_times[1:])} == {60}
+
+    # Rules keep separate state
+    assert _check(limiter, limit, rule="/api/v1/auth/login")[0]
+
+
+def test_headers_report_what_the_client_may_send_now(clock):
+    limiter = RateLimitingMiddleware(None, default_rate_limit=RateLimit(100, 3600, 20))
+
+    async def run():
+        responses = [await limiter.dispatch(_request(), _ok) for _ in range(21)]
+
+        first = responses[0].headers
+        assert first["X-RateLimit-Limit"] == "100"
+        assert first["X-RateLimit-Remaining"] == "19"
+        assert first["X-RateLimit-Window"] == "3600"
+        assert int(first["X-RateLimit-Reset"]) == clock.now + 36
+
+        assert responses[19].headers["X-RateLimit-Remaining"] == "0"
+        assert responses[20].status_code == 429
+        assert responses[20].headers["Retry-After"] == "60"
+        assert responses[20].headers["X-RateLimit-Remaining"] == "0"
+
+        # After the cooldown the burst is back; the reset is when all 21 requests are paid off
+        start = clock.now
+        clock.now += 60
+        response = await limiter.dispatch(_request(), _ok)
+        assert response.status_code == 200
+        assert response.headers["X-RateLimit-Remaining"] == "19"
+        assert int(response.headers["X-RateLimit-Reset"]) == start + 21 * 36
+
+    asyncio.run(run())
+
+
+def test_client_states_are_bounded_by_lru_eviction(clock):
+    limiter = RateLimitingMiddleware(None, max_clients=100)
+    limit = RateLimit(5, 300, 2)
+
+    for i in range(150):
+        _check(limiter, limit, client_id=f"ip:10.0.0.{i}")
+        clock.now += 0.001
+    # A recently seen client stays when newer ones arrive
+    _check(limiter, limit, client_id="ip:10.0.0.60")
+    _check(limiter, limit, client_id="ip:10.0.1.1")
+
+    assert len(limiter.client_states) == 100
+    assert limiter.get_statistics()["evicted_clients"] == 51
+    assert "ip:10.0.0.49|default" not in limiter.client_states
+    assert "ip:10.0.0.50|default" not in limiter.client_states
+    assert "ip:10.0.0.60|default" in limiter.client_states
+
+
+def test_cleanup_drops_idle_clients_behind_live_ones(clock):
+    limiter = RateLimitingMiddleware(None, cleanup_interval=0)
+    limiter.cleanup_batch_size = 40
+    hourly, short = RateLimit(100, 3600, 20), RateLimit(10, 60, 10)
+
+    # Least recently used is a client still ahead of the hourly rate
+    for _ in range(10):
+        _check(limiter, hourly, client_id="ip:10.0.0.1")
+    for i in range(50):
+        _check(limiter, short, client_id=f"ip:10.0.1.{i}")
+
+    clock.now += 120
+    asyncio.run(limiter._cleanup_if_needed())
+    # 39 idle clients dropped and the live one moved behind the rest
+    assert len(limiter.client_states) == 12
+
+    asyncio.run(limiter._cleanup_if_needed())
+    assert list(limiter.client_states) == ["ip:10.0.0.1|default"]
@@ -0,0 +1,81 @@
+"""
+Tests for the session backplane, using in-process backplanes as stand-in workers
+"""
+
+import asyncio
+
+from core.session_backplane import InProcessBackplane, InProcessBus
+
+
+def test_messages_reach_other_workers_in_order():
+    async def run():
+        bus = InProcessBus()
+        worker_a, worker_b = InProcessBackplane(bus), InProcessBackplane(bus)
+        received = {"a": [], "b": []}
+
+        def handler_for(name):
+            async def handler(channel, message):
+                received[name].append(message["n"])
+            return handler
+
+        await worker_a.subscribe("session:s", handler_for("a"))
+        await worker_b.subscribe("session:s", handler_for("b"))
+        for n in range(5):
+            await worker_a.publish("session:s", {"n": n})
+        await asyncio.sleep(0.01)
+
+        assert received == {"a": [], "b": [0, 1, 2, 3, 4]}
+        assert worker_b.get_stats()["messages_received"] == 5
+
+    asyncio.run(run())
+
+
+def test_a_slow_handler_does_not_hold_up_other_channels():
+    async def run():
+        bus = InProcessBus()
+        publisher, worker = InProcessBackplane(bus), InProcessBackplane(bus, max_pending=2)
+        release = asyncio.Event()
+        fast = []
+
+        async def stalled(channel, message):
+            await release.wait()
+
+        async def handler(channel, message):
+            fast.append(message["n"])
+
+        await worker.subscribe("session:slow", stalled)
+        await worker.subscribe("session:fast", handler)
+        await publisher.publish("session:slow", {"n": 0})
+        # The dispatcher takes the first message into the stalled handler
+        await asyncio.sleep(0)
+        for n in range(1, 4):
+            await publisher.publish("session:slow", {"n": n})
+        await publisher.publish("session:fast", {"n": 0})
+        await asyncio.sleep(0.01)
+
+        assert fast == [0]
+        # Two wait behind the stalled one and the fourth is dropped
+        assert worker.get_stats()["pending_messages"] == 2
+        assert worker.messages_dropped == 1
+
+        release.set()
+        await asyncio.sleep(0.01)
+        assert worker.get_stats()["pending_messages"] == 0
+        assert worker.messages_received == 4
+
+    asyncio.run(run())
+
+
+def test_versions_and_epochs_are_shared_by_all_workers():
+    async def run():
+        bus = InProcessBus()
+        worker_a, worker_b = InProcessBackplane(bus), InProcessBackplane(bus)
+
+        assert [await worker_a.next_version("session:s"), await worker_b.next_version("session:s")] == [1, 2]
+        assert await worker_b.next_version("session:t") == 1
+
+        epoch, created = await worker_a.shared_epoch("session:s")
+        assert created
+        assert await worker_b.shared_epoch("session:s") == (epoch, False)
+
+    asyncio.run(run())
@@ -0,0 +1,151 @@
+"""
+Tests for the verified token cache and the token revocation list
+"""
+
+import asyncio
+import secrets
+import time
+
+from core.bloom_filter import RotatingBloomFilter
+from core.cache_service import CacheService
+from core import token_cache
+from core.token_cache import (
+    TokenRevocationList, VerifiedTokenCache, get_token_cache, token_digest, token_digest_key
+)
+
+
+class _UnreachableStore:
+    """Backend whose every read fails, like Redis during an outage"""
+
+    async def get(self, name):
+        raise ConnectionError("connection refused")
+
+    async def exists(self, *names):
+        raise ConnectionError("connection refused")
+
+
+async def _revocation_list(cache: CacheService) -> TokenRevocationList:
+    revocation_list = TokenRevocationList()
+    revocation_list._cache_service = cache
+    revocation_list._loaded = True
+    return revocation_list
+
+
+def _payload(user_id: str = "user-1") -> dict:
+    now = time.time()
+    return {"sub": user_id, "iat": round(now, 6), "exp": now + 600, "jti": secrets.token_urlsafe(16)}
+
+
+def test_token_digest_is_bound_to_secret_and_algorithm():
+    token = "header.payload.signature"
+    digest = token_digest(token, token_digest_key("secret-a", "HS256"))
+
+    assert digest == token_digest(token, token_digest_key("secret-a", "HS256"))
+    assert digest != token_digest(token, token_digest_key("secret-b", "HS256"))
+    assert digest != token_digest(token, token_digest_key("secret-a", "HS512"))
+
+
+def test_is_revoked_reads_the_store_on_a_filter_match():
+    async def run():
+        cache = CacheService(config={"cache": {"memory_sample_interval": 0}})
+        await cache.initialize()
+        revocation_list = await _revocation_list(cache)
+        revoked, kept, other_user = _payload(), _payload(), _payload("user-2")
+
+        await revocation_list.revoke_token(revoked["jti"], revoked["exp"])
+        assert await revocation_list.is_revoked(revoked["jti"], revoked)
+        assert not await revocation_list.is_revoked(kept["jti"], kept)
+
+        await revocation_list.revoke_user("user-1")
+        assert await revocation_list.is_revoked(kept["jti"], kept)
+        assert not await revocation_list.is_revoked(other_user["jti"], other_user)
+
+    asyncio.run(run())
+
+
+def test_revoke_user_spares_tokens_issued_right_after():
+    async def run():
+        cache = CacheService(config={"cache": {"memory_sample_interval": 0}})
+        await cache.initialize()
+        revocation_list = await _revocation_list(cache)
+        before = _payload()
+        # A legacy whole-second iat from earlier in this second
+        legacy = {**_payload(), "iat": int(time.time())}
+
+        await revocation_list.revoke_user("user-1")
+        after = _payload()
+
+        assert await revocation_list.is_revoked(before["jti"], before)
+        assert await revocation_list.is_revoked(legacy["jti"], legacy)
+        assert not await revocation_list.is_revoked(after["jti"], after)
+
+    asyncio.run(run())
+
+
+def test_cached_tokens_live_until_exp_and_revocation_outlives_the_cache():
+    async def run():
+        cache = CacheService(config={"cache": {"memory_sample_interval": 0}})
+        await cache.initialize()
+        token_cache = VerifiedTokenCache()
+        token_cache.revocations = await _revocation_list(cache)
+
+        payload, short_lived = _payload(), {**_payload(), "exp": time.time() + 0.05}
+        token_cache.put("digest-1", payload)
+        token_cache.put("digest-2", short_lived)
+        token_cache.put("digest-3", {**_payload(), "exp": time.time() - 1})
+        assert token_cache.get("digest-1") == payload
+        assert token_cache.get("digest-3") is None
+
+        await asyncio.sleep(0.06)
+        assert token_cache.get("digest-2") is None
+
+        assert not await token_cache.is_revoked("digest-1", payload)
+        await token_cache.revoke_token("digest-1", payload)
+        assert token_cache.get("digest-1") is None
+        # A fresh decode of the same token after eviction is still rejected
+        token_cache.clear()
+        assert await token_cache.is_revoked("digest-1", payload)
+        return token_cache.get_stats()
+
+    stats = asyncio.run(run())
+    assert (stats["hits"], stats["revoked"]) == (1, 1)
+
+
+def test_token_cache_keeps_revocations_for_the_longest_token_lifetime(monkeypatch):
+    monkeypatch.setattr(token_cache, "_token_cache", None)
+
+    assert get_token_cache(30 * 60).revocations.max_token_lifetime == 30 * 60
+    assert get_token_cache(10 * 60).revocations.max_token_lifetime == 30 * 60
+    assert get_token_cache(60 * 60).revocations.max_token_lifetime == 60 * 60
+
+
+def test_is_revoked_fails_closed_when_the_store_is_unreachable():
+    async def run():
+        cache = CacheService(config={"cache": {"memory_sample_interval": 0}})
+        await cache.initialize()
+        revocation_list = await _revocation_list(cache)
+        payload = _payload()
+        await revocation_list.revoke_token(payload["jti"], payload["exp"])
+
+        cache._local_backend = _UnreachableStore()
+        assert await revocation_list.is_revoked(payload["jti"], payload)
+        assert revocation_list.stats["lookup_errors"] == 1
+
+        # Before the filters load, every check reads the store
+        revocation_list._loaded = False
+        unrevoked = _payload("user-2")
+        assert await revocation_list.is_revoked(unrevoked["jti"], unrevoked)
+
+    asyncio.run(run())
+
+
+def test_rotating_filter_false_positive_rate():
+    now = time.time()
+    bloom = RotatingBloomFilter(900, 60, capacity=50000, error_rate=0.001)
+    for _ in range(50000):
+        bloom.add(secrets.token_urlsafe(16), now + 600, now)
+
+    probes = 100000
+    false_positives = sum(bloom.contains(secrets.token_urlsafe(16), now + 600, now) for _ in range(probes))
+    # Twice the target leaves room for sampling noise
+    assert false_positives / probes < 0.002
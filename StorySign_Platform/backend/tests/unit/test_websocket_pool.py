@@ -0,0 +1,135 @@
+"""
+Tests for WebSocketConnectionPool stats and broadcasts
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from core.wire_codec import JSON_CODEC, get_codec
+from core.websocket_pool import WebSocketConnectionPool
+
+
+class FakeWebSocket:
+    """Replays the given incoming frames and records what is sent"""
+
+    def __init__(self, incoming=(), subprotocols=()):
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.query_params = {}
+        self.incoming = list(incoming)
+        self.sent = []
+
+    async def accept(self, subprotocol=None):
+        self.subprotocol = subprotocol
+
+    async def receive(self):
+        frame = self.incoming.pop(0)
+        key = "bytes" if isinstance(frame, bytes) else "text"
+        return {"type": "websocket.receive", key: frame}
+
+    async def send_text(self, payload):
+        self.sent.append(payload)
+
+    async def send_bytes(self, payload):
+        self.sent.append(payload)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def test_receive_message_counts_received_bytes():
+    frames = ['{"type":"ping"}', '{"type":"chat","text":"hello"}']
+
+    async def run():
+        pool = WebSocketConnectionPool()
+        await pool.connect_client(FakeWebSocket(frames), client_id="a")
+        await pool.connect_client(FakeWebSocket(frames[:1]), client_id="b")
+
+        assert await pool.receive_message("a") == {"type": "ping"}
+        assert await pool.receive_message("a") == {"type": "chat", "text": "hello"}
+        assert await pool.receive_message("b") == {"type": "ping"}
+
+        stats = pool.get_pool_stats()
+        assert stats["total_messages_received"] == 3
+        assert stats["total_bytes_received"] == len(frames[0]) * 2 + len(frames[1])
+        assert pool.get_client_metrics("a")["bytes_received"] == len(frames[0]) + len(frames[1])
+        assert pool.get_client_metrics("b")["bytes_received"] == len(frames[0])
+
+        await pool.disconnect_client("a")
+        # Totals outlive the connections they were counted on
+        assert pool.get_pool_stats()["total_bytes_received"] == stats["total_bytes_received"]
+        await pool.disconnect_client("b")
+
+    asyncio.run(run())
+
+
+def _connect_mixed_clients(pool):
+    """Connect two JSON and two MessagePack clients"""
+    websockets = {
+        "json-1": FakeWebSocket(),
+        "json-2": FakeWebSocket(),
+        "msgpack-1": FakeWebSocket(subprotocols=["storysign.msgpack.v1"]),
+        "msgpack-2": FakeWebSocket(subprotocols=["storysign.msgpack.v1"]),
+    }
+    return websockets, asyncio.gather(*(
+        pool.connect_client(websocket, client_id=client_id)
+        for client_id, websocket in websockets.items()
+    ))
+
+
+def test_broadcast_encodes_once_per_codec(monkeypatch):
+    pytest.importorskip("msgpack")
+    msgpack_codec = get_codec("msgpack")
+    encodes = {"json": 0, "msgpack": 0}
+    for codec in (JSON_CODEC, msgpack_codec):
+        def counting_encode(message, codec=codec, encode=codec.encode):
+            encodes[codec.name] += 1
+            return encode(message)
+        monkeypatch.setattr(codec, "encode", counting_encode)
+
+    message = {"type": "leaderboard", "scores": list(range(20))}
+
+    async def run():
+        pool = WebSocketConnectionPool()
+        websockets, connecting = _connect_mixed_clients(pool)
+        await connecting
+
+        assert await pool.broadcast_message(message, batch=False) == 4
+        for client_id in list(websockets):
+            await pool.disconnect_client(client_id)
+        return websockets
+
+    websockets = asyncio.run(run())
+    assert encodes == {"json": 1, "msgpack": 1}
+    # Clients sharing a codec are sent the very same payload object
+    assert websockets["json-1"].sent[0] is websockets["json-2"].sent[0]
+    assert websockets["msgpack-1"].sent[0] is websockets["msgpack-2"].sent[0]
+    assert json.loads(websockets["json-1"].sent[0]) == message
+    assert msgpack_codec.decode(websockets["msgpack-1"].sent[0]) == message
+
+
+def test_batched_broadcasts_are_spliced_into_one_frame_per_client():
+    pytest.importorskip("msgpack")
+    messages = [{"type": "progress", "step": step} for step in range(3)]
+
+    async def run():
+        pool = WebSocketConnectionPool()
+        websockets, connecting = _connect_mixed_clients(pool)
+        await connecting
+
+        for message in messages:
+            assert await pool.broadcast_message(message) == 4
+        await asyncio.sleep(pool.batch_timeout * 5)
+        for client_id in list(websockets):
+            await pool.disconnect_client(client_id)
+        return websockets
+
+    websockets = asyncio.run(run())
+    for client_id, websocket in websockets.items():
+        codec = get_codec(client_id.split("-")[0])
+        assert len(websocket.sent) == 1
+        batch = codec.decode(websocket.sent[0])
+        assert batch["type"] == "batch"
+        assert batch["messages"] == messages
+        assert batch["count"] == 3
@@ -0,0 +1,79 @@
+"""
+Tests for WebSocket codec negotiation and batch framing
+"""
+
+import asyncio
+import json
+
+import pytest
+
+msgpack = pytest.importorskip("msgpack")
+
+from core.wire_codec import JSON_CODEC, accept_with_codec, get_codec, negotiate_codec
+
+
+class FakeWebSocket:
+    """Records the subprotocol the handshake was accepted with"""
+
+    def __init__(self, subprotocols=(), query_params=None):
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.query_params = query_params or {}
+        self.subprotocol = "unset"
+
+    async def accept(self, subprotocol=None):
+        self.subprotocol = subprotocol
+
+
+def test_subprotocol_offer_selects_codec_first_match_wins():
+    websocket = FakeWebSocket(["chat.v2", "storysign.msgpack.v1", "storysign.json.v1"])
+    codec = asyncio.run(accept_with_codec(websocket))
+
+    assert codec.name == "msgpack"
+    assert websocket.subprotocol == "storysign.msgpack.v1"
+    assert negotiate_codec(FakeWebSocket(["storysign.json.v1", "storysign.msgpack.v1"])) is JSON_CODEC
+
+
+def test_unknown_offers_fall_back_to_json_without_a_subprotocol():
+    for websocket in (
+        FakeWebSocket(),
+        FakeWebSocket(["storysign.cbor.v1"]),
+        FakeWebSocket(query_params={"encoding": "protobuf"}),
+    ):
+        codec = asyncio.run(accept_with_codec(websocket))
+        assert codec is JSON_CODEC
+        assert websocket.subprotocol is None
+
+    assert get_codec(None) is JSON_CODEC
+    assert get_codec("protobuf") is JSON_CODEC
+
+
+def test_encoding_query_param_selects_codec_without_echoing_a_subprotocol():
+    websocket = FakeWebSocket(query_params={"encoding": "msgpack"})
+    codec = asyncio.run(accept_with_codec(websocket))
+
+    assert codec.name == "msgpack"
+    # The client never offered the subprotocol, so the handshake must not select one
+    assert websocket.subprotocol is None
+
+
+def test_binary_codec_decodes_json_text_frames_and_rejects_garbage():
+    codec = get_codec("msgpack")
+    message = {"type": "chat", "text": "hello", "n": 3}
+
+    assert codec.decode_frame(json.dumps(message)) == message
+    assert codec.decode_frame(codec.encode(message)) == message
+    with pytest.raises(ValueError):
+        codec.decode_frame(b"\xc1")
+
+
+def test_assembled_batches_decode_to_the_original_messages():
+    messages = [{"type": "progress", "i": i} for i in range(3)]
+    timestamp = "2024-01-01T00:00:00"
+
+    for codec in (JSON_CODEC, get_codec("msgpack")):
+        fragments = [codec.encode(message) for message in messages]
+        batch = codec.decode(codec.assemble_batch(fragments, timestamp))
+        assert batch == {"type": "batch", "messages": messages, "count": 3, "timestamp": timestamp}
+
+        empty = codec.decode(codec.assemble_batch([], timestamp))
+        assert empty["messages"] == [] and empty["count"] == 0